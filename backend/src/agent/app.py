@@ -1,81 +1,373 @@
 # mypy: disable - error - code = "no-untyped-def,misc"
+import asyncio
+import importlib.util
+import logging
+import mimetypes
 import pathlib
-from fastapi import FastAPI, Response, HTTPException
+import re
+import secrets
+import signal
+import time
+from contextlib import asynccontextmanager
+from functools import cache
+from fastapi import FastAPI, Header, Response, HTTPException
+from fastapi.responses import ORJSONResponse
 from fastapi.staticfiles import StaticFiles
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse
+from starlette.routing import Route
+from starlette.staticfiles import NotModifiedResponse
 from fastapi.middleware.cors import CORSMiddleware
-from typing import Dict, List, Any
+from types import MappingProxyType
+from typing import AsyncIterator, Dict, Final, List, Any, Mapping, Optional, Set, Tuple
 import os
+import httpx
+import orjson
 from dotenv import load_dotenv
+from pydantic import AliasChoices, BaseModel, ConfigDict, Field
 
 # 导入LLM相关模块
 from agent.llm_factory import LLMProviderFactory
-from agent.llm_types import LLMProviderType
+from agent.search_factory import SearchProviderFactory
+from agent.llm_types import LLMProviderType, LLMModel
 from agent.configuration import Configuration
+from agent.logging_config import setup_logging
 
 # 加载环境变量
 backend_dir = pathlib.Path(__file__).parent.parent.parent
 env_path = backend_dir / '.env'
 load_dotenv(dotenv_path=env_path)
 
+setup_logging()
+logger = logging.getLogger(__name__)
+
+# 进程级共享的提供商工厂，避免每个请求重复创建
+_FACTORY = LLMProviderFactory()
+
+
+@cache
+def _get_provider(provider_type: LLMProviderType):
+    """获取提供商实例，每种提供商在进程内只创建一次"""
+    return _FACTORY.create_provider(provider_type)
+
+
+# 所有提供商，以及默认提供商不可用时的检查顺序
+_ALL_PROVIDERS: Final[Tuple[LLMProviderType, ...]] = tuple(LLMProviderType)
+_PRIORITY_ORDER: Final[Tuple[LLMProviderType, ...]] = (
+    LLMProviderType.GEMINI,
+    LLMProviderType.AZURE_OPENAI,
+    LLMProviderType.AWS_BEDROCK,
+    LLMProviderType.OPENAI_COMPATIBLE,
+)
+
+
+class ProviderModel(BaseModel):
+    """返回给前端的模型信息，可直接从LLMModel的属性构建"""
+    model_config = ConfigDict(frozen=True, from_attributes=True)
+
+    id: str
+    name: str
+    description: Optional[str] = None
+    context_length: Optional[int] = Field(
+        default=None, validation_alias=AliasChoices("context_length", "max_tokens")
+    )
+    supports_structured_output: bool = True
+
+
+class ProviderModelsResponse(BaseModel):
+    """特定提供商的模型列表响应"""
+    model_config = ConfigDict(from_attributes=True)
+
+    provider: str
+    models: List[ProviderModel]
+
+
+# 模型信息在进程内不变，每个模型只构建一次ProviderModel
+_provider_models: Dict[Tuple[LLMProviderType, str], ProviderModel] = {}
+
+
+def _to_provider_model(model: LLMModel) -> ProviderModel:
+    """获取模型对应的（缓存的）ProviderModel实例"""
+    key = (model.provider, model.id)
+    provider_model = _provider_models.get(key)
+    if provider_model is None:
+        provider_model = ProviderModel.model_validate(model)
+        _provider_models[key] = provider_model
+    return provider_model
+
+
+def _orjson_default(obj: Any) -> Any:
+    """orjson无法直接序列化的对象（Pydantic模型）的转换函数"""
+    if isinstance(obj, BaseModel):
+        return obj.model_dump()
+    raise TypeError
+
+
+# 响应缓存：输入（环境变量、已配置的提供商）在进程内基本不变，
+# 因此缓存序列化后的响应体，缓存有效期内直接返回
+_RESPONSE_CACHE_TTL = 30.0
+_providers_cache: Optional[Tuple[float, bytes]] = None
+
+
+def _cached_body(cache: Optional[Tuple[float, bytes]]) -> Optional[bytes]:
+    """返回未过期的缓存响应体，过期或不存在时返回None"""
+    if cache is not None and time.monotonic() - cache[0] < _RESPONSE_CACHE_TTL:
+        return cache[1]
+    return None
+
+
+def _json_response(body: bytes) -> Response:
+    """使用已序列化的JSON构建响应"""
+    return Response(content=body, media_type="application/json")
+
+
+# 启动期间创建的后台任务（连接预热、SIGHUP触发的重新加载），保留引用避免任务在完成前被垃圾回收
+_background_tasks: Set[asyncio.Task] = set()
+
+
+def _spawn_background(coro) -> asyncio.Task:
+    """启动后台任务并保留引用，任务结束后自动移除"""
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
+
+
+async def _cancel_background_tasks() -> None:
+    """取消仍在运行的后台任务并等待其结束"""
+    tasks = list(_background_tasks)
+    for task in tasks:
+        task.cancel()
+    # return_exceptions=True 同时吞掉任务的 CancelledError
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+@asynccontextmanager
+async def _lifespan(_app: FastAPI) -> AsyncIterator[None]:
+    """应用的启动和关闭流程"""
+    await _init_http_client()
+    await _init_defaults()
+    try:
+        yield
+    finally:
+        # 先结束仍在使用共享HTTP客户端的后台任务，再关闭客户端
+        await _cancel_background_tasks()
+        await _close_http_client()
+        await _close_search_sessions()
+
+
 # Define the FastAPI app
-app = FastAPI()
+# 使用orjson作为默认的JSON序列化实现
+app = FastAPI(default_response_class=ORJSONResponse, lifespan=_lifespan)
+
+# 开发环境前端地址，使用集合做精确匹配
+_CORS_ORIGINS: Final[frozenset] = frozenset({"http://localhost:5173", "http://localhost:3000"})
 
-# 添加CORS中间件支持前端调用
+# 添加CORS中间件支持前端调用，预检结果由浏览器缓存一天
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["http://localhost:5173", "http://localhost:3000"],  # 开发环境前端地址
+    allow_origins=_CORS_ORIGINS,
     allow_credentials=True,
-    allow_methods=["*"],
+    allow_methods=["GET", "POST"],
     allow_headers=["*"],
+    max_age=86400,
 )
 
 
+async def _init_http_client():
+    """创建共享的HTTP连接池，供各提供商访问下游LLM服务时复用连接
+
+    安装了h2时启用HTTP/2，并发请求在同一个连接上多路复用。
+    """
+    app.state.http_client = httpx.AsyncClient(
+        http2=importlib.util.find_spec("h2") is not None,
+        limits=httpx.Limits(max_keepalive_connections=32, max_connections=64, keepalive_expiry=300),
+        timeout=httpx.Timeout(60.0, connect=10.0),
+    )
+    _FACTORY.set_http_client(app.state.http_client)
+
+    # 预热默认LLM提供商，避免第一个请求承担创建开销；
+    # 后台预先建立到各LLM服务端点的连接，不阻塞启动
+    if os.getenv("LLM_PREWARM", "1") == "1":
+        await asyncio.to_thread(_FACTORY.prewarm)
+        _spawn_background(_FACTORY.prewarm_connections())
+
+
+async def _close_http_client():
+    """关闭共享的HTTP连接池"""
+    http_client = getattr(app.state, "http_client", None)
+    if http_client is not None:
+        _FACTORY.set_http_client(None)
+        await http_client.aclose()
+        app.state.http_client = None
+
+
+async def _close_search_sessions():
+    """关闭各搜索提供商共享的HTTP会话"""
+    await SearchProviderFactory.aclose_all()
+
+
+async def _init_defaults():
+    """启动时计算默认提供商和默认配置响应体，避免每个请求重复检查各提供商的可用性
+
+    设置 RELOAD_ON_SIGHUP=1 时注册SIGHUP信号，收到信号时重新读取.env并重新计算。
+    只应在本应用独立运行（如直接用uvicorn启动）时开启：作为子应用挂载到LangGraph服务中时，
+    信号处理属于宿主服务器。
+    """
+    app.state.default_provider = _get_default_provider()
+    app.state.default_config_body = await _try_build_default_config_body()
+    
+    if os.getenv("RELOAD_ON_SIGHUP", "0") == "1":
+        try:
+            loop = asyncio.get_running_loop()
+            loop.add_signal_handler(signal.SIGHUP, lambda: _spawn_background(_reload_defaults()))
+        except (AttributeError, NotImplementedError, RuntimeError, ValueError):
+            # Windows没有SIGHUP；非主线程中运行时也无法注册信号
+            logger.warning("SIGHUP reload is not supported in this environment")
+
+
+def _current_default_provider() -> str:
+    """读取启动时计算的默认提供商，未经过启动流程时（如直接导入app）即时计算"""
+    default_provider = getattr(app.state, "default_provider", None)
+    if default_provider is None:
+        default_provider = _get_default_provider()
+        app.state.default_provider = default_provider
+    return default_provider
+
+
+async def _try_build_default_config_body() -> Optional[bytes]:
+    """构建默认配置响应体，失败时返回None（由请求时重新构建并返回错误）"""
+    try:
+        return orjson.dumps(await _build_default_config())
+    except Exception as e:
+        logger.warning("Failed to precompute default config: %s", e)
+        return None
+
+
+async def _reload_defaults() -> None:
+    """重新读取.env，重新计算默认提供商和默认配置，并清空相关的缓存和提供商实例"""
+    global _providers_cache, _last_reload
+    
+    from agent.configuration import ModelConfiguration
+    from agent.graph import clear_service_cache
+    from agent.llm_service import clear_response_cache, reset_llm_service
+    
+    _last_reload = time.monotonic()
+    load_dotenv(dotenv_path=env_path, override=True)
+    Configuration.clear_env_cache()
+    ModelConfiguration.clear_cache()
+    LLMProviderFactory.clear_caches()
+    SearchProviderFactory.clear_cache()
+    clear_response_cache()
+    # 研究流程和全局服务持有的提供商实例也要丢弃，之后按新配置重新创建
+    clear_service_cache()
+    reset_llm_service()
+    _get_provider.cache_clear()
+    _providers_cache = None
+    app.state.default_provider = _get_default_provider()
+    app.state.default_config_body = await _try_build_default_config_body()
+    logger.info("Reloaded defaults, default provider: %s", app.state.default_provider)
+
+
+# 手动刷新需要在请求头 X-Reload-Token 中提供 RELOAD_TOKEN，未设置RELOAD_TOKEN时不开放；
+# 两次刷新之间至少间隔 _RELOAD_MIN_INTERVAL 秒
+_RELOAD_MIN_INTERVAL = 10.0
+_last_reload = float("-inf")
+
+
+@app.post("/api/default-provider/refresh")
+async def refresh_default_provider(
+    x_reload_token: Optional[str] = Header(default=None)
+) -> Dict[str, str]:
+    """环境变量变化后重新计算默认提供商，并清空相关的缓存"""
+    reload_token = os.getenv("RELOAD_TOKEN")
+    if not reload_token:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if x_reload_token is None or not secrets.compare_digest(x_reload_token, reload_token):
+        raise HTTPException(status_code=403, detail="Invalid reload token")
+    if time.monotonic() - _last_reload < _RELOAD_MIN_INTERVAL:
+        raise HTTPException(status_code=429, detail="Reload requested too frequently")
+    
+    await _reload_defaults()
+    return {"default_provider": app.state.default_provider}
+
+
+_HEALTH_BODY: Final[bytes] = orjson.dumps({"status": "ok"})
+
+
+@app.get("/health", include_in_schema=False)
+async def health() -> Response:
+    """存活/就绪探针，不依赖任何提供商"""
+    return _json_response(_HEALTH_BODY)
+
+
 @app.get("/api/llm-providers")
-async def get_llm_providers() -> Dict[str, Any]:
+async def get_llm_providers() -> Response:
     """获取已配置的LLM提供商和模型列表 - 只返回配置完整的提供商"""
+    global _providers_cache
+    
+    body = _cached_body(_providers_cache)
+    if body is None:
+        body = orjson.dumps(await _build_llm_providers(), default=_orjson_default)
+        _providers_cache = (time.monotonic(), body)
+    return _json_response(body)
+
+
+def _probe_provider(provider_type: LLMProviderType):
+    """检查提供商是否可用（环境变量是否配置）并返回实例，不可用时返回None
+
+    可用性检查和SDK客户端初始化可能阻塞，由调用方放到线程池中执行。
+    """
+    if not _FACTORY.is_provider_available(provider_type):
+        return None
+    return _get_provider(provider_type)
+
+
+async def _build_llm_providers() -> Dict[str, Any]:
+    """构建提供商和模型列表的响应数据"""
     try:
-        factory = LLMProviderFactory()
         providers_info = {}
         
-        # 遍历所有提供商类型，但只包含已正确配置的
-        for provider_type in LLMProviderType:
-            try:
-                # 检查提供商是否可用（环境变量是否配置）
-                if factory.is_provider_available(provider_type):
-                    # 获取提供商实例
-                    provider = factory.create_provider(provider_type)
-                    
-                    # 获取模型列表（现在直接从配置读取，不进行网络调用）
-                    models = await provider.get_available_models()
-                    
-                    # 只包含有模型的提供商
-                    if models:
-                        providers_info[provider_type.value] = {
-                            "name": provider_type.value,
-                            "display_name": _get_provider_display_name(provider_type),
-                            "available": True,
-                            "models": [
-                                {
-                                    "id": model.id,
-                                    "name": model.name,
-                                    "description": model.description,
-                                    "context_length": model.max_tokens,
-                                    "supports_structured_output": model.supports_structured_output
-                                }
-                                for model in models
-                            ]
-                        }
-                # 忽略未配置的提供商，不将其包含在响应中
-            except Exception as e:
+        # 先在线程池中并发筛选已正确配置的提供商，再并发获取各自的模型列表
+        probes = await asyncio.gather(
+            *(asyncio.to_thread(_probe_provider, provider_type) for provider_type in _ALL_PROVIDERS),
+            return_exceptions=True
+        )
+        
+        available = []
+        for provider_type, provider in zip(_ALL_PROVIDERS, probes):
+            if isinstance(provider, Exception):
                 # 忽略配置错误的提供商，不将其包含在响应中
-                print(f"Skipping provider {provider_type} due to error: {e}")
+                logger.warning("Skipping provider %s due to error: %s", provider_type, provider)
+            elif provider is not None:
+                available.append((provider_type, provider))
+            # 忽略未配置的提供商，不将其包含在响应中
+        
+        models_list = await asyncio.gather(
+            *(provider.get_available_models() for _, provider in available),
+            return_exceptions=True
+        )
+        
+        for (provider_type, _), models in zip(available, models_list):
+            if isinstance(models, Exception):
+                logger.warning("Skipping provider %s due to error: %s", provider_type, models)
+                continue
+            
+            # 只包含有模型的提供商
+            if models:
+                providers_info[provider_type.value] = {
+                    "name": provider_type.value,
+                    "display_name": _get_provider_display_name(provider_type),
+                    "available": True,
+                    "models": [_to_provider_model(model) for model in models]
+                }
         
         # 确保至少有一个提供商可用
         if not providers_info:
             raise HTTPException(status_code=500, detail="No LLM providers are properly configured")
         
         # 获取默认提供商，如果默认提供商不在可用列表中，使用第一个可用的
-        default_provider = _get_default_provider()
+        default_provider = _current_default_provider()
         if default_provider not in providers_info:
             default_provider = next(iter(providers_info.keys()))
         
@@ -88,7 +380,7 @@ async def get_llm_providers() -> Dict[str, Any]:
         raise HTTPException(status_code=500, detail=f"Failed to get LLM providers: {str(e)}")
 
 
-@app.get("/api/llm-providers/{provider_name}/models")
+@app.get("/api/llm-providers/{provider_name}/models", response_model=ProviderModelsResponse)
 async def get_provider_models(provider_name: str) -> Dict[str, Any]:
     """获取特定提供商的模型列表"""
     try:
@@ -98,29 +390,16 @@ async def get_provider_models(provider_name: str) -> Dict[str, Any]:
         except ValueError:
             raise HTTPException(status_code=404, detail=f"Provider '{provider_name}' not found")
         
-        factory = LLMProviderFactory()
-        
-        # 检查提供商是否可用
-        if not factory.is_provider_available(provider_type):
+        # 检查提供商是否可用并获取实例
+        provider = await asyncio.to_thread(_probe_provider, provider_type)
+        if provider is None:
             raise HTTPException(status_code=400, detail=f"Provider '{provider_name}' is not available")
         
-        # 获取提供商实例和模型列表
-        provider = factory.create_provider(provider_type)
+        # 获取模型列表
         models = await provider.get_available_models()
         
-        return {
-            "provider": provider_name,
-            "models": [
-                {
-                    "id": model.id,
-                    "name": model.name,
-                    "description": model.description,
-                    "context_length": model.max_tokens,
-                    "supports_structured_output": model.supports_structured_output
-                }
-                for model in models
-            ]
-        }
+        # 直接返回LLMModel列表，由response_model按ProviderModel的字段投影
+        return {"provider": provider_name, "models": models}
         
     except HTTPException:
         raise
@@ -129,15 +408,22 @@ async def get_provider_models(provider_name: str) -> Dict[str, Any]:
 
 
 @app.get("/api/default-config")
-async def get_default_config() -> Dict[str, Any]:
+async def get_default_config() -> Response:
     """获取默认配置，包括默认的LLM provider、model和搜索provider"""
+    body = getattr(app.state, "default_config_body", None)
+    if body is None:
+        body = orjson.dumps(await _build_default_config())
+        app.state.default_config_body = body
+    return _json_response(body)
+
+
+async def _build_default_config() -> Dict[str, Any]:
+    """构建默认配置的响应数据"""
     try:
         from agent.configuration import ModelConfiguration
         
-        factory = LLMProviderFactory()
-        
         # 获取默认提供商
-        default_provider = _get_default_provider()
+        default_provider = _current_default_provider()
         
         # 获取默认模型
         default_models = ModelConfiguration.get_default_models_by_provider()
@@ -145,9 +431,9 @@ async def get_default_config() -> Dict[str, Any]:
         default_model = default_models.get(default_provider_type, "")
         
         # 如果没有找到默认模型，尝试获取该提供商的第一个可用模型
-        if not default_model and factory.is_provider_available(default_provider_type):
+        if not default_model and _FACTORY.is_provider_available(default_provider_type):
             try:
-                provider = factory.create_provider(default_provider_type)
+                provider = _get_provider(default_provider_type)
                 models = await provider.get_available_models()
                 if models:
                     default_model = models[0].id
@@ -171,73 +457,184 @@ async def get_default_config() -> Dict[str, Any]:
         raise HTTPException(status_code=500, detail=f"Failed to get default config: {str(e)}")
 
 
+# 提供商显示名称（只读）
+_DISPLAY_NAMES: Final[Mapping[LLMProviderType, str]] = MappingProxyType({
+    LLMProviderType.GEMINI: "Google Gemini",
+    LLMProviderType.AZURE_OPENAI: "Azure OpenAI",
+    LLMProviderType.AWS_BEDROCK: "AWS Bedrock",
+    LLMProviderType.OPENAI_COMPATIBLE: "OpenAI Compatible"
+})
+
+
 def _get_provider_display_name(provider_type: LLMProviderType) -> str:
     """获取提供商的显示名称"""
-    display_names = {
-        LLMProviderType.GEMINI: "Google Gemini",
-        LLMProviderType.AZURE_OPENAI: "Azure OpenAI",
-        LLMProviderType.AWS_BEDROCK: "AWS Bedrock",
-        LLMProviderType.OPENAI_COMPATIBLE: "OpenAI Compatible"
-    }
-    return display_names.get(provider_type, provider_type.value)
+    return _DISPLAY_NAMES.get(provider_type, provider_type.value)
 
 
 def _get_default_provider() -> str:
     """获取默认提供商"""
-    factory = LLMProviderFactory()
-    
     # 首先尝试使用环境变量中指定的默认提供商
     try:
-        default_type = factory.get_default_provider_type()
-        if factory.is_provider_available(default_type):
+        default_type = _FACTORY.get_default_provider_type()
+        if _FACTORY.is_provider_available(default_type):
             return default_type.value
     except Exception:
         pass
     
     # 如果默认提供商不可用，按优先级检查可用的提供商
-    priority_order = [
-        LLMProviderType.GEMINI,
-        LLMProviderType.AZURE_OPENAI,
-        LLMProviderType.AWS_BEDROCK,
-        LLMProviderType.OPENAI_COMPATIBLE
-    ]
-    
-    for provider_type in priority_order:
-        if factory.is_provider_available(provider_type):
+    for provider_type in _PRIORITY_ORDER:
+        if _FACTORY.is_provider_available(provider_type):
             return provider_type.value
     
     # 如果没有可用的提供商，返回Gemini作为默认值
     return LLMProviderType.GEMINI.value
 
 
-def create_frontend_router(build_dir="../frontend/dist"):
+# Vite构建产物放在 assets/ 目录下，文件名带有8位内容哈希，例如 assets/index-BwQ2x8Zk.js；
+# 其他文件（如 apple-touch-icon.png）即使名称相似也不是哈希文件名，不能长期缓存
+_HASHED_ASSET_DIR = "assets"
+_HASHED_ASSET_RE = re.compile(r"-[A-Za-z0-9_-]{8}\.[a-z0-9]+$")
+
+# 预压缩文件后缀及对应的Content-Encoding，按优先级排列
+_PRECOMPRESSED = ((".br", "br"), (".gz", "gzip"))
+
+
+def _parse_accept_encoding(header: str) -> Dict[str, float]:
+    """解析Accept-Encoding请求头，返回各编码（小写）对应的q值，未给出q值时为1"""
+    qualities: Dict[str, float] = {}
+    for item in header.split(","):
+        token, _, params = item.partition(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value.strip())
+                except ValueError:
+                    quality = 0.0
+        qualities[token] = quality
+    return qualities
+
+
+def _accepts_encoding(qualities: Mapping[str, float], encoding: str) -> bool:
+    """客户端是否接受该编码，q=0表示明确拒绝，未列出时按 * 的q值判断"""
+    return qualities.get(encoding, qualities.get("*", 0.0)) > 0
+
+
+class CachedStaticFiles(StaticFiles):
+    """带缓存头和预压缩支持的静态文件服务
+
+    - assets/ 下文件名带内容哈希的资源设置长期缓存，其他文件（如index.html）每次协商缓存
+    - 客户端支持时优先返回同目录下预压缩的 .br / .gz 文件
+    """
+
+    def file_response(self, full_path, stat_result, scope, status_code=200):
+        """返回文件响应，客户端接受时改为返回预压缩文件，并设置缓存相关的响应头"""
+        request_headers = Headers(scope=scope)
+        accepted = _parse_accept_encoding(request_headers.get("accept-encoding", ""))
+
+        response = None
+        for suffix, encoding in _PRECOMPRESSED:
+            if not _accepts_encoding(accepted, encoding):
+                continue
+            compressed_path = f"{full_path}{suffix}"
+            try:
+                compressed_stat = os.stat(compressed_path)
+            except OSError:
+                continue
+            response = FileResponse(
+                compressed_path,
+                status_code=status_code,
+                stat_result=compressed_stat,
+                media_type=mimetypes.guess_type(str(full_path))[0] or "text/plain",
+            )
+            response.headers["Content-Encoding"] = encoding
+            break
+
+        if response is None:
+            response = FileResponse(full_path, status_code=status_code, stat_result=stat_result)
+
+        response.headers["Vary"] = "Accept-Encoding"
+        directory, filename = os.path.split(full_path)
+        if os.path.basename(directory) == _HASHED_ASSET_DIR and _HASHED_ASSET_RE.search(filename):
+            response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+        else:
+            response.headers["Cache-Control"] = "no-cache"
+
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
+
+
+# 前端构建目录，进程内只解析一次
+_BUILD_PATH: Final[pathlib.Path] = (backend_dir / "../frontend/dist").resolve()
+
+
+def _load_index_html(build_path: pathlib.Path) -> Optional[bytes]:
+    """启动时读取index.html，构建产物不完整时返回None"""
+    if not build_path.is_dir():
+        return None
+    try:
+        return (build_path / "index.html").read_bytes()
+    except OSError:
+        return None
+
+
+# index.html 在进程内只读取一次，/app 入口直接返回内存中的内容
+_INDEX_HTML = _load_index_html(_BUILD_PATH)
+
+
+if _INDEX_HTML is not None:
+    @app.get("/app", include_in_schema=False)
+    @app.get("/app/", include_in_schema=False)
+    async def frontend_index():
+        """返回前端入口页面"""
+        return Response(
+            _INDEX_HTML,
+            media_type="text/html",
+            headers={"Cache-Control": "no-cache"},
+        )
+
+
+async def _frontend_not_built(request):
+    """前端未构建时的占位响应"""
+    return Response(
+        "Frontend not built. Run 'npm run build' in the frontend directory.",
+        media_type="text/plain",
+        status_code=503,
+    )
+
+
+def create_frontend_router(build_dir: Optional[str] = None):
     """Creates a router to serve the React frontend.
 
     Args:
-        build_dir: Path to the React build directory relative to this file.
+        build_dir: Path to the React build directory relative to the backend
+            directory. Defaults to ``../frontend/dist``.
 
     Returns:
         A Starlette application serving the frontend.
     """
-    build_path = pathlib.Path(__file__).parent.parent.parent / build_dir
+    if build_dir is None:
+        build_path = _BUILD_PATH
+        index_html = _INDEX_HTML
+    else:
+        build_path = (backend_dir / build_dir).resolve()
+        index_html = _load_index_html(build_path)
 
-    if not build_path.is_dir() or not (build_path / "index.html").is_file():
-        print(
-            f"WARN: Frontend build directory not found or incomplete at {build_path}. Serving frontend will likely fail."
+    if index_html is None:
+        logger.warning(
+            "Frontend build directory not found or incomplete at %s. Serving frontend will likely fail.",
+            build_path,
         )
         # Return a dummy router if build isn't ready
-        from starlette.routing import Route
-
-        async def dummy_frontend(request):
-            return Response(
-                "Frontend not built. Run 'npm run build' in the frontend directory.",
-                media_type="text/plain",
-                status_code=503,
-            )
-
-        return Route("/{path:path}", endpoint=dummy_frontend)
+        return Route("/{path:path}", endpoint=_frontend_not_built)
 
-    return StaticFiles(directory=build_path, html=True)
+    # 入口页面由上面的路由直接返回，这里只负责 /app/assets 等静态资源
+    return CachedStaticFiles(directory=build_path, html=True)
 
 
 # Mount the frontend under /app to not conflict with the LangGraph API routes
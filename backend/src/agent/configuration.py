@@ -3,91 +3,95 @@
 支持多LLM提供商的统一配置管理。
 """
 
+import logging
 import os
-from pydantic import BaseModel, Field
+from functools import lru_cache
+from pydantic import BaseModel, ConfigDict, Field
 from typing import Any, Optional, Dict, List
 from langchain_core.runnables import RunnableConfig
 
 from .llm_types import LLMProviderType
 
+logger = logging.getLogger(__name__)
+
 
 class Configuration(BaseModel):
     """Agent配置类
     
     统一管理所有配置参数，包括LLM提供商、搜索提供商等。
+    实例创建后不可修改，可以在多个节点和请求之间安全共享。
     """
 
+    model_config = ConfigDict(frozen=True, extra="ignore")
+
     # LLM提供商配置
     llm_provider: LLMProviderType = Field(
         default=LLMProviderType.GEMINI,
-        metadata={
-            "description": "LLM提供商类型: gemini, azure_openai, aws_bedrock, openai_compatible"
-        },
+        description="LLM提供商类型: gemini, azure_openai, aws_bedrock, openai_compatible",
     )
 
     query_generator_model: str = Field(
         default="gemini-2.0-flash",
-        metadata={
-            "description": "查询生成使用的模型"
-        },
+        description="查询生成使用的模型",
     )
 
     reflection_model: str = Field(
         default="gemini-2.5-flash",
-        metadata={
-            "description": "反思分析使用的模型"
-        },
+        description="反思分析使用的模型",
     )
 
     answer_model: str = Field(
         default="gemini-2.5-pro",
-        metadata={
-            "description": "答案生成使用的模型"
-        },
+        description="答案生成使用的模型",
     )
 
     # 搜索配置
     search_provider: str = Field(
         default="google",
-        metadata={"description": "搜索提供商: google, tavily"}
+        description="搜索提供商: google, tavily"
     )
 
     search_results_limit: int = Field(
         default=10,
-        metadata={"description": "每次搜索返回的结果数量限制"}
+        description="每次搜索返回的结果数量限制"
     )
 
     # 研究流程配置
     number_of_initial_queries: int = Field(
         default=3,
-        metadata={"description": "初始搜索查询数量"},
+        description="初始搜索查询数量",
     )
 
     max_research_loops: int = Field(
         default=2,
-        metadata={"description": "最大研究循环次数"},
+        description="最大研究循环次数",
     )
 
     # LLM生成参数
     temperature: float = Field(
         default=0.7,
-        metadata={"description": "LLM生成温度"}
+        description="LLM生成温度"
     )
 
     max_tokens: Optional[int] = Field(
         default=None,
-        metadata={"description": "最大生成token数"}
+        description="最大生成token数"
+    )
+
+    cache_llm_responses: bool = Field(
+        default=False,
+        description="是否缓存研究流程中查询生成、反思和最终答案的LLM响应，开启后相同的提示词直接复用之前的结果"
     )
 
     # 超时和重试配置
     request_timeout: float = Field(
         default=30.0,
-        metadata={"description": "请求超时时间（秒）"}
+        description="请求超时时间（秒）"
     )
 
     max_retries: int = Field(
         default=3,
-        metadata={"description": "最大重试次数"}
+        description="最大重试次数"
     )
 
     @classmethod
@@ -106,15 +110,15 @@ class Configuration(BaseModel):
             config["configurable"] if config and "configurable" in config else {}
         )
 
-        # 获取原始值，优先级：运行时配置 > 环境变量 > 默认值
-        raw_values: Dict[str, Any] = {}
-        for name in cls.model_fields.keys():
-            # 1. 运行时配置（来自前端）
-            runtime_value = configurable.get(name)
-            # 2. 环境变量
-            env_value = os.environ.get(name.upper())
-            # 3. 使用运行时配置，如果没有则使用环境变量
-            raw_values[name] = runtime_value if runtime_value is not None else env_value
+        # 获取原始值，优先级：运行时配置（来自前端） > 环境变量 > 默认值
+        raw_values: Dict[str, Any] = {
+            **_env_overrides(),
+            **{
+                name: value
+                for name, value in configurable.items()
+                if value is not None and name in cls.model_fields
+            },
+        }
 
         # 过滤掉None值和空字符串（将空字符串视为None）
         values = {k: v for k, v in raw_values.items() if v is not None and v != ""}
@@ -124,20 +128,27 @@ class Configuration(BaseModel):
             try:
                 values["llm_provider"] = LLMProviderType(values["llm_provider"])
             except ValueError:
-                print(f"Warning: Invalid LLM provider '{values['llm_provider']}', using default")
+                logger.warning("Invalid LLM provider '%s', using default", values["llm_provider"])
                 values.pop("llm_provider", None)
 
         return cls(**values)
 
     @classmethod
+    @lru_cache(maxsize=1)
     def from_environment(cls) -> "Configuration":
-        """从环境变量创建Configuration实例
+        """从环境变量创建Configuration实例（结果会被缓存）
         
         Returns:
             Configuration: 配置实例
         """
         return cls.from_runnable_config(None)
 
+    @staticmethod
+    def clear_env_cache() -> None:
+        """清除环境变量相关的缓存（环境变量变化后调用）"""
+        _env_overrides.cache_clear()
+        Configuration.from_environment.cache_clear()
+
     def get_llm_config(self) -> Dict[str, Any]:
         """获取LLM相关配置
         
@@ -221,13 +232,25 @@ class Configuration(BaseModel):
         return len(errors) == 0, errors
 
 
+@lru_cache(maxsize=1)
+def _env_overrides() -> Dict[str, str]:
+    """收集与配置字段同名（大写）的环境变量，进程内只扫描一次"""
+    return {
+        name: os.environ[name.upper()]
+        for name in Configuration.model_fields
+        if name.upper() in os.environ
+    }
+
+
 class ModelConfiguration:
     """模型配置管理器
     
-    管理不同提供商的可用模型列表。
+    管理不同提供商的可用模型列表。环境变量在运行期间不会变化，
+    因此解析结果会被缓存，返回值请勿修改。
     """
     
     @staticmethod
+    @lru_cache(maxsize=1)
     def get_available_models_by_provider() -> Dict[LLMProviderType, List[str]]:
         """获取各提供商的可用模型列表
         
@@ -255,6 +278,7 @@ class ModelConfiguration:
         return models
     
     @staticmethod
+    @lru_cache(maxsize=1)
     def get_default_models_by_provider() -> Dict[LLMProviderType, str]:
         """获取各提供商的默认模型
         
@@ -289,5 +313,20 @@ class ModelConfiguration:
         Returns:
             bool: 是否有效
         """
-        available_models = ModelConfiguration.get_available_models_by_provider()
-        return model in available_models.get(provider, [])
+        return model in ModelConfiguration._get_model_sets_by_provider().get(provider, frozenset())
+    
+    @staticmethod
+    @lru_cache(maxsize=1)
+    def _get_model_sets_by_provider() -> Dict[LLMProviderType, frozenset]:
+        """获取各提供商的模型集合，用于快速判断模型是否可用"""
+        return {
+            provider: frozenset(models)
+            for provider, models in ModelConfiguration.get_available_models_by_provider().items()
+        }
+    
+    @staticmethod
+    def clear_cache() -> None:
+        """清除缓存的模型配置（环境变量变更后调用）"""
+        ModelConfiguration.get_available_models_by_provider.cache_clear()
+        ModelConfiguration.get_default_models_by_provider.cache_clear()
+        ModelConfiguration._get_model_sets_by_provider.cache_clear()
@@ -1,39 +1,52 @@
+import asyncio
+import logging
 import os
+import re
+import time
+import uuid
+from functools import lru_cache
+from typing import Any, Dict, Mapping, Optional
 
 from agent.tools_and_schemas import SearchQueryList, Reflection
 from dotenv import load_dotenv
 from langchain_core.messages import AIMessage
+from langchain_core.utils.utils import LC_ID_PREFIX
 from langgraph.types import Send
 from langgraph.graph import StateGraph
 from langgraph.graph import START, END
 from langchain_core.runnables import RunnableConfig
-from google.genai import Client
 
 # 导入搜索提供商相关模块
 from agent.search_factory import SearchProviderFactory
-from agent.search_providers import SearchRequest
+from agent.search_providers import BaseSearchProvider, SearchProviderConfigError, SearchRequest
 
 # 导入LLM服务相关模块
 # 确保提供商注册
 from agent import provider_registry
 from agent.llm_service import get_llm_service, ConfigurableLLMService
-from agent.llm_types import LLMRequest, LLMTaskType
+from agent.llm_types import LLMRequest, LLMResponse, LLMTaskType
+from agent.logging_config import setup_logging
 
 from agent.state import (
     OverallState,
     QueryGenerationState,
     ReflectionState,
     WebSearchState,
+    WebResearchBatchState,
 )
 from agent.configuration import Configuration
 from agent.prompts import (
     get_current_date,
+    answer_instructions,
     query_writer_instructions,
-    web_searcher_instructions,
     reflection_instructions,
-    answer_instructions,
+    render_answer_input,
+    render_query_writer_input,
+    render_reflection_input,
+    render_web_searcher_instructions,
 )
 from agent.utils import (
+    get_genai_client,
     get_research_topic,
 )
 
@@ -46,7 +59,57 @@ if os.getenv("GEMINI_API_KEY") is None:
     raise ValueError("GEMINI_API_KEY is not set")
 
 # Used for Google Search API
-genai_client = Client(api_key=os.getenv("GEMINI_API_KEY"))
+genai_client = get_genai_client(os.getenv("GEMINI_API_KEY"))
+
+setup_logging()
+logger = logging.getLogger(__name__)
+
+# 引用和链接处理用到的正则表达式
+# 引用标记，单个或组合，如 [1] 或 [1, 2, 3]
+_CITATION_RE = re.compile(r'\[(\d+(?:\s*,\s*\d+)*)\]')
+# Gemini生成的 [label](https://vertexaisearch.cloud.google.com/...) 假链接
+_VERTEX_MD_RE = re.compile(r'\[([^\]]+)\]\(https://vertexaisearch\.cloud\.google\.com/[^)]+\)')
+# 单独出现的vertexaisearch链接
+_VERTEX_BARE_RE = re.compile(r'https://vertexaisearch\.cloud\.google\.com/[^\s\])]+')
+# markdown链接
+_MD_LINK_RE = re.compile(r'\[([^\]]+)\]\(([^)]+)\)')
+# 来源标题中的域名后缀，如 example.com 中的 .com
+_TLD_RE = re.compile(r'\.(?:com|cn|net|org)(?=$|[\s/])')
+
+
+def _current_date(state: Mapping[str, Any]) -> str:
+    """获取当前请求的日期，优先使用ensure_state_defaults中计算好的值，同一请求的所有提示词使用同一日期"""
+    return state.get("current_date") or get_current_date()
+
+
+def _research_topic(state: OverallState) -> str:
+    """获取研究主题，优先使用ensure_state_defaults中计算好的值"""
+    research_topic = state.get("research_topic")
+    if research_topic is None:
+        research_topic = get_research_topic(state.get("messages", []))
+    return research_topic
+
+
+@lru_cache(maxsize=32)
+def _get_service(llm_provider: str, reasoning_model: str) -> ConfigurableLLMService:
+    """获取（缓存的）LLM服务，相同的提供商和模型在节点和请求之间共用一个服务实例"""
+    return ConfigurableLLMService(overrides={
+        "llm_provider": llm_provider or None,
+        "reasoning_model": reasoning_model or None,
+    })
+
+
+def clear_service_cache() -> None:
+    """清空缓存的LLM服务（及其持有的提供商实例），重新加载配置后调用"""
+    _get_service.cache_clear()
+
+
+def _service_for(state: OverallState, config: RunnableConfig) -> ConfigurableLLMService:
+    """根据状态（用户选择）和运行时配置获取LLM服务，状态中的值优先"""
+    configurable = (config or {}).get("configurable", {})
+    llm_provider = (state.get("llm_provider") or "").strip() or configurable.get("llm_provider") or ""
+    reasoning_model = (state.get("reasoning_model") or "").strip() or configurable.get("reasoning_model") or ""
+    return _get_service(str(llm_provider), str(reasoning_model))
 
 
 # Nodes
@@ -71,56 +134,38 @@ async def generate_query(state: OverallState, config: RunnableConfig) -> QueryGe
 
     try:
         # 添加详细的状态调试信息
-        print(f"🐛 DEBUG: 当前状态的所有键: {list(state.keys())}")
-        print(f"🐛 DEBUG: 状态中的llm_provider值: {state.get('llm_provider')}")
-        print(f"🐛 DEBUG: 状态中的reasoning_model值: {state.get('reasoning_model')}")
-        
-        # 从状态中获取用户选择的参数
-        llm_provider_from_state = state.get("llm_provider")
-        reasoning_model_from_state = state.get("reasoning_model")
-        
-        # 创建修改过的config来传递状态参数给ConfigurableLLMService
-        modified_config = config.copy() if config else {}
-        if "configurable" not in modified_config:
-            modified_config["configurable"] = {}
-        
-        # 传递llm_provider
-        if llm_provider_from_state and llm_provider_from_state.strip():
-            modified_config["configurable"]["llm_provider"] = llm_provider_from_state
-            print(f"🔧 generate_query - 从状态获取llm_provider: {llm_provider_from_state}")
+        logger.debug("状态键: %s, llm_provider: %s, reasoning_model: %s", list(state.keys()), state.get("llm_provider"), state.get("reasoning_model"))
         
-        # 传递reasoning_model
-        if reasoning_model_from_state and reasoning_model_from_state.strip():
-            modified_config["configurable"]["reasoning_model"] = reasoning_model_from_state
-            print(f"🔧 generate_query - 从状态获取reasoning_model: {reasoning_model_from_state}")
-        
-        llm_service = ConfigurableLLMService(modified_config)
+        # 从状态中获取用户选择的参数，复用对应的LLM服务
+        llm_service = _service_for(state, config)
         
         # Format the prompt
-        current_date = get_current_date()
-        formatted_prompt = query_writer_instructions.format(
+        current_date = _current_date(state)
+        research_topic = _research_topic(state)
+        formatted_prompt = render_query_writer_input(
             current_date=current_date,
-            research_topic=get_research_topic(state["messages"]),
+            research_topic=research_topic,
             number_queries=state["initial_search_query_count"],
         )
         
         # 添加调试日志
-        print(f"🔍 generate_query: 准备调用LLM服务")
-        print(f"🔍 formatted_prompt长度: {len(formatted_prompt)}")
+        logger.debug("generate_query: 准备调用LLM服务, prompt长度: %d", len(formatted_prompt))
         
         # 从state中获取用户选择的模型，如果没有则使用配置默认值
         model = state.get("reasoning_model", configurable.query_generator_model)
-        print(f"🔍 generate_query - 使用模型: {model}")
-        print(f"🔍 generate_query - 模型来源: {'state' if state.get('reasoning_model') else 'config'}")
+        logger.debug("generate_query - 使用模型: %s (来源: %s)", model, "state" if state.get("reasoning_model") else "config")
         
         # 生成搜索查询 - 使用正确的LLMService接口
+        # 配置开启响应缓存时，完全相同的提示词直接复用服务层缓存的查询
         result = await llm_service.generate_structured(
             prompt=formatted_prompt,
+            system_prefix=query_writer_instructions,
             output_schema=SearchQueryList,
             model=model,
             task_type=LLMTaskType.QUERY_GENERATION,
             temperature=0.7,  # 降低temperature提高一致性
-            max_tokens=2000   # 增加token限制
+            max_tokens=2000,  # 增加token限制
+            cache=configurable.cache_llm_responses
         )
         
         # 验证结果
@@ -129,9 +174,9 @@ async def generate_query(state: OverallState, config: RunnableConfig) -> QueryGe
             
         return {"search_query": result.query}
     except Exception as e:
-        print(f"Error in generate_query: {e}")
+        logger.warning("Error in generate_query: %s", e)
         # 返回降级搜索查询
-        research_topic = get_research_topic(state["messages"])
+        research_topic = _research_topic(state)
         fallback_query = [research_topic] if research_topic else ["general search"]
         return {"search_query": fallback_query}
 
@@ -139,7 +184,7 @@ async def generate_query(state: OverallState, config: RunnableConfig) -> QueryGe
 def continue_to_web_research(state: OverallState):
     """LangGraph node that sends the search queries to the web research node.
 
-    This is used to spawn n number of web research nodes, one for each search query.
+    All queries are sent to a single web research node, which runs the searches concurrently.
     """
     # 安全访问 search_query
     search_queries = state.get("search_query", [])
@@ -151,38 +196,85 @@ def continue_to_web_research(state: OverallState):
     
     return [
         Send("web_research", {
-            "search_query": search_query, 
-            "id": int(idx),
-            "search_provider": search_provider
+            "search_queries": list(search_queries),
+            "id": 0,
+            "search_provider": search_provider,
+            "current_date": _current_date(state),
         })
-        for idx, search_query in enumerate(search_queries)
     ]
 
 
-async def web_research(state: WebSearchState, config: RunnableConfig) -> OverallState:
+async def web_research(state: WebResearchBatchState, config: RunnableConfig) -> OverallState:
     """LangGraph node that performs web research using configurable search providers.
 
-    Executes a web search using the configured search provider (Google, Tavily, etc.).
+    Executes one web search per query concurrently using the configured search provider
+    (Google, Tavily, etc.), then merges the results in query order.
 
     Args:
-        state: Current graph state containing the search query and research loop count
+        state: Current graph state containing the search queries and search provider
         config: Configuration for the runnable, including search provider settings
 
     Returns:
-        Dictionary with state update, including sources_gathered, research_loop_count, and web_research_results
+        Dictionary with state update, including sources_gathered, search_query, and web_research_results
     """
     # 获取配置
     configurable = Configuration.from_runnable_config(config)
     
     # 从状态中获取搜索提供商，如果没有则使用配置中的默认值
     search_provider_name = state.get("search_provider", configurable.search_provider)
+    search_queries = state.get("search_queries", [])
+    first_id = int(state.get("id", 0))
     
+    # 创建搜索提供商实例，同一批查询共用
+    search_provider = None
     try:
-        # 创建搜索提供商实例
-        print(f"🔍 使用搜索提供商: {search_provider_name}")
-        search_provider = SearchProviderFactory.create_provider(
-            search_provider_name
-        )
+        logger.debug("使用搜索提供商: %s", search_provider_name)
+        search_provider = SearchProviderFactory.create_provider(search_provider_name)
+    except Exception as e:
+        logger.warning("Search provider unavailable, falling back to Google Search: %s", e)
+    
+    results = await asyncio.gather(
+        *(
+            _research_query(
+                {
+                    "search_query": query,
+                    "id": str(first_id + idx),
+                    "search_provider": search_provider_name,
+                    "current_date": _current_date(state),
+                },
+                search_provider,
+                configurable,
+                config,
+            )
+            for idx, query in enumerate(search_queries)
+        ),
+        return_exceptions=True
+    )
+    
+    # 按查询顺序合并结果，finalize_answer依赖来源的顺序
+    merged: Dict[str, list] = {"sources_gathered": [], "search_query": [], "web_research_result": []}
+    for query, result in zip(search_queries, results):
+        if isinstance(result, BaseException):
+            logger.warning("Web research failed for query '%s': %s", query, result)
+            continue
+        for key in merged:
+            merged[key].extend(result.get(key, []))
+    
+    return merged
+
+
+async def _research_query(
+    state: WebSearchState,
+    search_provider: Optional[BaseSearchProvider],
+    configurable: Configuration,
+    config: RunnableConfig
+) -> OverallState:
+    """执行单个查询的搜索，搜索提供商失败时回退到原始的Google搜索方法"""
+    search_provider_name = state.get("search_provider", configurable.search_provider)
+    
+    try:
+        if search_provider is None:
+            raise SearchProviderConfigError(f"Search provider '{search_provider_name}' is not available")
         
         # 创建搜索请求
         search_request = SearchRequest(
@@ -202,10 +294,6 @@ async def web_research(state: WebSearchState, config: RunnableConfig) -> Overall
             real_url = source.get("url", "")
             title = source.get("title", "")
             
-            # 添加详细日志
-            print(f"🔗 处理来源{i+1}: URL={real_url[:100]}..." if len(real_url) > 100 else f"🔗 处理来源{i+1}: URL={real_url}")
-            print(f"📖 标题: {title}")
-            
             sources_gathered.append({
                 "label": short_url,
                 "short_url": short_url,
@@ -213,12 +301,12 @@ async def web_research(state: WebSearchState, config: RunnableConfig) -> Overall
                 "title": title
             })
         
-        print(f"✅ {search_provider_name}搜索完成: 获得{len(sources_gathered)}个来源，内容长度{len(search_result.content)}")
+        logger.debug("%s搜索完成: 获得%d个来源，内容长度%d", search_provider_name, len(sources_gathered), len(search_result.content))
         
         # 添加sources详细日志
-        for source in sources_gathered:
-            print(f"📚 来源详细信息: {source['short_url']} -> {source['value'][:50]}...")
-            print(f"    标题: {source['title']}")
+        if logger.isEnabledFor(logging.DEBUG):
+            for source in sources_gathered:
+                logger.debug("来源 %s -> %s (%s)", source["short_url"], source["value"], source["title"])
         
         return {
             "sources_gathered": sources_gathered,
@@ -227,22 +315,23 @@ async def web_research(state: WebSearchState, config: RunnableConfig) -> Overall
         }
         
     except Exception as e:
-                 # 如果搜索提供商失败，回退到原始的Google搜索方法
-         print(f"Search provider failed, falling back to Google Search: {e}")
-         return await _fallback_google_search(state, config)
+        # 如果搜索提供商失败，回退到原始的Google搜索方法
+        logger.warning("Search provider failed, falling back to Google Search: %s", e)
+        return await _fallback_google_search(state, config)
 
 
 async def _fallback_google_search(state: WebSearchState, config: RunnableConfig) -> OverallState:
     """原始的Google搜索实现，用作后备方案"""
     # Configure
     configurable = Configuration.from_runnable_config(config)
-    formatted_prompt = web_searcher_instructions.format(
-        current_date=get_current_date(),
+    formatted_prompt = render_web_searcher_instructions(
+        current_date=_current_date(state),
         research_topic=state["search_query"],
     )
 
     # Uses the google genai client as the langchain client doesn't return grounding metadata
-    response = genai_client.models.generate_content(
+    # 使用异步接口，等待模型响应期间不阻塞事件循环
+    response = await genai_client.aio.models.generate_content(
         model=configurable.query_generator_model,
         contents=formatted_prompt,
         config={
@@ -254,28 +343,23 @@ async def _fallback_google_search(state: WebSearchState, config: RunnableConfig)
     grounding_chunks = response.candidates[0].grounding_metadata.grounding_chunks
     
     # 构建来源列表 - 直接使用真实URL
-    sources_gathered = []
-    for i, chunk in enumerate(grounding_chunks):
-        if hasattr(chunk, 'web') and hasattr(chunk.web, 'uri'):
-            real_url = chunk.web.uri
-            title = getattr(chunk.web, 'title', f"搜索结果{i+1}")
-            sources_gathered.append({
-                "label": f"来源{i+1}",
-                "short_url": f"[{i+1}]",  # 简单的标记
-                "value": real_url,  # 使用真实URL
-                "title": title
-            })
+    sources_gathered = [
+        {
+            "label": f"来源{i+1}",
+            "short_url": f"[{i+1}]",  # 简单的标记
+            "value": web.uri,  # 使用真实URL
+            "title": getattr(web, 'title', f"搜索结果{i+1}")
+        }
+        for i, chunk in enumerate(grounding_chunks)
+        if (web := getattr(chunk, 'web', None)) is not None and getattr(web, 'uri', None) is not None
+    ]
     
     # 清理Gemini API自动生成的假链接
-    import re
-    
     # 移除所有形如 [label](https://vertexaisearch.cloud.google.com/...) 的假链接
-    pattern = r'\[([^\]]+)\]\(https://vertexaisearch\.cloud\.google\.com/[^)]+\)'
-    modified_text = re.sub(pattern, r'\1', response.text)
+    modified_text = _VERTEX_MD_RE.sub(r'\1', response.text)
     
     # 移除单独的vertexaisearch链接
-    pattern2 = r'https://vertexaisearch\.cloud\.google\.com/[^\s\])]+'
-    modified_text = re.sub(pattern2, '', modified_text).strip()
+    modified_text = _VERTEX_BARE_RE.sub('', modified_text).strip()
 
     return {
         "sources_gathered": sources_gathered,
@@ -304,68 +388,44 @@ async def reflection(state: OverallState, config: RunnableConfig) -> ReflectionS
     reasoning_model = state.get("reasoning_model", configurable.reflection_model)
 
     try:
-        # 从状态中获取用户选择的参数
-        llm_provider_from_state = state.get("llm_provider")
-        reasoning_model_from_state = state.get("reasoning_model")
-        
-        # 创建修改过的config来传递状态参数给ConfigurableLLMService
-        modified_config = config.copy() if config else {}
-        if "configurable" not in modified_config:
-            modified_config["configurable"] = {}
-        
-        # 传递llm_provider
-        if llm_provider_from_state and llm_provider_from_state.strip():
-            modified_config["configurable"]["llm_provider"] = llm_provider_from_state
-            print(f"🔧 reflection - 从状态获取llm_provider: {llm_provider_from_state}")
-        
-        # 传递reasoning_model
-        if reasoning_model_from_state and reasoning_model_from_state.strip():
-            modified_config["configurable"]["reasoning_model"] = reasoning_model_from_state
-            print(f"🔧 reflection - 从状态获取reasoning_model: {reasoning_model_from_state}")
-        
-        llm_service = ConfigurableLLMService(modified_config)
+        # 从状态中获取用户选择的参数，复用对应的LLM服务
+        llm_service = _service_for(state, config)
         
         # Format the prompt
-        current_date = get_current_date()
-        formatted_prompt = reflection_instructions.format(
+        current_date = _current_date(state)
+        formatted_prompt = render_reflection_input(
             current_date=current_date,
-            research_topic=get_research_topic(state.get("messages", [])),
+            research_topic=_research_topic(state),
             summaries="\n\n---\n\n".join(state.get("web_research_result", [])),
         )
         
         # 添加调试日志
-        print(f"🤔 reflection: 准备调用LLM服务")
-        print(f"🤔 formatted_prompt长度: {len(formatted_prompt)}")
-        print(f"🤔 使用模型: {reasoning_model}")
+        logger.debug("reflection: 准备调用LLM服务, prompt长度: %d, 模型: %s", len(formatted_prompt), reasoning_model)
         
         # 生成反思结果 - 使用正确的LLMService接口，增加token限制
+        # 配置开启响应缓存时，相同的研究结果直接复用服务层缓存的反思结果
         result = await llm_service.generate_structured(
             prompt=formatted_prompt,
+            system_prefix=reflection_instructions,
             output_schema=Reflection,
             model=reasoning_model,
             task_type=LLMTaskType.REFLECTION,
             temperature=0.7,  # 降低temperature提高一致性
-            max_tokens=4000   # 大幅增加token限制
+            max_tokens=4000,  # 大幅增加token限制
+            cache=configurable.cache_llm_responses
         )
         
-        print(f"🤔 反思结果对象: {result}")
-        print(f"🤔 反思结果类型: {type(result)}")
-        
+        logger.debug("反思结果: %r", result)
         # 正确提取结构化数据
         structured_data = result.structured_data if result else None
         
         if structured_data:
-            print(f"🤔 structured_data: {structured_data}")
-            print(f"🤔 structured_data 类型: {type(structured_data)}")
-            print(f"🤔 is_sufficient: {getattr(structured_data, 'is_sufficient', 'MISSING')}")
-            print(f"🤔 knowledge_gap: {getattr(structured_data, 'knowledge_gap', 'MISSING')}")
-            print(f"🤔 follow_up_queries: {getattr(structured_data, 'follow_up_queries', 'MISSING')}")
-            print(f"🤔 follow_up_queries 类型: {type(getattr(structured_data, 'follow_up_queries', None))}")
+            logger.debug("structured_data (%s): %s", type(structured_data).__name__, structured_data)
         else:
-            print("🤔 没有找到 structured_data")
+            logger.debug("没有找到 structured_data")
         
         follow_up_queries = getattr(structured_data, 'follow_up_queries', []) if structured_data else []
-        print(f"❓ 处理后的后续查询: {follow_up_queries}")
+        logger.debug("处理后的后续查询: %s", follow_up_queries)
 
         return {
             "is_sufficient": getattr(structured_data, 'is_sufficient', False) if structured_data else False,
@@ -375,7 +435,7 @@ async def reflection(state: OverallState, config: RunnableConfig) -> ReflectionS
             "number_of_ran_queries": len(state.get("search_query", [])),
         }
     except Exception as e:
-        print(f"Error in reflection: {e}")
+        logger.warning("Error in reflection: %s", e)
         # 返回默认值，表示研究充分
         return {
             "is_sufficient": True,
@@ -411,35 +471,61 @@ def evaluate_research(
     is_sufficient = state.get("is_sufficient", False)
     research_count = state.get("research_loop_count", 0)
     follow_up_queries = state.get("follow_up_queries", [])
-    print(f"🔄 评估研究状态: is_sufficient={is_sufficient}, research_count={research_count}, max_loops={max_research_loops}")
-    print(f"🔄 状态中的所有键: {list(state.keys())}")
-    print(f"🔄 从状态获取的follow_up_queries: {follow_up_queries}")
+    logger.debug("评估研究状态: is_sufficient=%s, research_count=%s, max_loops=%s", is_sufficient, research_count, max_research_loops)
+    logger.debug("follow_up_queries: %s", follow_up_queries)
     
     if is_sufficient or research_count >= max_research_loops:
-        print("✅ 研究充分，前往 finalize_answer")
+        logger.debug("研究充分，前往 finalize_answer")
         return "finalize_answer"
     else:
-        print("🔄 继续研究，生成更多查询")
-        print(f"📝 生成的后续查询: {follow_up_queries}")
+        logger.debug("继续研究，后续查询: %s", follow_up_queries)
         
         # 如果没有后续查询但还需要研究，强制结束并生成答案
         if not follow_up_queries:
-            print("⚠️ 没有后续查询但研究不充分，强制前往 finalize_answer")
+            logger.info("没有后续查询但研究不充分，强制前往 finalize_answer")
             return "finalize_answer"
         
         return [
             Send(
                 "web_research",
                 {
-                    "search_query": follow_up_query,
-                    "id": state.get("number_of_ran_queries", 0) + int(idx),
+                    "search_queries": list(follow_up_queries),
+                    "id": state.get("number_of_ran_queries", 0),
                     "search_provider": state.get("search_provider", "google"),
+                    "current_date": _current_date(state),
                 },
             )
-            for idx, follow_up_query in enumerate(follow_up_queries)
         ]
 
 
+def _replace_citation(match: "re.Match[str]", sources: list, used_sources: Dict[str, dict]) -> str:
+    """把引用标记（如 [1] 或 [1, 2, 3]）替换为对应来源的markdown链接
+
+    用到的来源以URL为键按首次出现的顺序记入used_sources；没有有效来源时保留原始标记。
+    """
+    links = []
+    for n in match.group(1).split(','):
+        ref_num = int(n)
+        if ref_num <= len(sources) and ref_num > 0:
+            source = sources[ref_num - 1]  # 转换为0索引
+            title = source.get("title", "")
+            real_url = source.get("value", "")
+            
+            if title and title.strip():
+                # 清理标题，移除可能的域名后缀
+                link_text = _TLD_RE.sub("", title) or title
+            else:
+                link_text = f"来源{ref_num}"
+            
+            if real_url:
+                links.append(f"[{link_text}]({real_url})")
+                used_sources.setdefault(real_url, source)
+        else:
+            logger.debug("引用数字 %d 超出来源范围 (最大: %d)", ref_num, len(sources))
+    
+    return " ".join(links) if links else match.group(0)
+
+
 async def finalize_answer(state: OverallState, config: RunnableConfig):
     """LangGraph node that finalizes the research summary.
 
@@ -453,201 +539,142 @@ async def finalize_answer(state: OverallState, config: RunnableConfig):
     Returns:
         Dictionary with state update, including running_summary key containing the formatted final summary with sources
     """
-    print("🔥 finalize_answer 函数被调用")
-    print(f"📊 状态信息: web_research_result数量={len(state.get('web_research_result', []))}")
-    print(f"📚 sources_gathered数量={len(state.get('sources_gathered', []))}")
+    logger.debug("finalize_answer: web_research_result数量=%d, sources_gathered数量=%d", len(state.get("web_research_result", [])), len(state.get("sources_gathered", [])))
     
     configurable = Configuration.from_runnable_config(config)
     reasoning_model = state.get("reasoning_model") or configurable.answer_model
-    print(f"🤖 使用模型: {reasoning_model}")
+    logger.debug("使用模型: %s", reasoning_model)
 
     try:
-        # 从状态中获取用户选择的参数
-        llm_provider_from_state = state.get("llm_provider")
-        reasoning_model_from_state = state.get("reasoning_model")
-        
-        # 创建修改过的config来传递状态参数给ConfigurableLLMService
-        modified_config = config.copy() if config else {}
-        if "configurable" not in modified_config:
-            modified_config["configurable"] = {}
-        
-        # 传递llm_provider
-        if llm_provider_from_state and llm_provider_from_state.strip():
-            modified_config["configurable"]["llm_provider"] = llm_provider_from_state
-            print(f"🔧 finalize_answer - 从状态获取llm_provider: {llm_provider_from_state}")
-        
-        # 传递reasoning_model
-        if reasoning_model_from_state and reasoning_model_from_state.strip():
-            modified_config["configurable"]["reasoning_model"] = reasoning_model_from_state
-            print(f"🔧 finalize_answer - 从状态获取reasoning_model: {reasoning_model_from_state}")
-        
-        llm_service = ConfigurableLLMService(modified_config)
+        # 从状态中获取用户选择的参数，复用对应的LLM服务
+        llm_service = _service_for(state, config)
         
         # Format the prompt with enhanced summaries including source information
-        current_date = get_current_date()
+        current_date = _current_date(state)
         research_results = state.get("web_research_result", [])
         all_sources = state.get("sources_gathered", [])
         
         # 创建增强的summaries，包含来源信息
         enhanced_summaries = []
         for i, result in enumerate(research_results):
-            enhanced_summary = f"## Research Result {i+1}\n\n{result}"
+            parts = ["## Research Result ", str(i + 1), "\n\n", result]
             
-            # 添加相关来源信息
-            if all_sources:
-                # 为每个research result添加对应的来源信息
-                sources_for_this_result = []
-                start_idx = i * 5  # 假设每个研究结果对应5个来源
-                end_idx = min(start_idx + 5, len(all_sources))
-                
-                for j in range(start_idx, end_idx):
-                    if j < len(all_sources):
-                        source = all_sources[j]
-                        sources_for_this_result.append(f"[{j+1}] {source.get('title', '')} - {source.get('value', '')}")
-                
-                if sources_for_this_result:
-                    enhanced_summary += f"\n\n**Available sources for this section:**\n" + "\n".join(sources_for_this_result)
+            # 为每个research result添加对应的来源信息，假设每个研究结果对应5个来源
+            sources_for_this_result = all_sources[i * 5:(i + 1) * 5]
+            if sources_for_this_result:
+                parts.append("\n\n**Available sources for this section:**\n")
+                parts.append("\n".join(
+                    f"[{j+1}] {source.get('title', '')} - {source.get('value', '')}"
+                    for j, source in enumerate(sources_for_this_result, start=i * 5)
+                ))
             
-            enhanced_summaries.append(enhanced_summary)
+            enhanced_summaries.append("".join(parts))
         
         # 如果没有研究结果但有来源，创建一个基本summary
         if not enhanced_summaries and all_sources:
-            basic_summary = "## Available Research Sources\n\n"
-            for i, source in enumerate(all_sources):
-                basic_summary += f"[{i+1}] {source.get('title', '')} - {source.get('value', '')}\n"
-            enhanced_summaries.append(basic_summary)
-        
-        formatted_prompt = answer_instructions.format(
+            enhanced_summaries.append("".join([
+                "## Available Research Sources\n\n",
+                *(
+                    f"[{i+1}] {source.get('title', '')} - {source.get('value', '')}\n"
+                    for i, source in enumerate(all_sources)
+                ),
+            ]))
+        
+        formatted_prompt = render_answer_input(
             current_date=current_date,
-            research_topic=get_research_topic(state.get("messages", [])),
+            research_topic=_research_topic(state),
             summaries="\n---\n\n".join(enhanced_summaries) if enhanced_summaries else "No research results available.",
         )
         
-        print(f"📝 增强的summaries包含 {len(enhanced_summaries)} 个部分")
-        print(f"🔗 总共 {len(all_sources)} 个可用来源")
-
-        # 添加调试日志
-        print(f"🔥 finalize_answer: 准备调用LLM服务")
-        print(f"🔥 formatted_prompt长度: {len(formatted_prompt)}")
-        print(f"🔥 使用模型: {reasoning_model}")
+        logger.debug("增强的summaries包含 %d 个部分, 共 %d 个可用来源", len(enhanced_summaries), len(all_sources))
+        logger.debug("finalize_answer: 准备调用LLM服务, prompt长度: %d, 模型: %s", len(formatted_prompt), reasoning_model)
+        
+        # 生成最终答案 - 流式生成，LangGraph把token转发给前端，前端在第一个token到达时即开始渲染
+        # 流式消息的ID由run_id决定，最终返回的AIMessage使用相同的ID，替换掉流式过程中未处理引用的内容
+        run_id = uuid.uuid4()
+        streamed_message_id = f"{LC_ID_PREFIX}-{run_id}"
+        streamed = False
+        
+        async def _generate_answer() -> LLMResponse:
+            nonlocal streamed
+            generation_params = dict(
+                prompt=formatted_prompt,
+                system_prefix=answer_instructions,
+                model=reasoning_model,
+                task_type=LLMTaskType.ANSWER_GENERATION,
+                temperature=0.3,  # 稍微提高一点creativity
+                max_tokens=8000,  # 增加token限制确保完整输出
+                cache=configurable.cache_llm_responses  # 开启时相同的研究结果直接复用缓存的答案
+            )
+            chunks = []
+            try:
+                async for delta in llm_service.generate_stream(
+                    config={**(config or {}), "run_id": run_id},
+                    **generation_params
+                ):
+                    chunks.append(delta)
+            except Exception as e:
+                if chunks:
+                    raise
+                logger.warning("流式生成失败，改为一次性生成: %s", e)
+                return await llm_service.generate(**generation_params)
+            streamed = True
+            return LLMResponse(
+                content="".join(chunks),
+                model=reasoning_model,
+                provider=llm_service.get_default_provider().get_provider_type(),
+            )
         
-        # 生成最终答案 - 使用正确的LLMService接口
-        result = await llm_service.generate(
-            prompt=formatted_prompt,
-            model=reasoning_model,
-            task_type=LLMTaskType.ANSWER_GENERATION,
-            temperature=0.3,  # 稍微提高一点creativity
-            max_tokens=8000   # 增加token限制确保完整输出
-        )
+        result = await _generate_answer()
 
         # 添加详细日志：显示LLM生成的原始内容
-        print(f"🤖 LLM生成的原始回复前200字符:")
-        print(f"   {result.content[:200] if result.content else 'None'}...")
+        logger.debug("LLM生成的原始回复前200字符: %s", result.content[:200] if result.content else None)
         
-        print(f"📚 状态中的所有来源:")
-        for i, source in enumerate(state.get("sources_gathered", [])):
-            print(f"   {i+1}. {source.get('short_url')} -> {source.get('value', '')[:50]}...")
-            print(f"      标题: {source.get('title', '')}")
-        
-        # 改进的URL替换逻辑
-        import re
-        unique_sources = []
+        # 改进的URL替换逻辑，用到的来源以URL为键去重
+        unique_sources: Dict[str, dict] = {}
         all_sources = state.get("sources_gathered", [])
         
-        print(f"🔄 开始URL替换处理，共有 {len(all_sources)} 个来源")
+        logger.debug("开始URL替换处理，共有 %d 个来源", len(all_sources))
         
         # 策略1: 使用正则表达式查找并替换所有引用格式
-        import re
-        
-        print(f"🔍 开始处理各种引用格式...")
-        print(f"📝 原始内容片段: {result.content[:200]}...")
-        
-        # 使用统一的正则表达式查找所有引用格式（单个和组合）
-        citation_pattern = r'\[(\d+(?:\s*,\s*\d+)*)\]'
-        
-        # 查找所有匹配的引用
-        matches = list(re.finditer(citation_pattern, result.content))
-        print(f"🔍 发现 {len(matches)} 个引用格式")
-        
-        # 从后往前替换，避免位置偏移问题
-        for match in reversed(matches):
-            full_match = match.group(0)  # 完整的匹配，如 [1] 或 [1, 2, 3]
-            ref_numbers_str = match.group(1)  # 数字部分，如 "1" 或 "1, 2, 3"
-            
-            print(f"🔍 处理引用: {full_match} (数字: {ref_numbers_str})")
-            
-            # 解析所有数字
-            ref_numbers = [int(n.strip()) for n in ref_numbers_str.split(',')]
-            print(f"📝 引用数字: {ref_numbers}")
-            
-            # 创建对应的链接
-            links = []
-            for ref_num in ref_numbers:
-                if ref_num <= len(all_sources) and ref_num > 0:
-                    source = all_sources[ref_num - 1]  # 转换为0索引
-                    title = source.get("title", "")
-                    real_url = source.get("value", "")
-                    
-                    if title and title.strip():
-                        # 清理标题，移除可能的域名后缀
-                        clean_title = title.replace(".com", "").replace(".cn", "").replace(".net", "").replace(".org", "")
-                        if not clean_title:
-                            clean_title = title
-                        link_text = clean_title
-                    else:
-                        link_text = f"来源{ref_num}"
-                    
-                    if real_url:
-                        links.append(f"[{link_text}]({real_url})")
-                        if source not in unique_sources:
-                            unique_sources.append(source)
-                else:
-                    print(f"⚠️ 引用数字 {ref_num} 超出来源范围 (最大: {len(all_sources)})")
-            
-            if links:
-                # 用链接替换引用
-                replacement = " ".join(links) if len(links) > 1 else links[0]
-                print(f"✅ 替换引用 {full_match} -> {replacement[:100]}...")
-                
-                # 使用match的位置信息进行精确替换
-                start, end = match.span()
-                result.content = result.content[:start] + replacement + result.content[end:]
+        # 使用统一的正则表达式一次性替换所有引用格式（单个和组合）；没有来源时无可替换
+        citation_count = 0
+        if all_sources and result.content:
+            result.content, citation_count = _CITATION_RE.subn(
+                lambda match: _replace_citation(match, all_sources, unique_sources),
+                result.content
+            )
         
-        print(f"🔄 总共处理了 {len(matches)} 个引用，使用了 {len(unique_sources)} 个来源")
+        logger.debug("处理了 %d 个引用，使用了 %d 个来源", citation_count, len(unique_sources))
         
-        # 策略2: 如果没有找到任何引用，尝试修复LLM可能创建的错误链接
-        if len(unique_sources) == 0 and result.content:
-            print("🔧 未找到标准引用格式，尝试修复可能的错误链接...")
+        # 策略2: 如果没有找到任何引用，尝试修复LLM可能创建的错误链接（需要有真实来源可替换）
+        if not unique_sources and all_sources and result.content:
+            logger.debug("未找到标准引用格式，尝试修复可能的错误链接")
             
             # 查找可能的markdown链接格式
-            markdown_links = re.findall(r'\[([^\]]+)\]\(([^)]+)\)', result.content)
-            print(f"🔍 发现 {len(markdown_links)} 个markdown链接")
+            markdown_links = _MD_LINK_RE.findall(result.content)
+            logger.debug("发现 %d 个markdown链接", len(markdown_links))
             
             for link_text, link_url in markdown_links:
-                print(f"🔍 检查链接: [{link_text}]({link_url})")
-                
                 # 如果链接包含localhost或者是无效的，尝试替换
                 if 'localhost' in link_url or link_url.startswith('http://localhost') or link_url == '#':
-                    print(f"🚨 发现无效链接: {link_url}")
+                    logger.debug("发现无效链接: %s", link_url)
                     
-                    # 尝试找到最合适的真实URL来替换
-                    if all_sources:
-                        # 使用第一个可用的真实URL
-                        replacement_source = all_sources[0]
-                        real_url = replacement_source.get("value", "")
-                        if real_url:
-                            print(f"🔄 替换无效链接为: {real_url[:50]}...")
-                            # 保持原来的链接文本，只替换URL
-                            result.content = result.content.replace(
-                                f"[{link_text}]({link_url})", 
-                                f"[{link_text}]({real_url})"
-                            )
-                            if replacement_source not in unique_sources:
-                                unique_sources.append(replacement_source)
+                    # 使用第一个可用的真实URL替换
+                    replacement_source = all_sources[0]
+                    real_url = replacement_source.get("value", "")
+                    if real_url:
+                        logger.debug("替换无效链接为: %s", real_url)
+                        # 保持原来的链接文本，只替换URL
+                        result.content = result.content.replace(
+                            f"[{link_text}]({link_url})", 
+                            f"[{link_text}]({real_url})"
+                        )
+                        unique_sources.setdefault(real_url, replacement_source)
         
         # 策略3: 如果仍然没有引用，但有来源，则在答案末尾添加来源列表
-        if len(unique_sources) == 0 and all_sources:
-            print("📚 添加来源列表到答案末尾...")
+        if not unique_sources and all_sources:
+            logger.debug("添加来源列表到答案末尾")
             sources_section = "\n\n## 参考来源\n\n"
             for i, source in enumerate(all_sources[:5]):  # 最多显示5个来源
                 real_url = source.get("value", "")
@@ -657,41 +684,36 @@ async def finalize_answer(state: OverallState, config: RunnableConfig):
                     # 创建更好的链接文本
                     if title and title.strip():
                         # 清理标题
-                        clean_title = title.replace(".com", "").replace(".cn", "").replace(".net", "").replace(".org", "")
-                        if not clean_title:
-                            clean_title = title
-                        link_text = clean_title
+                        link_text = _TLD_RE.sub("", title) or title
                     else:
                         link_text = f"来源{i+1}"
                     
                     sources_section += f"{i+1}. [{link_text}]({real_url})\n"
-                    unique_sources.append(source)
+                    unique_sources.setdefault(real_url, source)
             
             result.content += sources_section
-            print(f"✅ 添加了 {len(unique_sources)} 个来源到答案末尾")
+            logger.debug("添加了 %d 个来源到答案末尾", len(unique_sources))
 
-        print(f"✅ 生成的回复长度: {len(result.content) if result.content else 0}")
-        print(f"🔗 处理的来源数量: {len(unique_sources)}")
-        print(f"📝 替换后的回复前200字符:")
-        print(f"   {result.content[:200] if result.content else 'None'}...")
+        logger.debug("生成的回复长度: %d, 处理的来源数量: %d", len(result.content) if result.content else 0, len(unique_sources))
+        logger.debug("替换后的回复前200字符: %s", result.content[:200] if result.content else None)
         
         # 确保AIMessage有一个有效的ID
         ai_message = AIMessage(
             content=result.content if result.content else "抱歉，无法生成回复",
-            id=f"ai-{int(__import__('time').time() * 1000)}"
+            id=streamed_message_id if streamed else f"ai-{time.time_ns() // 1_000_000}"
         )
-        print(f"📤 返回消息ID: {ai_message.id}")
+        logger.debug("返回消息ID: %s", ai_message.id)
         
         return {
             "messages": [ai_message],
-            "sources_gathered": unique_sources,
+            "sources_gathered": list(unique_sources.values()),
         }
     except Exception as e:
-        print(f"Error in finalize_answer: {e}")
+        logger.error("Error in finalize_answer: %s", e)
         # 返回错误消息
         ai_message = AIMessage(
             content=f"抱歉，在生成最终答案时遇到错误: {str(e)}",
-            id=f"ai-{int(__import__('time').time() * 1000)}"
+            id=f"ai-{time.time_ns() // 1_000_000}"
         )
         return {
             "messages": [ai_message],
@@ -719,6 +741,9 @@ def ensure_state_defaults(state: OverallState) -> OverallState:
         if key not in state:
             state[key] = default_value
     
+    # 研究主题在整个流程中不变，只计算一次；多轮对话时随新消息重新计算
+    state["research_topic"] = get_research_topic(state["messages"]) if state["messages"] else ""
+    state["current_date"] = get_current_date()
     return state
 
 
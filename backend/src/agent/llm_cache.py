@@ -0,0 +1,56 @@
+"""LLM调用结果缓存
+
+以 提供商+模型+输出结构+提示词 等请求参数的SHA256为键精确匹配，LRU淘汰，条目有过期时间。
+"""
+
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Any, Optional, Tuple
+
+
+class ExactCache:
+    """按键精确匹配的LRU缓存"""
+
+    def __init__(self, maxsize: int = 256, ttl: float = 86400.0):
+        """初始化缓存
+
+        Args:
+            maxsize: 最多保留的条目数
+            ttl: 条目的过期时间（秒）
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: OrderedDict[str, Tuple[float, Any]] = OrderedDict()
+
+    @staticmethod
+    def make_key(*parts: str) -> str:
+        """由多个字符串片段生成缓存键"""
+        return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Any]:
+        """获取未过期的缓存值，不存在时返回None"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        created_at, value = entry
+        if time.monotonic() - created_at > self.ttl:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any) -> None:
+        """写入缓存，超出容量时淘汰最久未使用的条目"""
+        self._entries[key] = (time.monotonic(), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """清空缓存"""
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        """返回缓存中的条目数（包括尚未清理的过期条目）"""
+        return len(self._entries)
@@ -3,8 +3,14 @@
 负责创建和管理不同的LLM提供商实例。
 """
 
+import asyncio
+import functools
+import logging
 import os
-from typing import Dict, Any, List, Optional, Type
+import sys
+from typing import Dict, Any, List, NamedTuple, Optional, Tuple, Type
+
+import httpx
 
 # 导入provider_registry以确保所有提供商都被注册
 from . import provider_registry
@@ -21,6 +27,111 @@ from .llm_types import (
 )
 from .llm_providers import BaseLLMProvider, LLMProviderRegistry
 
+logger = logging.getLogger(__name__)
+
+
+@functools.cache
+def _env(key: str, default: Optional[str] = None) -> Optional[str]:
+    """读取环境变量，结果会被缓存，环境变量变化后需调用 LLMProviderFactory.clear_caches()"""
+    return os.getenv(key, default)
+
+
+@functools.cache
+def _parse_models(models_str: str) -> Tuple[str, ...]:
+    """解析逗号分隔的模型列表，模型名称经过驻留，各配置和请求中的同名模型共用一个字符串"""
+    return tuple(sys.intern(model.strip()) for model in models_str.split(","))
+
+
+# LLM_PROVIDER 取值到提供商类型的映射
+_PROVIDER_NAME_MAP: Dict[str, LLMProviderType] = {
+    provider_type.value.upper(): provider_type for provider_type in LLMProviderType
+}
+
+
+class _ConfigSchema(NamedTuple):
+    """从环境变量构建提供商配置的描述"""
+    config_class: Type[LLMProviderConfig]
+    prefix: str  # 模型列表/默认模型/超时/重试等通用环境变量的前缀
+    required: Tuple[Tuple[str, str], ...]  # (配置字段, 环境变量)，缺一不可
+    optional: Tuple[Tuple[str, str, str], ...]  # (配置字段, 环境变量, 默认值)
+    default_models: str
+    missing_message: str
+
+
+_CONFIG_SCHEMAS: Dict[LLMProviderType, _ConfigSchema] = {
+    LLMProviderType.GEMINI: _ConfigSchema(
+        config_class=GeminiProviderConfig,
+        prefix="GEMINI",
+        required=(("api_key", "GEMINI_API_KEY"),),
+        optional=(),
+        default_models="gemini-2.0-flash,gemini-2.5-flash,gemini-2.5-pro",
+        missing_message="GEMINI_API_KEY environment variable is required",
+    ),
+    LLMProviderType.AZURE_OPENAI: _ConfigSchema(
+        config_class=AzureOpenAIProviderConfig,
+        prefix="AZURE_OPENAI",
+        required=(
+            ("api_key", "AZURE_OPENAI_API_KEY"),
+            ("endpoint", "AZURE_OPENAI_ENDPOINT"),
+            ("api_version", "AZURE_OPENAI_API_VERSION"),
+        ),
+        optional=(),
+        default_models="gpt-4,gpt-4-turbo,gpt-35-turbo",
+        missing_message=(
+            "AZURE_OPENAI_API_KEY, AZURE_OPENAI_ENDPOINT, and AZURE_OPENAI_API_VERSION "
+            "environment variables are required"
+        ),
+    ),
+    LLMProviderType.AWS_BEDROCK: _ConfigSchema(
+        config_class=BedrockProviderConfig,
+        prefix="BEDROCK",
+        required=(
+            ("access_key_id", "AWS_ACCESS_KEY_ID"),
+            ("secret_access_key", "AWS_SECRET_ACCESS_KEY"),
+            ("region", "AWS_REGION"),
+        ),
+        optional=(("api_key", "", ""),),  # Bedrock uses AWS credentials
+        default_models="anthropic.claude-3-sonnet-20240229-v1:0,anthropic.claude-3-haiku-20240307-v1:0",
+        missing_message=(
+            "AWS_ACCESS_KEY_ID, AWS_SECRET_ACCESS_KEY, and AWS_REGION "
+            "environment variables are required"
+        ),
+    ),
+    LLMProviderType.OPENAI_COMPATIBLE: _ConfigSchema(
+        config_class=OpenAICompatibleProviderConfig,
+        prefix="OPENAI_COMPATIBLE",
+        # 对于OpenAI兼容提供商，至少需要base_url
+        required=(("base_url", "OPENAI_COMPATIBLE_BASE_URL"),),
+        # api_key对于本地模型可能是可选的
+        optional=(("api_key", "OPENAI_COMPATIBLE_API_KEY", ""),),
+        default_models="gpt-3.5-turbo,gpt-4",
+        missing_message="OPENAI_BASE_URL environment variable is required for OpenAI Compatible provider",
+    ),
+}
+
+
+def _build_config(schema: _ConfigSchema) -> LLMProviderConfig:
+    """按描述从环境变量构建提供商配置
+
+    Raises:
+        LLMProviderConfigError: 当必需的环境变量缺失时
+    """
+    kwargs: Dict[str, Any] = {}
+    for field, env_var in schema.required:
+        value = _env(env_var)
+        if not value:
+            raise LLMProviderConfigError(schema.missing_message)
+        kwargs[field] = value
+    for field, env_var, default in schema.optional:
+        kwargs[field] = (_env(env_var) if env_var else None) or default
+
+    models = _parse_models(_env(f"{schema.prefix}_MODELS", schema.default_models))
+    kwargs["models"] = models
+    kwargs["default_model"] = sys.intern(_env(f"{schema.prefix}_DEFAULT_MODEL", models[0]))
+    kwargs["timeout"] = float(_env(f"{schema.prefix}_TIMEOUT", "30.0"))
+    kwargs["max_retries"] = int(_env(f"{schema.prefix}_MAX_RETRIES", "3"))
+    return schema.config_class(**kwargs)
+
 
 class LLMProviderFactory:
     """LLM提供商工厂类
@@ -29,7 +140,15 @@ class LLMProviderFactory:
     """
     
     _instance: Optional['LLMProviderFactory'] = None
-    _providers_cache: Dict[str, BaseLLMProvider] = {}
+    # 提供商实例缓存：类型 -> 配置对象 -> 实例，使用环境变量默认配置的实例以 _DEFAULT_CONFIG_KEY 为键；
+    # 配置对象不可修改且按字段值哈希，内容相同的配置对象共享同一个实例
+    _providers_cache: Dict[LLMProviderType, Dict[Optional[LLMProviderConfig], BaseLLMProvider]] = {}
+    _DEFAULT_CONFIG_KEY = None
+    # 由环境变量生成的默认配置，按类型缓存
+    _default_config_cache: Dict[LLMProviderType, LLMProviderConfig] = {}
+    # 各提供商的配置是否完整
+    _availability_cache: Dict[LLMProviderType, bool] = {}
+    _http_client: Optional[httpx.AsyncClient] = None
     
     def __new__(cls) -> 'LLMProviderFactory':
         """单例模式"""
@@ -41,13 +160,15 @@ class LLMProviderFactory:
     def create_provider(
         cls, 
         provider_type: LLMProviderType, 
-        config: Optional[LLMProviderConfig] = None
+        config: Optional[LLMProviderConfig] = None,
+        http_client: Optional[httpx.AsyncClient] = None
     ) -> BaseLLMProvider:
         """根据配置创建LLM提供商实例
         
         Args:
             provider_type: 提供商类型
             config: 提供商配置，如果为None则从环境变量获取
+            http_client: 提供商使用的异步HTTP客户端，为None时使用共享客户端（如已设置）
             
         Returns:
             BaseLLMProvider: LLM提供商实例
@@ -55,10 +176,17 @@ class LLMProviderFactory:
         Raises:
             LLMProviderConfigError: 当提供商不存在或配置无效时
         """
-        # 使用缓存避免重复创建
-        cache_key = f"{provider_type}_{hash(str(config))}"
-        if cache_key in cls._providers_cache:
-            return cls._providers_cache[cache_key]
+        # 使用缓存避免重复创建，默认配置的情况下命中缓存时不再读取环境变量
+        cache = cls._providers_cache.get(provider_type)
+        if cache is None:
+            cache = cls._providers_cache[provider_type] = {}
+        cache_key = cls._DEFAULT_CONFIG_KEY if config is None else config
+        
+        provider = cache.get(cache_key)
+        if provider is not None:
+            if http_client is not None:
+                provider.set_http_client(http_client)
+            return provider
         
         # 如果没有提供配置，从环境变量获取
         if config is None:
@@ -67,34 +195,68 @@ class LLMProviderFactory:
         # 获取提供商类并创建实例
         provider_class = LLMProviderRegistry.get_provider_class(provider_type)
         provider = provider_class(config)
+        provider.set_http_client(http_client or cls._http_client)
         
         # 缓存实例
-        cls._providers_cache[cache_key] = provider
+        cache[cache_key] = provider
         
         return provider
     
     @classmethod
-    def get_available_providers(cls) -> List[LLMProviderType]:
+    def set_http_client(cls, http_client: Optional[httpx.AsyncClient]) -> None:
+        """设置所有提供商共享的异步HTTP客户端
+        
+        已创建的提供商实例也会切换到该客户端。
+        
+        Args:
+            http_client: 共享的httpx异步客户端，None表示恢复SDK默认客户端
+        """
+        cls._http_client = http_client
+        for cache in cls._providers_cache.values():
+            for provider in cache.values():
+                provider.set_http_client(http_client)
+    
+    @classmethod
+    def clear_caches(cls) -> None:
+        """清空环境变量相关的缓存（包括由默认配置创建的提供商），在重新加载.env后调用"""
+        _env.cache_clear()
+        _parse_models.cache_clear()
+        cls._default_config_cache.clear()
+        for cache in cls._providers_cache.values():
+            cache.pop(cls._DEFAULT_CONFIG_KEY, None)
+        cls.get_default_provider_type.cache_clear()
+        cls.reset_availability_cache()
+    
+    @classmethod
+    def reset_availability_cache(cls) -> None:
+        """清空提供商可用性的缓存结果"""
+        cls._availability_cache.clear()
+    
+    @classmethod
+    def get_available_providers(cls) -> Tuple[LLMProviderType, ...]:
         """获取所有可用的LLM提供商列表
         
         Returns:
-            List[LLMProviderType]: 可用提供商类型列表
+            Tuple[LLMProviderType, ...]: 可用提供商类型
         """
         return LLMProviderRegistry.get_available_types()
     
     @classmethod
+    @functools.lru_cache(maxsize=1)
     def get_default_provider_type(cls) -> LLMProviderType:
         """获取默认提供商类型
         
+        结果会被缓存，环境变量变化后需调用 clear_caches()
+        
         Returns:
             LLMProviderType: 默认提供商类型
         """
         provider_name = os.getenv("LLM_PROVIDER", "GOOGLE_GEMINI").upper()
-        try:
-            return LLMProviderType(provider_name)
-        except ValueError:
-            print(f"Warning: Unknown provider '{provider_name}', using Gemini as default")
+        provider_type = _PROVIDER_NAME_MAP.get(provider_name)
+        if provider_type is None:
+            logger.warning("Unknown provider '%s', using Gemini as default", provider_name)
             return LLMProviderType.GEMINI
+        return provider_type
     
     @classmethod
     def create_default_provider(cls) -> BaseLLMProvider:
@@ -106,10 +268,58 @@ class LLMProviderFactory:
         provider_type = cls.get_default_provider_type()
         return cls.create_provider(provider_type)
     
+    @classmethod
+    def prewarm(cls, provider_types: Optional[List[LLMProviderType]] = None) -> None:
+        """预先创建提供商实例，避免第一个请求承担创建开销
+        
+        同时创建一次默认模型的LangChain实例，使SDK的延迟导入在此时完成。
+        预热失败不影响之后按需创建。
+        
+        Args:
+            provider_types: 需要预热的提供商类型，为None时只预热默认提供商
+        """
+        if provider_types is None:
+            provider_types = [cls.get_default_provider_type()]
+        
+        for provider_type in provider_types:
+            try:
+                provider = cls.create_provider(provider_type)
+                provider.get_langchain_llm(model=provider.get_default_model())
+            except Exception as e:
+                logger.warning("Prewarm skipped for %s: %s", provider_type, e)
+    
+    @classmethod
+    async def prewarm_connections(cls) -> None:
+        """用共享HTTP客户端预先连接各可用提供商的服务端点
+        
+        向配置了端点地址的提供商（Azure OpenAI、OpenAI兼容服务）各发送一个HEAD请求，
+        提前完成TCP和TLS握手，之后的请求直接复用连接池中的连接。
+        未设置共享HTTP客户端时不做任何事，连接失败不影响之后的请求。
+        """
+        http_client = cls._http_client
+        if http_client is None:
+            return
+        
+        urls = set()
+        for provider_type in cls.get_available_providers():
+            if not cls.is_provider_available(provider_type):
+                continue
+            config = cls._get_default_config(provider_type)
+            url = getattr(config, "endpoint", None) or getattr(config, "base_url", None)
+            if url:
+                urls.add(url)
+        
+        await asyncio.gather(
+            *(http_client.head(url, timeout=10.0) for url in urls),
+            return_exceptions=True
+        )
+    
     @classmethod
     def _get_default_config(cls, provider_type: LLMProviderType) -> LLMProviderConfig:
         """从环境变量获取默认配置
         
+        结果按提供商类型缓存；配置缺失时抛出的异常不缓存，补全环境变量后可重试。
+        
         Args:
             provider_type: 提供商类型
             
@@ -119,145 +329,58 @@ class LLMProviderFactory:
         Raises:
             LLMProviderConfigError: 当必需的环境变量缺失时
         """
-        if provider_type == LLMProviderType.GEMINI:
-            return cls._get_gemini_config()
-        elif provider_type == LLMProviderType.AZURE_OPENAI:
-            return cls._get_azure_openai_config()
-        elif provider_type == LLMProviderType.AWS_BEDROCK:
-            return cls._get_bedrock_config()
-        elif provider_type == LLMProviderType.OPENAI_COMPATIBLE:
-            return cls._get_openai_compatible_config()
-        else:
+        config = cls._default_config_cache.get(provider_type)
+        if config is not None:
+            return config
+        
+        schema = _CONFIG_SCHEMAS.get(provider_type)
+        if schema is None:
             raise LLMProviderConfigError(f"Unsupported provider type: {provider_type}")
-    
-    @classmethod
-    def _get_gemini_config(cls) -> GeminiProviderConfig:
-        """获取Gemini配置"""
-        api_key = os.getenv("GEMINI_API_KEY")
-        if not api_key:
-            raise LLMProviderConfigError("GEMINI_API_KEY environment variable is required")
-        
-        models_str = os.getenv("GEMINI_MODELS", "gemini-2.0-flash,gemini-2.5-flash,gemini-2.5-pro")
-        models = [model.strip() for model in models_str.split(",")]
-        default_model = os.getenv("GEMINI_DEFAULT_MODEL", models[0])
-        
-        return GeminiProviderConfig(
-            api_key=api_key,
-            models=models,
-            default_model=default_model,
-            timeout=float(os.getenv("GEMINI_TIMEOUT", "30.0")),
-            max_retries=int(os.getenv("GEMINI_MAX_RETRIES", "3"))
-        )
-    
-    @classmethod
-    def _get_azure_openai_config(cls) -> AzureOpenAIProviderConfig:
-        """获取Azure OpenAI配置"""
-        api_key = os.getenv("AZURE_OPENAI_API_KEY")
-        endpoint = os.getenv("AZURE_OPENAI_ENDPOINT")
-        api_version = os.getenv("AZURE_OPENAI_API_VERSION")
-        
-        if not all([api_key, endpoint, api_version]):
-            raise LLMProviderConfigError(
-                "AZURE_OPENAI_API_KEY, AZURE_OPENAI_ENDPOINT, and AZURE_OPENAI_API_VERSION "
-                "environment variables are required"
-            )
-        
-        models_str = os.getenv("AZURE_OPENAI_MODELS", "gpt-4,gpt-4-turbo,gpt-35-turbo")
-        models = [model.strip() for model in models_str.split(",")]
-        default_model = os.getenv("AZURE_OPENAI_DEFAULT_MODEL", models[0])
-        
-        return AzureOpenAIProviderConfig(
-            api_key=api_key,
-            endpoint=endpoint,
-            api_version=api_version,
-            models=models,
-            default_model=default_model,
-            timeout=float(os.getenv("AZURE_OPENAI_TIMEOUT", "30.0")),
-            max_retries=int(os.getenv("AZURE_OPENAI_MAX_RETRIES", "3"))
-        )
-    
-    @classmethod
-    def _get_bedrock_config(cls) -> BedrockProviderConfig:
-        """获取AWS Bedrock配置"""
-        access_key_id = os.getenv("AWS_ACCESS_KEY_ID")
-        secret_access_key = os.getenv("AWS_SECRET_ACCESS_KEY")
-        region = os.getenv("AWS_REGION")
-        
-        if not all([access_key_id, secret_access_key, region]):
-            raise LLMProviderConfigError(
-                "AWS_ACCESS_KEY_ID, AWS_SECRET_ACCESS_KEY, and AWS_REGION "
-                "environment variables are required"
-            )
-        
-        models_str = os.getenv("BEDROCK_MODELS", "anthropic.claude-3-sonnet-20240229-v1:0,anthropic.claude-3-haiku-20240307-v1:0")
-        models = [model.strip() for model in models_str.split(",")]
-        default_model = os.getenv("BEDROCK_DEFAULT_MODEL", models[0])
-        
-        return BedrockProviderConfig(
-            api_key="",  # Bedrock uses AWS credentials
-            region=region,
-            access_key_id=access_key_id,
-            secret_access_key=secret_access_key,
-            models=models,
-            default_model=default_model,
-            timeout=float(os.getenv("BEDROCK_TIMEOUT", "30.0")),
-            max_retries=int(os.getenv("BEDROCK_MAX_RETRIES", "3"))
-        )
-    
-    @classmethod
-    def _get_openai_compatible_config(cls) -> OpenAICompatibleProviderConfig:
-        """获取OpenAI兼容配置"""
-        api_key = os.getenv("OPENAI_COMPATIBLE_API_KEY")
-        base_url = os.getenv("OPENAI_COMPATIBLE_BASE_URL")
         
-        # 对于OpenAI兼容提供商，至少需要base_url
-        # api_key对于本地模型可能是可选的
-        if not base_url:
-            raise LLMProviderConfigError(
-                "OPENAI_BASE_URL environment variable is required for OpenAI Compatible provider"
-            )
-        
-        models_str = os.getenv("OPENAI_COMPATIBLE_MODELS", "gpt-3.5-turbo,gpt-4")
-        models = [model.strip() for model in models_str.split(",")]
-        default_model = os.getenv("OPENAI_COMPATIBLE_DEFAULT_MODEL", models[0])
-        
-        return OpenAICompatibleProviderConfig(
-            api_key=api_key or "",  # 允许空的API key用于本地模型
-            base_url=base_url,
-            models=models,
-            default_model=default_model,
-            timeout=float(os.getenv("OPENAI_COMPATIBLE_TIMEOUT", "30.0")),
-            max_retries=int(os.getenv("OPENAI_COMPATIBLE_MAX_RETRIES", "3"))
-        )
+        config = _build_config(schema)
+        cls._default_config_cache[provider_type] = config
+        return config
     
     @classmethod
     async def get_all_available_models(cls) -> Dict[LLMProviderType, List[LLMModel]]:
         """获取所有已配置提供商的可用模型
         
-        只返回配置完整且可用的提供商模型列表
+        只返回配置完整且可用的提供商模型列表，各提供商并发查询
         
         Returns:
             Dict[LLMProviderType, List[LLMModel]]: 按提供商分组的模型列表
         """
-        all_models = {}
-        
-        for provider_type in cls.get_available_providers():
+        provider_types = []
+        registered_types = cls.get_available_providers()
+        for provider_type in registered_types:
             # 检查提供商是否已正确配置
             if not cls.is_provider_available(provider_type):
-                print(f"Skipping {provider_type}: not properly configured")
+                logger.info("Skipping %s: not properly configured", provider_type)
                 continue
-                
-            try:
-                provider = cls.create_provider(provider_type)
-                models = await provider.get_available_models()
-                if models:  # 只包含有模型的提供商
-                    all_models[provider_type] = models
-            except Exception as e:
-                print(f"Failed to get models for {provider_type}: {e}")
+            provider_types.append(provider_type)
+        
+        results = await asyncio.gather(
+            *(cls._fetch_models(provider_type) for provider_type in provider_types),
+            return_exceptions=True
+        )
+        
+        all_models = {}
+        for provider_type, models in zip(provider_types, results):
+            if isinstance(models, BaseException):
+                logger.warning("Failed to get models for %s: %s", provider_type, models)
                 # 不包含失败的提供商，而不是返回空列表
+                continue
+            if models:  # 只包含有模型的提供商
+                all_models[provider_type] = models
         
         return all_models
     
+    @classmethod
+    async def _fetch_models(cls, provider_type: LLMProviderType) -> List[LLMModel]:
+        """获取单个提供商的模型列表，超过提供商配置的超时时间时放弃"""
+        provider = cls.create_provider(provider_type)
+        return await asyncio.wait_for(provider.get_available_models(), timeout=provider.config.timeout)
+    
     @classmethod
     def validate_provider_config(
         cls, 
@@ -266,6 +389,8 @@ class LLMProviderFactory:
     ) -> tuple[bool, str]:
         """验证提供商配置
         
+        只检查配置是否完整，不创建提供商实例，也不建立任何连接。
+        
         Args:
             provider_type: 提供商类型
             config: 配置，如果为None则验证环境变量配置
@@ -274,48 +399,69 @@ class LLMProviderFactory:
             tuple[bool, str]: (是否有效, 错误信息)
         """
         try:
-            provider = cls.create_provider(provider_type, config)
+            if config is None:
+                config = cls._get_default_config(provider_type)
+            provider_class = LLMProviderRegistry.get_provider_class(provider_type)
+            if not provider_class.validate_config_static(config):
+                return False, f"Invalid configuration for {provider_type}"
             return True, "Configuration is valid"
         except Exception as e:
             return False, str(e)
     
     @classmethod
     async def health_check_all(cls) -> Dict[LLMProviderType, bool]:
-        """检查所有提供商的健康状态
+        """检查所有提供商的健康状态，各提供商并发检查
         
         Returns:
             Dict[LLMProviderType, bool]: 各提供商的健康状态
         """
-        health_status = {}
+        provider_types = cls.get_available_providers()
+        results = await asyncio.gather(
+            *(cls._check_health(provider_type) for provider_type in provider_types),
+            return_exceptions=True
+        )
         
-        for provider_type in cls.get_available_providers():
-            try:
-                provider = cls.create_provider(provider_type)
-                is_healthy = await provider.health_check()
-                health_status[provider_type] = is_healthy
-            except Exception as e:
-                print(f"Health check failed for {provider_type}: {e}")
-                health_status[provider_type] = False
+        health_status = {}
+        for provider_type, is_healthy in zip(provider_types, results):
+            if isinstance(is_healthy, BaseException):
+                logger.warning("Health check failed for %s: %s", provider_type, is_healthy)
+                is_healthy = False
+            health_status[provider_type] = is_healthy
         
         return health_status
     
+    @classmethod
+    async def _check_health(cls, provider_type: LLMProviderType) -> bool:
+        """检查单个提供商的健康状态，超过提供商配置的超时时间时放弃"""
+        provider = cls.create_provider(provider_type)
+        return await asyncio.wait_for(provider.health_check(), timeout=provider.config.timeout)
+    
     @classmethod
     def is_provider_available(cls, provider_type: LLMProviderType) -> bool:
         """检查提供商是否可用（配置是否完整）
         
+        结果按提供商类型缓存，环境变量变化后需调用 reset_availability_cache() 或 clear_caches()
+        
         Args:
             provider_type: 提供商类型
             
         Returns:
             bool: 提供商是否可用
         """
+        available = cls._availability_cache.get(provider_type)
+        if available is not None:
+            return available
+        
         try:
             # 尝试获取配置，如果配置不完整会抛出异常
-            config = cls._get_default_config(provider_type)
-            return True
+            cls._get_default_config(provider_type)
+            available = True
         except LLMProviderConfigError as e:
-            print(f"Provider {provider_type} not available: {e}")
-            return False
+            logger.info("Provider %s not available: %s", provider_type, e)
+            available = False
         except Exception as e:
-            print(f"Unexpected error checking provider {provider_type}: {e}")
-            return False
\ No newline at end of file
+            logger.warning("Unexpected error checking provider %s: %s", provider_type, e)
+            available = False
+        
+        cls._availability_cache[provider_type] = available
+        return available
\ No newline at end of file
@@ -4,9 +4,15 @@
 """
 
 from abc import ABC, abstractmethod
-from typing import Dict, Any, List, Optional, Type
+from typing import AsyncIterator, Callable, Dict, Any, List, Optional, Tuple, Type
 import asyncio
+import importlib
+import json
+import logging
+import os
 import time
+from collections import OrderedDict, deque
+import httpx
 from langchain_core.language_models import BaseLanguageModel
 from langchain_core.messages import BaseMessage, AIMessage
 from langchain_core.runnables import RunnableConfig
@@ -19,9 +25,25 @@ from .llm_types import (
     LLMModel,
     LLMProviderError,
     LLMProviderConfigError,
+    LLMProviderAPIError,
     LLMTaskType
 )
 
+logger = logging.getLogger(__name__)
+
+
+# 健康检查使用的请求模板，各提供商只替换模型
+_HEALTH_CHECK_REQUEST = LLMRequest(
+    prompt="Hello",
+    model="",
+    task_type=LLMTaskType.QUERY_GENERATION,
+    temperature=0.1,
+    max_tokens=10
+)
+
+# 从模型输出中提取JSON对象使用的解码器
+_JSON_DECODER = json.JSONDecoder()
+
 
 class BaseLLMProvider(ABC):
     """LLM提供商基类
@@ -29,6 +51,9 @@ class BaseLLMProvider(ABC):
     定义了所有LLM提供商必须实现的接口，确保不同提供商的互换性。
     """
     
+    # LangChain实例缓存的容量，超出时淘汰最久未使用的实例
+    _LLM_CACHE_SIZE = 32
+    
     def __init__(self, config: LLMProviderConfig):
         """初始化LLM提供商
         
@@ -37,8 +62,25 @@ class BaseLLMProvider(ABC):
         """
         self.config = config
         self._validate_config()
-        self._models_cache: Optional[List[LLMModel]] = None
-        self._last_request_time = 0
+        # 模型列表缓存，过期后重新获取
+        self._models_cache: Optional[Tuple[LLMModel, ...]] = None
+        self._models_cache_expiry = 0.0
+        self._models_ttl = float(os.getenv("LLM_MODELS_TTL", "300"))
+        # 速率限制在创建时解析一次，按滑动窗口计数：任意一个窗口内最多发出 limit 个请求，
+        # 窗口内允许突发。_request_times 记录最近 limit 个请求的发出时间（monotonic）
+        rate_limits = self.get_rate_limits() or {}
+        if rate_limits.get("requests_per_minute"):
+            limit, self._rate_window = rate_limits["requests_per_minute"], 60.0
+        else:
+            limit, self._rate_window = rate_limits.get("requests_per_second"), 1.0
+        self._request_times: Optional[deque] = deque(maxlen=int(limit)) if limit else None
+        self._http_client: Optional[httpx.AsyncClient] = None
+        self._health_request: Optional[LLMRequest] = None
+        # 配置不可修改，可用模型集合只需计算一次，用于快速检查请求的模型
+        self._models_set: frozenset = frozenset(config.models)
+        # 按 模型+参数 缓存的LangChain实例，及按 实例+输出结构 缓存的结构化输出实例
+        self._llm_cache: OrderedDict[tuple, BaseLanguageModel] = OrderedDict()
+        self._structured_llm_cache: OrderedDict[tuple, tuple] = OrderedDict()
         
     @abstractmethod
     async def generate(self, request: LLMRequest) -> LLMResponse:
@@ -71,6 +113,123 @@ class BaseLLMProvider(ABC):
         """
         pass
     
+    async def generate_stream(
+        self,
+        request: LLMRequest,
+        config: Optional[RunnableConfig] = None
+    ) -> AsyncIterator[str]:
+        """流式生成文本内容，逐段返回生成的文本
+        
+        默认基于LangChain的astream实现，子类可按需重写。
+        
+        Args:
+            request: 标准化的LLM请求
+            config: 传给LangChain的运行时配置（如LangGraph节点的config，用于把token流转发给前端）
+            
+        Yields:
+            str: 新生成的文本片段
+            
+        Raises:
+            LLMProviderError: 当生成失败时抛出
+        """
+        await self._rate_limit_check()
+        request = self._prepare_request(request)
+        
+        llm = self.get_langchain_llm(
+            model=request.model,
+            temperature=request.temperature,
+            max_tokens=request.max_tokens
+        )
+        
+        try:
+            async for chunk in llm.astream(request.to_messages(), config=config):
+                content = chunk.content if hasattr(chunk, 'content') else str(chunk)
+                # 部分模型以内容块列表的形式返回
+                if isinstance(content, list):
+                    content = "".join(
+                        part.get("text", "") if isinstance(part, dict) else str(part)
+                        for part in content
+                    )
+                if content:
+                    yield content
+        except LLMProviderError:
+            raise
+        except Exception as e:
+            raise LLMProviderAPIError(f"{self.get_provider_type()} streaming error: {str(e)}")
+
+    async def generate_batch(self, requests: List[LLMRequest]) -> List[LLMResponse]:
+        """批量生成文本内容
+
+        按 模型/温度/最大token数 分组，每组通过LangChain的abatch提交，
+        由模型实例并发发送并复用同一连接池。结果顺序与请求顺序一致。
+        设置了速率限制时，每组按窗口上限拆分，每一份发出前先占用相应的速率限制。
+
+        Args:
+            requests: 标准化的LLM请求列表
+
+        Returns:
+            List[LLMResponse]: 与请求一一对应的响应列表
+
+        Raises:
+            LLMProviderError: 任一请求失败时抛出
+        """
+        requests = [self._prepare_request(request) for request in requests]
+        chunk_size = self._rate_limit_chunk_size(len(requests))
+
+        groups: Dict[tuple, List[int]] = {}
+        for index, request in enumerate(requests):
+            groups.setdefault((request.model, request.temperature, request.max_tokens), []).append(index)
+
+        responses: List[Optional[LLMResponse]] = [None] * len(requests)
+        try:
+            for (model, temperature, max_tokens), indices in groups.items():
+                llm = self.get_langchain_llm(model=model, temperature=temperature, max_tokens=max_tokens)
+                results = []
+                # abatch 会发出与请求数相同的API调用，每份不超过窗口上限，发出前占用对应的速率限制
+                for start in range(0, len(indices), chunk_size):
+                    chunk = indices[start:start + chunk_size]
+                    await self._rate_limit_check(len(chunk))
+                    results.extend(await llm.abatch([requests[i].to_messages() for i in chunk]))
+                for index, result in zip(indices, results):
+                    content = result.content if hasattr(result, 'content') else str(result)
+                    responses[index] = self._create_response(
+                        content=content,
+                        model=model,
+                        metadata={
+                            "task_type": requests[index].task_type,
+                            "temperature": temperature,
+                            "max_tokens": max_tokens,
+                            "batch_size": len(indices)
+                        }
+                    )
+        except LLMProviderError:
+            raise
+        except Exception as e:
+            raise LLMProviderAPIError(f"{self.get_provider_type()} batch error: {str(e)}")
+
+        return responses
+
+    async def generate_structured_batch(self, requests: List[LLMRequest], output_schema: Type) -> List[LLMResponse]:
+        """批量生成结构化输出
+
+        各提供商的结构化输出实现不同（原生结构化接口、工具调用或提示词约束），
+        默认对每个请求并发调用 generate_structured，共用同一连接池，各请求分别占用速率限制。
+        结果顺序与请求顺序一致。
+
+        Args:
+            requests: 标准化的LLM请求列表
+            output_schema: 输出结构的Pydantic模型类
+
+        Returns:
+            List[LLMResponse]: 与请求一一对应的响应列表
+
+        Raises:
+            LLMProviderError: 任一请求失败时抛出
+        """
+        return list(await asyncio.gather(*(
+            self.generate_structured(request, output_schema) for request in requests
+        )))
+
     @abstractmethod
     def get_langchain_llm(self, model: str, **kwargs) -> BaseLanguageModel:
         """获取LangChain兼容的LLM实例
@@ -84,6 +243,60 @@ class BaseLLMProvider(ABC):
         """
         pass
     
+    def _get_cached_llm(
+        self,
+        model: str,
+        kwargs: Dict[str, Any],
+        build: Callable[[], BaseLanguageModel]
+    ) -> BaseLanguageModel:
+        """获取缓存的LangChain实例，不存在时调用build创建
+        
+        相同模型和参数复用同一个实例，避免重复创建客户端并保持其连接池中的连接。
+        最多缓存 _LLM_CACHE_SIZE 个实例（LRU），参数不可哈希时不缓存。
+        
+        Args:
+            model: 模型名称
+            kwargs: 创建实例使用的其余参数
+            build: 创建实例的函数
+            
+        Returns:
+            BaseLanguageModel: LangChain兼容的LLM实例
+        """
+        try:
+            key = (model, tuple(sorted(kwargs.items())))
+            llm = self._llm_cache.get(key)
+        except TypeError:
+            return build()
+        
+        if llm is None:
+            llm = self._llm_cache[key] = build()
+            if len(self._llm_cache) > self._LLM_CACHE_SIZE:
+                self._llm_cache.popitem(last=False)
+        else:
+            self._llm_cache.move_to_end(key)
+        return llm
+    
+    def _get_structured_llm(self, llm: BaseLanguageModel, output_schema: Type):
+        """获取绑定了输出结构的LangChain实例，每个 实例+输出结构 只绑定一次
+        
+        Args:
+            llm: LangChain兼容的LLM实例
+            output_schema: 输出结构的Pydantic模型类
+            
+        Returns:
+            绑定了输出结构的Runnable
+        """
+        key = (id(llm), output_schema)
+        entry = self._structured_llm_cache.get(key)
+        # 以id为键，同时核对实例本身，避免未缓存的实例被回收后id被复用
+        if entry is None or entry[0] is not llm:
+            entry = self._structured_llm_cache[key] = (llm, llm.with_structured_output(output_schema))
+            if len(self._structured_llm_cache) > self._LLM_CACHE_SIZE:
+                self._structured_llm_cache.popitem(last=False)
+        else:
+            self._structured_llm_cache.move_to_end(key)
+        return entry[1]
+    
     @abstractmethod
     def get_provider_type(self) -> LLMProviderType:
         """返回提供商类型
@@ -102,10 +315,38 @@ class BaseLLMProvider(ABC):
         """
         pass
     
-    @abstractmethod
-    async def get_available_models(self) -> List[LLMModel]:
+    @staticmethod
+    def validate_config_static(config: LLMProviderConfig) -> bool:
+        """只检查配置本身是否完整，不创建提供商实例和客户端
+        
+        子类应覆盖此方法以检查各自的必需配置项。
+        
+        Args:
+            config: 提供商配置
+            
+        Returns:
+            bool: 配置是否完整
+        """
+        return bool(config.models) and config.default_model in config.models
+    
+    async def get_available_models(self) -> Tuple[LLMModel, ...]:
         """获取可用模型列表
         
+        结果缓存 LLM_MODELS_TTL 秒（默认300秒），缓存期间直接返回同一个元组。
+        
+        Returns:
+            Tuple[LLMModel, ...]: 可用模型列表
+        """
+        now = time.monotonic()
+        if self._models_cache is None or now >= self._models_cache_expiry:
+            self._models_cache = tuple(await self._fetch_models_impl())
+            self._models_cache_expiry = now + self._models_ttl
+        return self._models_cache
+    
+    @abstractmethod
+    async def _fetch_models_impl(self) -> List[LLMModel]:
+        """获取可用模型列表的具体实现，由 get_available_models 缓存结果
+        
         Returns:
             List[LLMModel]: 可用模型列表
         """
@@ -121,7 +362,13 @@ class BaseLLMProvider(ABC):
         pass
     
     def _validate_config(self):
-        """验证配置的内部方法"""
+        """验证配置的内部方法
+        
+        设置 LLM_VALIDATE_CONFIG=0 时跳过验证，适用于配置可信的生产环境。
+        提供商实例按配置缓存，每个配置只会在创建实例时验证一次。
+        """
+        if os.getenv("LLM_VALIDATE_CONFIG", "1") != "1":
+            return
         if not self.validate_config():
             raise LLMProviderConfigError(
                 f"Invalid configuration for {self.get_provider_type()}"
@@ -134,20 +381,25 @@ class BaseLLMProvider(ABC):
             bool: 服务是否可用
         """
         try:
-            # 执行一个简单的测试请求
-            test_request = LLMRequest(
-                prompt="Hello",
-                model=self.config.default_model,
-                task_type=LLMTaskType.QUERY_GENERATION,
-                temperature=0.1,
-                max_tokens=10
-            )
-            await self.generate(test_request)
+            # 执行一个简单的测试请求，请求对象在各次检查之间复用
+            if self._health_request is None:
+                self._health_request = _HEALTH_CHECK_REQUEST.model_copy(
+                    update={"model": self.config.default_model}
+                )
+            await self.generate(self._health_request)
             return True
         except Exception as e:
-            print(f"Health check failed for {self.get_provider_type()}: {e}")
+            logger.warning("Health check failed for %s: %s", self.get_provider_type(), e)
             return False
     
+    def set_http_client(self, http_client: Optional[httpx.AsyncClient]) -> None:
+        """设置共享的异步HTTP客户端，使多个请求复用同一连接池
+        
+        Args:
+            http_client: 共享的httpx异步客户端，None表示使用SDK默认客户端
+        """
+        self._http_client = http_client
+    
     def get_default_model(self) -> str:
         """获取默认模型
         
@@ -162,31 +414,70 @@ class BaseLLMProvider(ABC):
         Returns:
             List[str]: 模型名称列表
         """
-        return self.config.models
+        return list(self.config.models)
     
-    async def _rate_limit_check(self):
-        """速率限制检查"""
-        rate_limits = self.get_rate_limits()
-        if "requests_per_second" in rate_limits:
-            min_interval = 1.0 / rate_limits["requests_per_second"]
-            current_time = time.time()
-            time_since_last = current_time - self._last_request_time
-            
-            if time_since_last < min_interval:
-                sleep_time = min_interval - time_since_last
-                await asyncio.sleep(sleep_time)
-            
-            self._last_request_time = time.time()
+    async def _rate_limit_check(self, slots: int = 1):
+        """速率限制检查
+        
+        窗口内未达到上限时立即放行；达到上限时等到足够多的请求移出窗口。
+        每个请求先预留发出时间再等待，预留和检查之间没有await，并发请求不需要加锁。
+        
+        Args:
+            slots: 同时发出的请求数，不能超过窗口上限（批量调用需先按 _rate_limit_chunk_size 拆分）；
+                这些请求在同一时刻发出，按该时刻记录
+        """
+        request_times = self._request_times
+        if request_times is None:
+            return
+        
+        now = time.monotonic()
+        # 需要移出窗口的已记录请求数，窗口未满时可以直接占用空位
+        overflow = slots - (request_times.maxlen - len(request_times))
+        scheduled = now if overflow <= 0 else max(now, request_times[overflow - 1] + self._rate_window)
+        request_times.extend([scheduled] * slots)
+        
+        if scheduled > now:
+            await asyncio.sleep(scheduled - now)
+    
+    def _rate_limit_chunk_size(self, count: int) -> int:
+        """批量调用每次最多同时发出的请求数，不超过速率限制的窗口上限"""
+        if self._request_times is None:
+            return max(count, 1)
+        return self._request_times.maxlen
     
     def _prepare_request(self, request: LLMRequest) -> LLMRequest:
         """预处理请求"""
         # 确保模型在可用列表中
-        if request.model not in self.config.models:
-            print(f"Warning: Model {request.model} not in available models, using default {self.config.default_model}")
+        if request.model not in self._models_set:
+            logger.debug(
+                "Model %s not in available models, using default %s", request.model, self.config.default_model
+            )
             request.model = self.config.default_model
         
         return request
     
+    def _parse_structured_output(self, text: str, output_schema: Type) -> Any:
+        """从模型返回的文本中解析结构化输出
+        
+        从文本中第一个 { 开始解析一个完整的JSON对象（raw_decode，一次扫描），
+        忽略其后的文字（即使其中还有花括号），再由Pydantic校验。
+        
+        Args:
+            text: 模型返回的文本
+            output_schema: 输出结构的Pydantic模型类
+            
+        Returns:
+            Any: output_schema的实例
+            
+        Raises:
+            ValueError: 文本中没有JSON对象或不符合输出结构时抛出
+        """
+        json_start = text.find('{')
+        if json_start == -1:
+            raise ValueError("No JSON object found in model output")
+        data, _ = _JSON_DECODER.raw_decode(text, json_start)
+        return output_schema.model_validate(data)
+    
     def _create_response(
         self, 
         content: str, 
@@ -209,10 +500,15 @@ class BaseLLMProvider(ABC):
 class LLMProviderRegistry:
     """LLM提供商注册表
     
-    管理所有已注册的LLM提供商类型。
+    管理所有已注册的LLM提供商类型。提供商可以延迟注册，
+    只记录模块路径和类名，第一次使用时才导入对应模块。
     """
     
     _providers: Dict[LLMProviderType, Type[BaseLLMProvider]] = {}
+    # 延迟注册的提供商：类型 -> (模块路径, 类名)
+    _lazy_providers: Dict[LLMProviderType, Tuple[str, str]] = {}
+    # 已注册类型的元组，注册新提供商时失效
+    _types_cache: Optional[Tuple[LLMProviderType, ...]] = None
     
     @classmethod
     def register(cls, provider_type: LLMProviderType, provider_class: Type[BaseLLMProvider]):
@@ -226,6 +522,45 @@ class LLMProviderRegistry:
             raise ValueError(f"Provider class must inherit from BaseLLMProvider: {provider_class}")
         
         cls._providers[provider_type] = provider_class
+        cls._lazy_providers.pop(provider_type, None)
+        cls._types_cache = None
+    
+    @classmethod
+    def register_lazy(cls, provider_type: LLMProviderType, module_path: str, class_name: str):
+        """延迟注册LLM提供商，第一次获取提供商类时才导入模块
+        
+        Args:
+            provider_type: 提供商类型
+            module_path: 提供商实现所在的模块路径
+            class_name: 提供商类名
+        """
+        if provider_type in cls._providers:
+            return
+        cls._lazy_providers[provider_type] = (module_path, class_name)
+        cls._types_cache = None
+    
+    @classmethod
+    def _load_lazy(cls, provider_type: LLMProviderType) -> Optional[Type[BaseLLMProvider]]:
+        """导入延迟注册的提供商，未延迟注册时返回None
+        
+        Raises:
+            LLMProviderConfigError: 当提供商模块导入失败时（如缺少依赖）
+        """
+        entry = cls._lazy_providers.get(provider_type)
+        if entry is None:
+            return None
+        
+        module_path, class_name = entry
+        try:
+            provider_class = getattr(importlib.import_module(module_path), class_name)
+        except (ImportError, AttributeError) as e:
+            # 导入失败的提供商不再列为可用
+            cls._lazy_providers.pop(provider_type, None)
+            cls._types_cache = None
+            raise LLMProviderConfigError(f"Failed to load provider {provider_type}: {e}") from e
+        
+        cls.register(provider_type, provider_class)
+        return provider_class
     
     @classmethod
     def get_provider_class(cls, provider_type: LLMProviderType) -> Type[BaseLLMProvider]:
@@ -240,19 +575,25 @@ class LLMProviderRegistry:
         Raises:
             LLMProviderConfigError: 当提供商未注册时
         """
-        if provider_type not in cls._providers:
-            available_types = list(cls._providers.keys())
+        provider_class = cls._providers.get(provider_type) or cls._load_lazy(provider_type)
+        if provider_class is None:
+            available_types = list(cls.get_available_types())
             raise LLMProviderConfigError(
                 f"Unknown provider type: {provider_type}. Available: {available_types}"
             )
         
-        return cls._providers[provider_type]
+        return provider_class
     
     @classmethod
-    def get_available_types(cls) -> List[LLMProviderType]:
-        """获取所有可用的提供商类型
+    def get_available_types(cls) -> Tuple[LLMProviderType, ...]:
+        """获取所有可用的提供商类型，包括尚未导入的延迟注册提供商
         
         Returns:
-            List[LLMProviderType]: 可用提供商类型列表
+            Tuple[LLMProviderType, ...]: 可用提供商类型，注册表不变时返回同一个元组
         """
-        return list(cls._providers.keys())
\ No newline at end of file
+        if cls._types_cache is None:
+            cls._types_cache = tuple(cls._providers) + tuple(
+                provider_type for provider_type in cls._lazy_providers
+                if provider_type not in cls._providers
+            )
+        return cls._types_cache
\ No newline at end of file
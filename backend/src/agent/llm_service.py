@@ -3,14 +3,19 @@
 提供统一的LLM调用接口，简化graph.py中的LLM使用。
 """
 
+import asyncio
+import logging
 import os
-from typing import Dict, Any, List, Optional, Type, Union
+from functools import partial
+from typing import AsyncIterator, Awaitable, Callable, Dict, Any, List, Optional, Set, Tuple, Type, Union
+import orjson
 from langchain_core.language_models import BaseLanguageModel
 from langchain_core.runnables import RunnableConfig
 
 # 确保提供商注册
 from . import provider_registry
 
+from .llm_cache import ExactCache
 from .llm_factory import LLMProviderFactory
 from .llm_providers import BaseLLMProvider
 from .llm_types import (
@@ -19,9 +24,114 @@ from .llm_types import (
     LLMProviderType,
     LLMTaskType,
     LLMModel,
-    LLMProviderError
+    LLMProviderError,
+    get_output_json_schema,
+    get_prefix_hash
 )
 
+logger = logging.getLogger(__name__)
+
+# 所有LLMService实例共用的响应缓存；键中包含提供商和模型，不同服务实例之间不会混用
+_response_cache = ExactCache(
+    maxsize=int(os.getenv("LLM_RESPONSE_CACHE_SIZE", "1024")),
+    ttl=float(os.getenv("LLM_RESPONSE_CACHE_TTL", "600")),
+)
+_inflight_requests: Dict[str, asyncio.Future] = {}
+
+
+def clear_response_cache() -> None:
+    """清空LLM响应缓存，配置变化后调用"""
+    _response_cache.clear()
+
+
+class RequestCoalescer:
+    """请求合并器
+
+    收集短时间窗口内同一提供商、同一输出结构的生成请求，合并为一次批量调用，
+    多个并发研究流程的请求可以共用一次提交。窗口内请求数达到上限时立即提交。
+    """
+
+    def __init__(
+        self,
+        provider: BaseLLMProvider,
+        window: float,
+        max_batch: int = 8,
+        output_schema: Optional[Type] = None
+    ):
+        """初始化请求合并器
+
+        Args:
+            provider: 执行批量调用的提供商
+            window: 收集请求的时间窗口（秒）
+            max_batch: 单批最大请求数
+            output_schema: 结构化输出的Pydantic模型类，为None时合并普通文本生成请求
+        """
+        self.provider = provider
+        self.window = window
+        self.max_batch = max_batch
+        self.output_schema = output_schema
+        self._pending: List[Tuple[LLMRequest, asyncio.Future]] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        # 正在执行的批次，保留引用避免任务在完成前被垃圾回收
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def submit(self, request: LLMRequest) -> LLMResponse:
+        """提交请求并等待所在批次完成
+
+        Args:
+            request: 标准化的LLM请求
+
+        Returns:
+            LLMResponse: 该请求的响应
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((request, future))
+
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.window, self._flush)
+
+        return await future
+
+    def _flush(self) -> None:
+        """取出当前收集的请求并提交"""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.create_task(self._run_batch(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _call(self, requests: List[LLMRequest]) -> List[LLMResponse]:
+        """按是否为结构化输出调用提供商，单个请求时不走批量接口"""
+        provider, schema = self.provider, self.output_schema
+        if len(requests) == 1:
+            if schema is None:
+                return [await provider.generate(requests[0])]
+            return [await provider.generate_structured(requests[0], schema)]
+        if schema is None:
+            return await provider.generate_batch(requests)
+        return await provider.generate_structured_batch(requests, schema)
+
+    async def _run_batch(self, batch: List[Tuple[LLMRequest, asyncio.Future]]) -> None:
+        """执行一批请求，把结果或异常分发给各自的调用方"""
+        try:
+            responses = await self._call([request for request, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), response in zip(batch, responses):
+            if not future.done():
+                future.set_result(response)
+
 
 class LLMService:
     """LLM服务类
@@ -33,7 +143,16 @@ class LLMService:
         """初始化LLM服务"""
         self._factory = LLMProviderFactory()
         self._default_provider: Optional[BaseLLMProvider] = None
-        self._providers_cache: Dict[str, BaseLLMProvider] = {}
+        self._providers_cache: Dict[LLMProviderType, BaseLLMProvider] = {}
+        # 请求合并窗口，为0时不合并，每次调用单独发送
+        self._batch_window = float(os.getenv("LLM_BATCH_WINDOW_MS", "0")) / 1000
+        self._batch_max_size = int(os.getenv("LLM_BATCH_MAX_SIZE", "8"))
+        self._coalescers: Dict[Tuple[int, Optional[Type]], RequestCoalescer] = {}
+        # 响应缓存（各服务实例共用），只缓存温度为0（结果确定）或显式要求缓存的请求
+        self._response_cache_enabled = os.getenv("LLM_RESPONSE_CACHE_ENABLED", "true").lower() == "true"
+        self._response_cache = _response_cache
+        # 正在执行的请求，相同请求并发到达时共用同一次调用
+        self._inflight = _inflight_requests
     
     def get_default_provider(self) -> BaseLLMProvider:
         """获取默认LLM提供商
@@ -54,10 +173,10 @@ class LLMService:
         Returns:
             BaseLLMProvider: 提供商实例
         """
-        cache_key = str(provider_type)
-        if cache_key not in self._providers_cache:
-            self._providers_cache[cache_key] = self._factory.create_provider(provider_type)
-        return self._providers_cache[cache_key]
+        provider = self._providers_cache.get(provider_type)
+        if provider is None:
+            provider = self._providers_cache[provider_type] = self._factory.create_provider(provider_type)
+        return provider
     
     async def generate(
         self,
@@ -67,6 +186,7 @@ class LLMService:
         task_type: LLMTaskType = LLMTaskType.QUERY_GENERATION,
         temperature: float = 0.7,
         max_tokens: Optional[int] = None,
+        system_prefix: str = "",
         **kwargs
     ) -> LLMResponse:
         """生成文本内容
@@ -78,11 +198,144 @@ class LLMService:
             task_type: 任务类型
             temperature: 生成温度
             max_tokens: 最大token数
-            **kwargs: 额外参数
+            system_prefix: 各次请求共用的系统提示前缀，放在最前面以利用提供商的前缀缓存
+            **kwargs: 额外参数，cache=True 时即使温度不为0也缓存结果
             
         Returns:
             LLMResponse: 生成响应
         """
+        cache = kwargs.pop("cache", False)
+        
+        # 获取提供商
+        if provider_type:
+            provider = self.get_provider(provider_type)
+        else:
+            provider = self.get_default_provider()
+        
+        # 使用提供商的默认模型（如果未指定）
+        if not model:
+            model = provider.get_default_model()
+        
+        # 创建请求
+        request = LLMRequest(
+            prompt=prompt,
+            system_prefix=system_prefix,
+            model=model,
+            task_type=task_type,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            additional_params=kwargs
+        )
+        
+        if self._batch_window > 0:
+            call = partial(self._get_coalescer(provider).submit, request)
+        else:
+            call = partial(provider.generate, request)
+        return await self._cached_call(provider, request, "", cache, call)
+    
+    async def generate_batch(
+        self,
+        requests: List[LLMRequest],
+        provider_type: Optional[LLMProviderType] = None
+    ) -> List[LLMResponse]:
+        """批量生成文本内容
+        
+        Args:
+            requests: 标准化的LLM请求列表
+            provider_type: 提供商类型，如果为None则使用默认提供商
+            
+        Returns:
+            List[LLMResponse]: 与请求一一对应的响应列表
+        """
+        if provider_type:
+            provider = self.get_provider(provider_type)
+        else:
+            provider = self.get_default_provider()
+        
+        return await provider.generate_batch(requests)
+    
+    async def generate_many(
+        self,
+        prompts: List[str],
+        model: Optional[str] = None,
+        provider_type: Optional[LLMProviderType] = None,
+        task_type: LLMTaskType = LLMTaskType.QUERY_GENERATION,
+        temperature: float = 0.7,
+        max_tokens: Optional[int] = None,
+        system_prefix: str = "",
+        **kwargs
+    ) -> List[LLMResponse]:
+        """用相同参数并发生成多个提示词的内容
+        
+        各提示词经 generate 并发发送，同样使用响应缓存；
+        设置 LLM_BATCH_WINDOW_MS 后会被请求合并器合并为批量调用。
+        
+        Args:
+            prompts: 输入提示词列表
+            model: 模型名称，如果为None则使用默认模型
+            provider_type: 提供商类型，如果为None则使用默认提供商
+            task_type: 任务类型
+            temperature: 生成温度
+            max_tokens: 最大token数
+            system_prefix: 各次请求共用的系统提示前缀，放在最前面以利用提供商的前缀缓存
+            **kwargs: 额外参数
+            
+        Returns:
+            List[LLMResponse]: 与提示词一一对应的响应列表
+        """
+        return list(await asyncio.gather(*(
+            self.generate(
+                prompt,
+                model=model,
+                provider_type=provider_type,
+                task_type=task_type,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                system_prefix=system_prefix,
+                **kwargs
+            )
+            for prompt in prompts
+        )))
+    
+    def _get_coalescer(self, provider: BaseLLMProvider, output_schema: Optional[Type] = None) -> RequestCoalescer:
+        """获取 提供商+输出结构 对应的请求合并器"""
+        key = (id(provider), output_schema)
+        coalescer = self._coalescers.get(key)
+        if coalescer is None:
+            coalescer = RequestCoalescer(provider, self._batch_window, self._batch_max_size, output_schema)
+            self._coalescers[key] = coalescer
+        return coalescer
+    
+    async def generate_stream(
+        self,
+        prompt: str,
+        model: Optional[str] = None,
+        provider_type: Optional[LLMProviderType] = None,
+        task_type: LLMTaskType = LLMTaskType.ANSWER_GENERATION,
+        temperature: float = 0.7,
+        max_tokens: Optional[int] = None,
+        system_prefix: str = "",
+        config: Optional[RunnableConfig] = None,
+        **kwargs
+    ) -> AsyncIterator[str]:
+        """流式生成文本内容
+        
+        Args:
+            prompt: 输入提示词
+            model: 模型名称，如果为None则使用默认模型
+            provider_type: 提供商类型，如果为None则使用默认提供商
+            task_type: 任务类型
+            temperature: 生成温度
+            max_tokens: 最大token数
+            system_prefix: 各次请求共用的系统提示前缀，放在最前面以利用提供商的前缀缓存
+            config: 传给LangChain的运行时配置
+            **kwargs: 额外参数，cache=True 时即使温度不为0也缓存结果
+            
+        Yields:
+            str: 新生成的文本片段；命中缓存或启用了请求合并时一次给出完整内容
+        """
+        cache = kwargs.pop("cache", False)
+        
         # 获取提供商
         if provider_type:
             provider = self.get_provider(provider_type)
@@ -96,6 +349,7 @@ class LLMService:
         # 创建请求
         request = LLMRequest(
             prompt=prompt,
+            system_prefix=system_prefix,
             model=model,
             task_type=task_type,
             temperature=temperature,
@@ -103,7 +357,35 @@ class LLMService:
             additional_params=kwargs
         )
         
-        return await provider.generate(request)
+        # 启用请求合并时与其他生成请求一起批量提交，批量接口不支持流式返回，完整内容一次给出
+        if self._batch_window > 0:
+            response = await self._cached_call(
+                provider, request, "", cache, partial(self._get_coalescer(provider).submit, request)
+            )
+            yield response.content
+            return
+        
+        # 与 _cached_call 使用同一个响应缓存和缓存条件；完整接收后才写入缓存
+        if not (self._response_cache_enabled and (cache or request.temperature <= 0)):
+            async for delta in provider.generate_stream(request, config=config):
+                yield delta
+            return
+        
+        key = self._response_cache_key(provider, request, "")
+        cached = self._response_cache.get(key)
+        if cached is not None:
+            yield cached.content
+            return
+        
+        chunks = []
+        async for delta in provider.generate_stream(request, config=config):
+            chunks.append(delta)
+            yield delta
+        self._response_cache.set(key, LLMResponse(
+            content="".join(chunks),
+            model=model,
+            provider=provider.get_provider_type(),
+        ))
     
     async def generate_structured(
         self,
@@ -114,6 +396,7 @@ class LLMService:
         task_type: LLMTaskType = LLMTaskType.QUERY_GENERATION,
         temperature: float = 0.7,
         max_tokens: Optional[int] = None,
+        system_prefix: str = "",
         **kwargs
     ) -> LLMResponse:
         """生成结构化输出
@@ -126,11 +409,14 @@ class LLMService:
             task_type: 任务类型
             temperature: 生成温度
             max_tokens: 最大token数
-            **kwargs: 额外参数
+            system_prefix: 各次请求共用的系统提示前缀，放在最前面以利用提供商的前缀缓存
+            **kwargs: 额外参数，cache=True 时即使温度不为0也缓存结果
             
         Returns:
             LLMResponse: 包含结构化数据的响应
         """
+        cache = kwargs.pop("cache", False)
+        
         # 获取提供商
         if provider_type:
             provider = self.get_provider(provider_type)
@@ -144,15 +430,115 @@ class LLMService:
         # 创建请求
         request = LLMRequest(
             prompt=prompt,
+            system_prefix=system_prefix,
             model=model,
             task_type=task_type,
             temperature=temperature,
             max_tokens=max_tokens,
-            structured_output_schema=output_schema.model_json_schema() if hasattr(output_schema, 'model_json_schema') else None,
+            structured_output_schema=get_output_json_schema(output_schema),
             additional_params=kwargs
         )
         
-        return await provider.generate_structured(request, output_schema)
+        if self._batch_window > 0:
+            call = partial(self._get_coalescer(provider, output_schema).submit, request)
+        else:
+            call = partial(provider.generate_structured, request, output_schema)
+        return await self._cached_call(provider, request, output_schema.__name__, cache, call)
+    
+    @staticmethod
+    def _with_prefix_hash(
+        request: LLMRequest,
+        call: Callable[[], Awaitable[LLMResponse]]
+    ) -> Callable[[], Awaitable[LLMResponse]]:
+        """在响应的 metadata["prefix_hash"] 中记录系统提示前缀的哈希"""
+        async def _call() -> LLMResponse:
+            response = await call()
+            response.metadata["prefix_hash"] = get_prefix_hash(request.system_prefix)
+            return response
+        return _call
+    
+    @staticmethod
+    def _response_cache_key(provider: BaseLLMProvider, request: LLMRequest, schema_name: str) -> str:
+        """由请求的全部参数生成响应缓存键"""
+        return ExactCache.make_key(
+            str(provider.get_provider_type()),
+            request.model,
+            schema_name,
+            str(request.task_type),
+            repr(request.temperature),
+            repr(request.max_tokens),
+            orjson.dumps(
+                request.additional_params,
+                default=str,
+                option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS
+            ).decode(),
+            request.system_prefix,
+            request.prompt,
+        )
+    
+    async def _cached_call(
+        self,
+        provider: BaseLLMProvider,
+        request: LLMRequest,
+        schema_name: str,
+        cache: bool,
+        call: Callable[[], Awaitable[LLMResponse]]
+    ) -> LLMResponse:
+        """带缓存地执行一次生成调用
+        
+        温度为0（结果确定）或cache为True时，以请求的全部参数为键缓存响应；
+        相同请求正在执行时直接等待其结果，不再重复调用提供商。
+        
+        Args:
+            provider: 执行调用的提供商
+            request: 标准化的LLM请求
+            schema_name: 结构化输出的模型名称，普通文本生成为空字符串
+            cache: 是否强制缓存
+            call: 未命中时执行的调用
+            
+        Returns:
+            LLMResponse: 生成响应（命中时为缓存响应的拷贝）
+        """
+        if request.system_prefix:
+            call = self._with_prefix_hash(request, call)
+        
+        if not (self._response_cache_enabled and (cache or request.temperature <= 0)):
+            return await call()
+        
+        key = self._response_cache_key(provider, request, schema_name)
+        cached = self._response_cache.get(key)
+        if cached is not None:
+            return cached.model_copy(deep=True)
+        
+        # 事件循环单线程执行，查询和登记之间没有await，不需要额外加锁
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            try:
+                return (await asyncio.shield(inflight)).model_copy(deep=True)
+            except asyncio.CancelledError:
+                # 发起方被取消时由当前调用方自己执行；当前调用方被取消则继续抛出
+                if not inflight.cancelled():
+                    raise
+                return await call()
+        
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            response = await call()
+        except BaseException as e:
+            if isinstance(e, asyncio.CancelledError):
+                future.cancel()
+            else:
+                future.set_exception(e)
+                # 没有其他等待方时避免“异常未被获取”的警告
+                future.exception()
+            raise
+        else:
+            self._response_cache.set(key, response)
+            future.set_result(response)
+            return response.model_copy(deep=True)
+        finally:
+            self._inflight.pop(key, None)
     
     def get_langchain_llm(
         self,
@@ -183,23 +569,23 @@ class LLMService:
         return provider.get_langchain_llm(model, **kwargs)
     
     async def get_all_available_models(self) -> Dict[LLMProviderType, List[LLMModel]]:
-        """获取所有提供商的可用模型
+        """获取所有提供商的可用模型，各提供商并发获取
         
         Returns:
             Dict[LLMProviderType, List[LLMModel]]: 按提供商分组的模型列表
         """
         return await self._factory.get_all_available_models()
     
-    def get_available_providers(self) -> List[LLMProviderType]:
+    def get_available_providers(self) -> Tuple[LLMProviderType, ...]:
         """获取所有可用的提供商类型
         
         Returns:
-            List[LLMProviderType]: 可用提供商类型列表
+            Tuple[LLMProviderType, ...]: 可用提供商类型
         """
         return self._factory.get_available_providers()
     
     async def health_check_all(self) -> Dict[LLMProviderType, bool]:
-        """检查所有提供商的健康状态
+        """检查所有提供商的健康状态，各提供商并发检查
         
         Returns:
             Dict[LLMProviderType, bool]: 各提供商的健康状态
@@ -238,14 +624,21 @@ class ConfigurableLLMService(LLMService):
     支持从RunnableConfig中读取配置参数。
     """
     
-    def __init__(self, config: Optional[RunnableConfig] = None):
+    def __init__(
+        self,
+        config: Optional[RunnableConfig] = None,
+        overrides: Optional[Dict[str, Any]] = None
+    ):
         """初始化可配置LLM服务
         
         Args:
             config: 运行时配置
+            overrides: 直接指定的参数（如 llm_provider、reasoning_model），优先于config，
+                调用方无需为此复制和改写config
         """
         super().__init__()
         self.config = config or {}
+        self.overrides = overrides or {}
         self._extract_config_params()
     
     def _extract_config_params(self):
@@ -253,15 +646,25 @@ class ConfigurableLLMService(LLMService):
         configurable = self.config.get("configurable", {})
         
         # 添加完整的配置调试信息
-        print(f"🔧 ConfigurableLLMService: 配置解析")
-        print(f"🔧 configurable keys: {list(configurable.keys()) if configurable else 'None'}")
-        print(f"🔧 reasoning_model in configurable: {configurable.get('reasoning_model') if configurable else 'N/A'}")
-        print(f"🔧 config top-level keys: {list(self.config.keys()) if self.config else 'None'}")
-        print(f"🔧 reasoning_model in config: {self.config.get('reasoning_model') if self.config else 'N/A'}")
+        debug = logger.isEnabledFor(logging.DEBUG)
+        if debug:
+            logger.debug(
+                "ConfigurableLLMService 配置解析: configurable keys=%s, reasoning_model in configurable=%s, "
+                "config top-level keys=%s, reasoning_model in config=%s",
+                list(configurable.keys()) if configurable else None,
+                configurable.get("reasoning_model") if configurable else "N/A",
+                list(self.config.keys()) if self.config else None,
+                self.config.get("reasoning_model") if self.config else "N/A",
+            )
         
         # 使用与Configuration相同的参数读取逻辑
         def get_param_value(param_name: str):
-            """获取参数值，优先级：configurable > 顶层config > 环境变量"""
+            """获取参数值，优先级：overrides > configurable > 顶层config > 环境变量"""
+            # 0. 从直接指定的参数中获取
+            value = self.overrides.get(param_name)
+            if value is not None:
+                return value
+            
             # 1. 从configurable中获取
             value = configurable.get(param_name)
             if value is not None:
@@ -273,7 +676,6 @@ class ConfigurableLLMService(LLMService):
                 return value
             
             # 3. 从环境变量获取
-            import os
             return os.environ.get(param_name.upper())
         
         # 提取LLM相关配置
@@ -285,28 +687,42 @@ class ConfigurableLLMService(LLMService):
         # 如果用户设置了reasoning_model，用它来覆盖所有任务模型
         reasoning_model = get_param_value("reasoning_model")
         if reasoning_model:
-            print(f"🔧 用户选择了reasoning_model: {reasoning_model}，将用于所有任务")
+            logger.debug("用户选择了reasoning_model: %s，将用于所有任务", reasoning_model)
             self.query_generator_model = reasoning_model
             self.reflection_model = reasoning_model  
             self.answer_model = reasoning_model
         
-        print(f"🔧 最终参数:")
-        print(f"🔧 - query_generator_model: {self.query_generator_model}")
-        print(f"🔧 - reflection_model: {self.reflection_model}")
-        print(f"🔧 - answer_model: {self.answer_model}")
-        print(f"🔧 - llm_provider: {self.llm_provider}")
-        print(f"🔧 - reasoning_model (用户选择): {reasoning_model}")
+        # 任务类型到模型的映射，get_model_for_task 直接查表
+        self._task_models: Dict[LLMTaskType, Optional[str]] = {
+            LLMTaskType.QUERY_GENERATION: self.query_generator_model,
+            LLMTaskType.REFLECTION: self.reflection_model,
+            LLMTaskType.ANSWER_GENERATION: self.answer_model,
+        }
+        
+        if debug:
+            logger.debug(
+                "最终参数: query_generator_model=%s, reflection_model=%s, answer_model=%s, "
+                "llm_provider=%s, reasoning_model (用户选择)=%s",
+                self.query_generator_model, self.reflection_model, self.answer_model,
+                self.llm_provider, reasoning_model,
+                extra={
+                    "query_model": self.query_generator_model,
+                    "reflection_model": self.reflection_model,
+                    "answer_model": self.answer_model,
+                    "provider": self.llm_provider,
+                },
+            )
         
         # 如果指定了提供商，尝试获取对应的提供商实例
         if self.llm_provider:
             try:
                 provider_type = LLMProviderType(self.llm_provider)
                 self._default_provider = self.get_provider(provider_type)
-                print(f"🔧 成功设置提供商: {provider_type}")
+                logger.debug("成功设置提供商: %s", provider_type)
             except (ValueError, LLMProviderError) as e:
-                print(f"Warning: Failed to set provider {self.llm_provider}: {e}")
+                logger.warning("Failed to set provider %s: %s", self.llm_provider, e)
         else:
-            print(f"🔧 未指定llm_provider，使用系统默认提供商")
+            logger.debug("未指定llm_provider，使用系统默认提供商")
     
     def get_model_for_task(self, task_type: LLMTaskType) -> Optional[str]:
         """根据任务类型获取对应的模型
@@ -317,14 +733,7 @@ class ConfigurableLLMService(LLMService):
         Returns:
             Optional[str]: 模型名称
         """
-        if task_type == LLMTaskType.QUERY_GENERATION:
-            return self.query_generator_model
-        elif task_type == LLMTaskType.REFLECTION:
-            return self.reflection_model
-        elif task_type == LLMTaskType.ANSWER_GENERATION:
-            return self.answer_model
-        else:
-            return None
+        return self._task_models.get(task_type)
     
     async def generate_for_task(
         self,
@@ -399,11 +808,10 @@ class ConfigurableLLMService(LLMService):
         """
         # 如果配置中指定了提供商，使用配置的提供商
         if hasattr(self, '_default_provider') and self._default_provider is not None:
-            print(f"🔧 get_default_provider: 使用配置的提供商: {self._default_provider.get_provider_type()}")
             return self._default_provider
         
         # 否则使用父类的默认提供商
-        print(f"🔧 get_default_provider: 使用系统默认提供商")
+        logger.debug("get_default_provider: 使用系统默认提供商")
         return super().get_default_provider()
 
 
@@ -423,6 +831,12 @@ def get_llm_service() -> LLMService:
     return _llm_service
 
 
+def reset_llm_service() -> None:
+    """丢弃全局LLM服务实例（及其持有的提供商实例），重新加载配置后调用"""
+    global _llm_service
+    _llm_service = None
+
+
 def create_configurable_llm_service(config: RunnableConfig) -> ConfigurableLLMService:
     """创建可配置的LLM服务实例
     
@@ -3,11 +3,15 @@
 定义了所有LLM提供商使用的标准化请求、响应和配置数据结构。
 """
 
+import hashlib
 from abc import ABC, abstractmethod
-from typing import Dict, Any, List, Optional, Union
+from functools import lru_cache
+from typing import Dict, Any, List, Optional, Tuple, Type, Union
 from dataclasses import dataclass
-from pydantic import BaseModel, Field
+import orjson
+from pydantic import BaseModel, ConfigDict, Field
 from enum import Enum
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
 
 
 class LLMProviderType(str, Enum):
@@ -37,15 +41,69 @@ class LLMModel:
     description: Optional[str] = None
 
 
+@lru_cache(maxsize=128)
+def get_output_json_schema(output_schema: Type) -> Optional[Dict[str, Any]]:
+    """获取输出结构的JSON Schema，每个模型类只生成一次
+
+    Args:
+        output_schema: 输出结构的Pydantic模型类
+
+    Returns:
+        Optional[Dict[str, Any]]: JSON Schema，不是Pydantic模型时返回None
+    """
+    if not hasattr(output_schema, 'model_json_schema'):
+        return None
+    return output_schema.model_json_schema()
+
+
+@lru_cache(maxsize=128)
+def get_schema_prompt(output_schema: Type) -> str:
+    """获取附加在提示词后的JSON格式说明，用于不支持结构化输出的模型
+
+    Schema以紧凑JSON序列化（比dict的repr更短，也是合法JSON），每个模型类只生成一次。
+
+    Args:
+        output_schema: 输出结构的Pydantic模型类
+
+    Returns:
+        str: 格式说明，不是Pydantic模型时返回空字符串
+    """
+    schema = get_output_json_schema(output_schema)
+    if schema is None:
+        return ""
+    return f"\n\nPlease respond in the following JSON format:\n{orjson.dumps(schema).decode()}"
+
+
+@lru_cache(maxsize=32)
+def get_prefix_hash(system_prefix: str) -> str:
+    """计算系统提示前缀的短哈希，用于观察提供商前缀缓存的复用情况"""
+    return hashlib.sha256(system_prefix.encode("utf-8")).hexdigest()[:16]
+
+
 class LLMRequest(BaseModel):
-    """标准化LLM请求"""
-    prompt: str = Field(description="输入提示词")
+    """标准化LLM请求
+    
+    system_prefix 是各次请求共用的稳定指令，作为系统消息放在最前面，
+    使提供商的前缀缓存（prompt caching）能够命中；prompt 只包含每次请求变化的部分。
+    """
+    prompt: str = Field(description="输入提示词（每次请求变化的部分）")
+    system_prefix: str = Field(default="", description="稳定的系统提示前缀")
     model: str = Field(description="使用的模型ID")
     task_type: LLMTaskType = Field(description="任务类型")
     temperature: float = Field(default=0.7, description="生成温度")
     max_tokens: Optional[int] = Field(default=None, description="最大生成token数")
     structured_output_schema: Optional[Dict[str, Any]] = Field(default=None, description="结构化输出模式")
     additional_params: Dict[str, Any] = Field(default_factory=dict, description="提供商特定参数")
+    
+    def to_messages(self) -> Union[str, List[BaseMessage]]:
+        """转换为LangChain模型的输入
+        
+        Returns:
+            Union[str, List[BaseMessage]]: 没有系统前缀时为提示词本身，否则为 系统消息+用户消息
+        """
+        if not self.system_prefix:
+            return self.prompt
+        return [SystemMessage(content=self.system_prefix), HumanMessage(content=self.prompt)]
 
 
 class LLMResponse(BaseModel):
@@ -59,15 +117,26 @@ class LLMResponse(BaseModel):
 
 
 class LLMProviderConfig(BaseModel):
-    """LLM提供商配置基类"""
+    """LLM提供商配置基类
+
+    配置创建后不可修改且可哈希，提供商实例以配置对象为键缓存。
+    """
+    model_config = ConfigDict(frozen=True)
+
     provider_type: LLMProviderType = Field(description="提供商类型")
     api_key: str = Field(description="API密钥")
-    models: List[str] = Field(description="可用模型列表")
+    models: Tuple[str, ...] = Field(description="可用模型列表")
     default_model: str = Field(description="默认模型")
     timeout: float = Field(default=30.0, description="请求超时时间")
     max_retries: int = Field(default=3, description="最大重试次数")
     additional_config: Dict[str, Any] = Field(default_factory=dict, description="提供商特定配置")
 
+    def __hash__(self) -> int:
+        """按字段值计算哈希，additional_config（字典不可哈希）不参与计算，相等比较仍包含它"""
+        return hash((type(self), tuple(
+            value for name, value in self.__dict__.items() if name != "additional_config"
+        )))
+
 
 class GeminiProviderConfig(LLMProviderConfig):
     """Google Gemini提供商配置"""
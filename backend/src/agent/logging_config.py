@@ -0,0 +1,82 @@
+"""日志配置
+
+agent包内的日志统一写入内存队列，由后台线程输出到stderr（以及可选的日志文件），
+避免在异步请求处理中同步写终端或磁盘阻塞事件循环。
+设置 LOG_FORMAT=json 时每条日志输出为一行JSON，日志调用中通过 extra 传入的字段作为独立的键。
+"""
+
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+from typing import Optional
+
+import orjson
+
+_LOG_FORMAT = "%(asctime)s %(levelname)s [%(name)s] %(message)s"
+
+# LogRecord自带的属性，JSON格式中其余属性视为调用方通过 extra 传入的字段
+_RECORD_ATTRS = frozenset(logging.makeLogRecord({}).__dict__) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """把日志记录格式化为一行JSON"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        """把一条日志记录序列化为JSON字符串"""
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return orjson.dumps(entry, default=str).decode()
+
+
+def _make_formatter() -> logging.Formatter:
+    """按 LOG_FORMAT 创建格式化器"""
+    if os.getenv("LOG_FORMAT", "text").lower() == "json":
+        return JsonFormatter()
+    return logging.Formatter(_LOG_FORMAT)
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def setup_logging() -> None:
+    """为agent包的日志配置队列输出，重复调用时不会重复配置
+
+    日志级别由环境变量 LOG_LEVEL 控制，默认 INFO；
+    设置 LOG_FILE 时同时追加写入该文件，用于保留调试追踪日志。
+    """
+    global _listener
+
+    if _listener is not None:
+        return
+
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(_make_formatter())
+    handlers = [stream_handler]
+
+    log_file = os.getenv("LOG_FILE")
+    if log_file:
+        file_handler = logging.FileHandler(log_file, mode="a", encoding="utf-8", delay=True)
+        file_handler.setFormatter(_make_formatter())
+        handlers.append(file_handler)
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+    logger = logging.getLogger("agent")
+    logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    level = logging.getLevelName(os.getenv("LOG_LEVEL", "INFO").upper())
+    logger.setLevel(level if isinstance(level, int) else logging.INFO)
+    # 由队列负责输出，不再交给上层（如LangGraph服务）的处理器重复打印
+    logger.propagate = False
@@ -1,4 +1,6 @@
 from datetime import datetime
+from string import Formatter
+from typing import Callable
 
 
 # Get current date in a readable format
@@ -6,15 +8,41 @@ def get_current_date():
     return datetime.now().strftime("%B %d, %Y")
 
 
+def compile_template(template: str) -> Callable[..., str]:
+    """把str.format风格的模板预先拆分为字面量片段和占位符，返回渲染函数
+
+    模板只在导入时解析一次，渲染时只需按顺序拼接片段，
+    与 template.format(**kwargs) 的结果相同（多余的参数同样被忽略）。
+    """
+    parts = []
+    for literal, field, format_spec, conversion in Formatter().parse(template):
+        if format_spec or conversion:
+            raise ValueError(f"Unsupported placeholder in prompt template: {{{field}}}")
+        parts.append((literal, field))
+
+    def render(**kwargs) -> str:
+        segments = []
+        for literal, field in parts:
+            segments.append(literal)
+            if field is not None:
+                segments.append(str(kwargs[field]))
+        return "".join(segments)
+
+    return render
+
+
+# 以下各任务的提示词分为两部分：
+# - *_instructions：各次请求共用的稳定指令，作为系统提示前缀放在最前面，以命中提供商的前缀缓存
+# - *_input：每次请求变化的内容（日期、研究主题、摘要等）
 query_writer_instructions = """Your goal is to generate sophisticated and diverse web search queries. These queries are intended for an advanced automated web research tool capable of analyzing complex results, following links, and synthesizing information.
 
 Instructions:
 - Always prefer a single search query, only add another query if the original question requests multiple aspects or elements and one query is not enough.
 - Each query should focus on one specific aspect of the original question.
-- Don't produce more than {number_queries} queries.
+- Don't produce more than the maximum number of queries given in the input.
 - Queries should be diverse, if the topic is broad, generate more than 1 query.
 - Don't generate multiple similar queries, 1 is enough.
-- Query should ensure that the most current information is gathered. The current date is {current_date}.
+- Query should ensure that the most current information is gathered. The current date is given in the input.
 
 Format: 
 - Format your response as a JSON object with ALL two of these exact keys:
@@ -25,11 +53,14 @@ Example:
 
 Topic: What revenue grew more last year apple stock or the number of people buying an iphone
 ```json
-{{
+{
     "rationale": "To answer this comparative growth question accurately, we need specific data points on Apple's stock performance and iPhone sales metrics. These queries target the precise financial information needed: company revenue trends, product-specific unit sales figures, and stock price movement over the same fiscal period for direct comparison.",
     "query": ["Apple total revenue growth fiscal year 2024", "iPhone unit sales growth fiscal year 2024", "Apple stock price growth fiscal year 2024"],
-}}
-```
+}
+```"""
+
+query_writer_input = """Maximum number of queries: {number_queries}
+Current date: {current_date}
 
 Context: {research_topic}"""
 
@@ -47,7 +78,7 @@ Research Topic:
 {research_topic}
 """
 
-reflection_instructions = """You are an expert research assistant analyzing summaries about "{research_topic}".
+reflection_instructions = """You are an expert research assistant analyzing summaries about the research topic given in the input.
 
 Instructions:
 - Identify knowledge gaps or areas that need deeper exploration and generate a follow-up query. (1 or multiple).
@@ -66,14 +97,16 @@ Output Format:
 
 Example:
 ```json
-{{
+{
     "is_sufficient": true, // or false
     "knowledge_gap": "The summary lacks information about performance metrics and benchmarks", // "" if is_sufficient is true
     "follow_up_queries": ["What are typical performance benchmarks and metrics used to evaluate [specific technology]?"] // [] if is_sufficient is true
-}}
+}
 ```
 
-Reflect carefully on the Summaries to identify knowledge gaps and produce a follow-up query. Then, produce your output following this JSON format:
+Reflect carefully on the Summaries to identify knowledge gaps and produce a follow-up query. Then, produce your output following this JSON format."""
+
+reflection_input = """Research Topic: "{research_topic}"
 
 Summaries:
 {summaries}
@@ -82,7 +115,7 @@ Summaries:
 answer_instructions = """Generate a high-quality answer to the user's question based on the provided summaries.
 
 Instructions:
-- The current date is {current_date}.
+- The current date is given in the input.
 - You are the final step of a multi-step research process, don't mention that you are the final step. 
 - You have access to all the information gathered from the previous steps.
 - You have access to the user's question.
@@ -91,9 +124,18 @@ Instructions:
 - Do NOT try to create markdown links yourself. Simply use [1], [2], [3] where you want to cite sources.
 - Include citations throughout your answer where information comes from specific sources.
 - For example: "According to recent research [1], the technology has improved significantly [2]."
+"""
+
+answer_input = """Current date: {current_date}
 
 User Context:
 - {research_topic}
 
 Summaries:
 {summaries}"""
+
+
+render_query_writer_input = compile_template(query_writer_input)
+render_web_searcher_instructions = compile_template(web_searcher_instructions)
+render_reflection_input = compile_template(reflection_input)
+render_answer_input = compile_template(answer_input)
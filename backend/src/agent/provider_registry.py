@@ -1,41 +1,32 @@
 """LLM提供商自动注册模块
 
-自动导入并注册所有可用的LLM提供商。
+延迟注册所有LLM提供商：这里只记录各提供商实现所在的模块和类名，
+第一次使用某个提供商时才导入其模块（及其依赖的SDK），
+只使用一个提供商的部署不需要加载其他提供商的依赖。
 """
 
+import logging
+
 from .llm_types import LLMProviderType
 from .llm_providers import LLMProviderRegistry
 
-# 导入所有提供商实现
-try:
-    from .providers.gemini_llm_provider import GeminiLLMProvider
-    LLMProviderRegistry.register(LLMProviderType.GEMINI, GeminiLLMProvider)
-    print("✅ Registered Gemini LLM Provider")
-except ImportError as e:
-    print(f"⚠️  Failed to register Gemini LLM Provider: {e}")
-
-try:
-    from .providers.azure_openai_provider import AzureOpenAIProvider
-    LLMProviderRegistry.register(LLMProviderType.AZURE_OPENAI, AzureOpenAIProvider)
-    print("✅ Registered Azure OpenAI Provider")
-except ImportError as e:
-    print(f"⚠️  Failed to register Azure OpenAI Provider: {e}")
+logger = logging.getLogger(__name__)
 
-try:
-    from .providers.bedrock_llm_provider import BedrockLLMProvider
-    LLMProviderRegistry.register(LLMProviderType.AWS_BEDROCK, BedrockLLMProvider)
-    print("✅ Registered AWS Bedrock Provider")
-except ImportError as e:
-    print(f"⚠️  Failed to register AWS Bedrock Provider: {e}")
+# 提供商类型 -> (模块名, 类名)
+_PROVIDER_MODULES = {
+    LLMProviderType.GEMINI: ("gemini_llm_provider", "GeminiLLMProvider"),
+    LLMProviderType.AZURE_OPENAI: ("azure_openai_provider", "AzureOpenAIProvider"),
+    LLMProviderType.AWS_BEDROCK: ("bedrock_llm_provider", "BedrockLLMProvider"),
+    LLMProviderType.OPENAI_COMPATIBLE: ("openai_compatible_provider", "OpenAICompatibleProvider"),
+}
 
-try:
-    from .providers.openai_compatible_provider import OpenAICompatibleProvider
-    LLMProviderRegistry.register(LLMProviderType.OPENAI_COMPATIBLE, OpenAICompatibleProvider)
-    print("✅ Registered OpenAI Compatible Provider")
-except ImportError as e:
-    print(f"⚠️  Failed to register OpenAI Compatible Provider: {e}")
+for _provider_type, (_module_name, _class_name) in _PROVIDER_MODULES.items():
+    LLMProviderRegistry.register_lazy(_provider_type, f"{__package__}.providers.{_module_name}", _class_name)
 
 # 显示注册的提供商
 registered_providers = LLMProviderRegistry.get_available_types()
-print(f"🔧 Total registered providers: {len(registered_providers)}")
-print(f"📋 Available providers: {[p.value for p in registered_providers]}")
\ No newline at end of file
+logger.info(
+    "Registered %d LLM providers: %s",
+    len(registered_providers),
+    [p.value for p in registered_providers]
+)
@@ -3,11 +3,11 @@
 提供Azure OpenAI服务的标准化LLM接口。
 """
 
+import logging
 import os
-from typing import Dict, Any, List, Optional, Type
+from typing import Dict, Any, List, Optional, Type, ClassVar
 from langchain_openai import AzureChatOpenAI
 from langchain_core.language_models import BaseLanguageModel
-import openai
 
 from ..llm_providers import BaseLLMProvider, LLMProviderRegistry
 from ..llm_types import (
@@ -21,6 +21,8 @@ from ..llm_types import (
     LLMProviderTimeoutError
 )
 
+logger = logging.getLogger(__name__)
+
 
 class AzureOpenAIProvider(BaseLLMProvider):
     """Azure OpenAI LLM提供商
@@ -28,6 +30,45 @@ class AzureOpenAIProvider(BaseLLMProvider):
     封装Azure OpenAI API的调用，提供标准化接口。
     """
     
+    # 配置验证结果，第一次调用 validate_config 时计算
+    _is_config_valid: Optional[bool] = None
+    
+    # 预定义的模型信息，各实例共享，不随实例重复构建
+    _MODEL_INFO: ClassVar[Dict[str, LLMModel]] = {
+        "gpt-4": LLMModel(
+            id="gpt-4",
+            name="GPT-4",
+            provider=LLMProviderType.AZURE_OPENAI,
+            max_tokens=8192,
+            supports_structured_output=True,
+            description="Advanced reasoning and complex task model"
+        ),
+        "gpt-4-turbo": LLMModel(
+            id="gpt-4-turbo",
+            name="GPT-4 Turbo",
+            provider=LLMProviderType.AZURE_OPENAI,
+            max_tokens=128000,
+            supports_structured_output=True,
+            description="Enhanced GPT-4 with larger context window"
+        ),
+        "gpt-35-turbo": LLMModel(
+            id="gpt-35-turbo",
+            name="GPT-3.5 Turbo",
+            provider=LLMProviderType.AZURE_OPENAI,
+            max_tokens=4096,
+            supports_structured_output=True,
+            description="Fast and efficient model for general tasks"
+        ),
+        "gpt-4o": LLMModel(
+            id="gpt-4o",
+            name="GPT-4o",
+            provider=LLMProviderType.AZURE_OPENAI,
+            max_tokens=128000,
+            supports_structured_output=True,
+            description="Optimized GPT-4 model with multimodal capabilities"
+        )
+    }
+    
     def __init__(self, config: AzureOpenAIProviderConfig):
         """初始化Azure OpenAI提供商
         
@@ -37,48 +78,17 @@ class AzureOpenAIProvider(BaseLLMProvider):
         super().__init__(config)
         self.config: AzureOpenAIProviderConfig = config
         
-        # 初始化Azure OpenAI客户端
-        self._client = openai.AzureOpenAI(
-            api_key=config.api_key,
-            azure_endpoint=config.endpoint,
-            api_version=config.api_version
-        )
-        
-        # 预定义的模型信息
-        self._model_info = {
-            "gpt-4": LLMModel(
-                id="gpt-4",
-                name="GPT-4",
-                provider=LLMProviderType.AZURE_OPENAI,
-                max_tokens=8192,
-                supports_structured_output=True,
-                description="Advanced reasoning and complex task model"
-            ),
-            "gpt-4-turbo": LLMModel(
-                id="gpt-4-turbo",
-                name="GPT-4 Turbo",
-                provider=LLMProviderType.AZURE_OPENAI,
-                max_tokens=128000,
-                supports_structured_output=True,
-                description="Enhanced GPT-4 with larger context window"
-            ),
-            "gpt-35-turbo": LLMModel(
-                id="gpt-35-turbo",
-                name="GPT-3.5 Turbo",
-                provider=LLMProviderType.AZURE_OPENAI,
-                max_tokens=4096,
-                supports_structured_output=True,
-                description="Fast and efficient model for general tasks"
-            ),
-            "gpt-4o": LLMModel(
-                id="gpt-4o",
-                name="GPT-4o",
+        # 配置的模型列表在实例生命周期内不变，可用模型信息只需构建一次
+        self._available_models: List[LLMModel] = [
+            self._MODEL_INFO.get(model_id) or LLMModel(
+                id=model_id,
+                name=model_id,
                 provider=LLMProviderType.AZURE_OPENAI,
-                max_tokens=128000,
                 supports_structured_output=True,
-                description="Optimized GPT-4 model with multimodal capabilities"
+                description=f"Azure OpenAI model: {model_id}"
             )
-        }
+            for model_id in config.models
+        ]
     
     async def generate(self, request: LLMRequest) -> LLMResponse:
         """生成文本内容
@@ -101,20 +111,18 @@ class AzureOpenAIProvider(BaseLLMProvider):
             )
             
             # 调用LLM
-            result = llm.invoke(request.prompt)
+            result = await llm.ainvoke(request.to_messages())
             
             # 提取内容
             content = result.content if hasattr(result, 'content') else str(result)
             
-            # 提取使用统计
-            usage = {}
-            if hasattr(result, 'response_metadata') and result.response_metadata:
-                token_usage = result.response_metadata.get('token_usage', {})
-                usage = {
-                    "prompt_tokens": token_usage.get('prompt_tokens', 0),
-                    "completion_tokens": token_usage.get('completion_tokens', 0),
-                    "total_tokens": token_usage.get('total_tokens', 0)
-                }
+            # 提取使用统计，没有统计信息时为None
+            token_usage = (getattr(result, 'response_metadata', None) or {}).get('token_usage')
+            usage = {
+                "prompt_tokens": token_usage.get('prompt_tokens', 0),
+                "completion_tokens": token_usage.get('completion_tokens', 0),
+                "total_tokens": token_usage.get('total_tokens', 0)
+            } if token_usage else None
             
             return self._create_response(
                 content=content,
@@ -153,14 +161,12 @@ class AzureOpenAIProvider(BaseLLMProvider):
             )
             
             # 使用结构化输出
-            structured_llm = llm.with_structured_output(output_schema)
-            result = structured_llm.invoke(request.prompt)
-            
-            # 生成文本表示
-            content = str(result) if result else ""
+            structured_llm = self._get_structured_llm(llm, output_schema)
+            result = await structured_llm.ainvoke(request.to_messages())
             
+            # 结构化结果放在 structured_data 中，不再额外生成文本表示
             return self._create_response(
-                content=content,
+                content="",
                 model=request.model,
                 structured_data=result,
                 metadata={
@@ -186,7 +192,10 @@ class AzureOpenAIProvider(BaseLLMProvider):
         Returns:
             BaseLanguageModel: LangChain兼容的LLM实例
         """
-        return AzureChatOpenAI(
+        if self._http_client is not None:
+            kwargs.setdefault("http_async_client", self._http_client)
+        
+        return self._get_cached_llm(model, kwargs, lambda: AzureChatOpenAI(
             azure_deployment=model,  # Azure中使用deployment名称
             api_key=self.config.api_key,
             azure_endpoint=self.config.endpoint,
@@ -194,31 +203,42 @@ class AzureOpenAIProvider(BaseLLMProvider):
             max_retries=self.config.max_retries,
             timeout=self.config.timeout,
             **kwargs
-        )
+        ))
     
     def get_provider_type(self) -> LLMProviderType:
         """返回提供商类型"""
         return LLMProviderType.AZURE_OPENAI
     
     def validate_config(self) -> bool:
-        """验证提供商配置是否有效"""
+        """验证提供商配置是否有效
+        
+        配置不可修改，结果在第一次验证时计算并保存。
+        基类在 __init__ 中即调用此方法，因此不在子类的 __init__ 中预先计算。
+        """
+        if self._is_config_valid is None:
+            self._is_config_valid = self.validate_config_static(self.config)
+        return self._is_config_valid
+    
+    @staticmethod
+    def validate_config_static(config: AzureOpenAIProviderConfig) -> bool:
+        """检查配置项是否完整，不创建客户端"""
         try:
             # 检查必需的配置项
             required_fields = ['api_key', 'endpoint', 'api_version']
             for field in required_fields:
-                if not getattr(self.config, field, None):
+                if not getattr(config, field, None):
                     return False
             
             # 检查模型列表
-            if not self.config.models:
+            if not config.models:
                 return False
             
             # 检查默认模型是否在列表中
-            if self.config.default_model not in self.config.models:
+            if config.default_model not in config.models:
                 return False
             
             # 验证端点格式
-            if not self.config.endpoint.startswith(('http://', 'https://')):
+            if not config.endpoint.startswith(('http://', 'https://')):
                 return False
             
             return True
@@ -226,23 +246,9 @@ class AzureOpenAIProvider(BaseLLMProvider):
         except Exception:
             return False
     
-    async def get_available_models(self) -> List[LLMModel]:
+    async def _fetch_models_impl(self) -> List[LLMModel]:
         """获取可用模型列表"""
-        models = []
-        for model_id in self.config.models:
-            if model_id in self._model_info:
-                models.append(self._model_info[model_id])
-            else:
-                # 为未知模型创建基本信息
-                models.append(LLMModel(
-                    id=model_id,
-                    name=model_id,
-                    provider=LLMProviderType.AZURE_OPENAI,
-                    supports_structured_output=True,
-                    description=f"Azure OpenAI model: {model_id}"
-                ))
-        
-        return models
+        return self._available_models
     
     def get_rate_limits(self) -> Dict[str, Any]:
         """获取API速率限制信息"""
@@ -277,7 +283,7 @@ class AzureOpenAIProvider(BaseLLMProvider):
             return deployments
             
         except Exception as e:
-            print(f"Failed to list Azure OpenAI deployments: {e}")
+            logger.warning("Failed to list Azure OpenAI deployments: %s", e)
             return []
 
 
@@ -3,11 +3,14 @@
 提供AWS Bedrock服务的标准化LLM接口。
 """
 
+import asyncio
+import logging
 import os
-import json
-from typing import Dict, Any, List, Optional, Type
+import time
+from typing import Dict, Any, List, Optional, Type, Union, ClassVar
 from langchain_aws import ChatBedrock
 from langchain_core.language_models import BaseLanguageModel
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
 import boto3
 from botocore.exceptions import ClientError, NoCredentialsError
 
@@ -20,9 +23,12 @@ from ..llm_types import (
     BedrockProviderConfig,
     LLMProviderError,
     LLMProviderAPIError,
-    LLMProviderTimeoutError
+    LLMProviderTimeoutError,
+    get_schema_prompt
 )
 
+logger = logging.getLogger(__name__)
+
 
 class BedrockLLMProvider(BaseLLMProvider):
     """AWS Bedrock LLM提供商
@@ -30,6 +36,57 @@ class BedrockLLMProvider(BaseLLMProvider):
     封装AWS Bedrock API的调用，提供标准化接口。
     """
     
+    # AWS凭证验证结果，第一次深度验证时计算
+    _creds_verified: Optional[bool] = None
+    
+    # 支持Bedrock提示缓存的Claude模型，及可缓存前缀的最少token数；
+    # 跨区域推理配置文件（如 us.anthropic....）去掉区域前缀后匹配
+    _PROMPT_CACHE_MIN_TOKENS: ClassVar[Dict[str, int]] = {
+        "anthropic.claude-3-5-haiku-20241022-v1:0": 2048,
+        "anthropic.claude-3-7-sonnet-20250219-v1:0": 1024,
+        "anthropic.claude-sonnet-4-20250514-v1:0": 1024,
+        "anthropic.claude-opus-4-20250514-v1:0": 1024,
+        "anthropic.claude-opus-4-1-20250805-v1:0": 1024,
+        "anthropic.claude-sonnet-4-5-20250929-v1:0": 1024,
+        "anthropic.claude-haiku-4-5-20251001-v1:0": 4096,
+    }
+    
+    # 预定义的模型信息，各实例共享，不随实例重复构建
+    _MODEL_INFO: ClassVar[Dict[str, LLMModel]] = {
+        "anthropic.claude-3-sonnet-20240229-v1:0": LLMModel(
+            id="anthropic.claude-3-sonnet-20240229-v1:0",
+            name="Claude 3 Sonnet",
+            provider=LLMProviderType.AWS_BEDROCK,
+            max_tokens=200000,
+            supports_structured_output=True,
+            description="Balanced model for a wide range of tasks"
+        ),
+        "anthropic.claude-3-haiku-20240307-v1:0": LLMModel(
+            id="anthropic.claude-3-haiku-20240307-v1:0",
+            name="Claude 3 Haiku",
+            provider=LLMProviderType.AWS_BEDROCK,
+            max_tokens=200000,
+            supports_structured_output=True,
+            description="Fast and efficient model for simple tasks"
+        ),
+        "anthropic.claude-3-opus-20240229-v1:0": LLMModel(
+            id="anthropic.claude-3-opus-20240229-v1:0",
+            name="Claude 3 Opus",
+            provider=LLMProviderType.AWS_BEDROCK,
+            max_tokens=200000,
+            supports_structured_output=True,
+            description="Most capable model for complex reasoning"
+        ),
+        "amazon.titan-text-express-v1": LLMModel(
+            id="amazon.titan-text-express-v1",
+            name="Titan Text Express",
+            provider=LLMProviderType.AWS_BEDROCK,
+            max_tokens=8000,
+            supports_structured_output=False,
+            description="Amazon's text generation model"
+        )
+    }
+    
     def __init__(self, config: BedrockProviderConfig):
         """初始化Bedrock提供商
         
@@ -47,41 +104,10 @@ class BedrockLLMProvider(BaseLLMProvider):
             aws_secret_access_key=config.secret_access_key
         )
         
-        # 预定义的模型信息
-        self._model_info = {
-            "anthropic.claude-3-sonnet-20240229-v1:0": LLMModel(
-                id="anthropic.claude-3-sonnet-20240229-v1:0",
-                name="Claude 3 Sonnet",
-                provider=LLMProviderType.AWS_BEDROCK,
-                max_tokens=200000,
-                supports_structured_output=True,
-                description="Balanced model for a wide range of tasks"
-            ),
-            "anthropic.claude-3-haiku-20240307-v1:0": LLMModel(
-                id="anthropic.claude-3-haiku-20240307-v1:0",
-                name="Claude 3 Haiku",
-                provider=LLMProviderType.AWS_BEDROCK,
-                max_tokens=200000,
-                supports_structured_output=True,
-                description="Fast and efficient model for simple tasks"
-            ),
-            "anthropic.claude-3-opus-20240229-v1:0": LLMModel(
-                id="anthropic.claude-3-opus-20240229-v1:0",
-                name="Claude 3 Opus",
-                provider=LLMProviderType.AWS_BEDROCK,
-                max_tokens=200000,
-                supports_structured_output=True,
-                description="Most capable model for complex reasoning"
-            ),
-            "amazon.titan-text-express-v1": LLMModel(
-                id="amazon.titan-text-express-v1",
-                name="Titan Text Express",
-                provider=LLMProviderType.AWS_BEDROCK,
-                max_tokens=8000,
-                supports_structured_output=False,
-                description="Amazon's text generation model"
-            )
-        }
+        # 控制面客户端（list_foundation_models），第一次使用时创建
+        self._bedrock_control_client = None
+        self._foundation_models: Optional[List[Dict[str, Any]]] = None
+        self._foundation_models_expiry = 0.0
     
     async def generate(self, request: LLMRequest) -> LLMResponse:
         """生成文本内容
@@ -103,16 +129,20 @@ class BedrockLLMProvider(BaseLLMProvider):
                 max_tokens=request.max_tokens
             )
             
-            # 调用LLM
-            result = llm.invoke(request.prompt)
+            # 调用LLM（ChatBedrock的异步接口在线程池中执行boto3调用，不阻塞事件循环）
+            result = await llm.ainvoke(self._to_messages(request))
             
             # 提取内容
             content = result.content if hasattr(result, 'content') else str(result)
             
-            # 提取使用统计
+            # 提取使用统计，包括提示词缓存的读取和写入token数
             usage = {}
             if hasattr(result, 'response_metadata') and result.response_metadata:
-                usage = result.response_metadata.get('usage', {})
+                usage = dict(result.response_metadata.get('usage', {}))
+            token_details = (getattr(result, 'usage_metadata', None) or {}).get('input_token_details') or {}
+            if token_details:
+                usage["cache_read_input_tokens"] = token_details.get('cache_read', 0)
+                usage["cache_creation_input_tokens"] = token_details.get('cache_creation', 0)
             
             return self._create_response(
                 content=content,
@@ -148,11 +178,10 @@ class BedrockLLMProvider(BaseLLMProvider):
         
         try:
             # 检查模型是否支持结构化输出
-            model_info = self._model_info.get(request.model)
+            model_info = self._MODEL_INFO.get(request.model)
             if model_info and not model_info.supports_structured_output:
                 # 对于不支持结构化输出的模型，使用提示工程
-                schema_prompt = f"\n\nPlease respond in the following JSON format:\n{output_schema.model_json_schema()}"
-                request.prompt += schema_prompt
+                request.prompt += get_schema_prompt(output_schema)
             
             # 创建支持结构化输出的LLM实例
             llm = self.get_langchain_llm(
@@ -163,18 +192,16 @@ class BedrockLLMProvider(BaseLLMProvider):
             
             # 使用结构化输出（如果支持）
             if model_info and model_info.supports_structured_output:
-                structured_llm = llm.with_structured_output(output_schema)
-                result = structured_llm.invoke(request.prompt)
+                structured_llm = self._get_structured_llm(llm, output_schema)
+                result = await structured_llm.ainvoke(self._to_messages(request))
             else:
                 # 对于不支持的模型，尝试解析JSON响应
-                result = llm.invoke(request.prompt)
+                result = await llm.ainvoke(self._to_messages(request))
                 content = result.content if hasattr(result, 'content') else str(result)
                 try:
                     # 尝试解析JSON
-                    import json
-                    json_data = json.loads(content)
-                    result = output_schema(**json_data)
-                except (json.JSONDecodeError, ValueError):
+                    result = self._parse_structured_output(content, output_schema)
+                except ValueError:
                     # 如果解析失败，返回原始内容
                     result = content
             
@@ -198,6 +225,38 @@ class BedrockLLMProvider(BaseLLMProvider):
         except Exception as e:
             raise LLMProviderAPIError(f"Bedrock structured output error: {str(e)}")
     
+    @classmethod
+    def _prompt_cacheable(cls, request: LLMRequest) -> bool:
+        """系统提示前缀能否使用Bedrock提示缓存
+
+        模型需在 _PROMPT_CACHE_MIN_TOKENS 中，且前缀达到该模型的最少token数；
+        token数按约4个字符一个估算，估算偏低时只是不做标记。
+        """
+        model = request.model
+        _, _, rest = model.partition(".")
+        if rest.startswith("anthropic."):
+            model = rest
+        min_tokens = cls._PROMPT_CACHE_MIN_TOKENS.get(model)
+        return min_tokens is not None and len(request.system_prefix) // 4 >= min_tokens
+    
+    @classmethod
+    def _to_messages(cls, request: LLMRequest) -> Union[str, List[BaseMessage]]:
+        """转换为LangChain模型的输入
+        
+        支持提示缓存的Claude模型，足够长的系统提示前缀标记为可缓存（cache_control: ephemeral），
+        Bedrock会缓存这部分前缀，之后相同前缀的请求只需处理变化的部分。
+        """
+        if not request.system_prefix or not cls._prompt_cacheable(request):
+            return request.to_messages()
+        return [
+            SystemMessage(content=[{
+                "type": "text",
+                "text": request.system_prefix,
+                "cache_control": {"type": "ephemeral"},
+            }]),
+            HumanMessage(content=request.prompt),
+        ]
+    
     def get_langchain_llm(self, model: str, **kwargs) -> BaseLanguageModel:
         """获取LangChain兼容的LLM实例
         
@@ -208,68 +267,95 @@ class BedrockLLMProvider(BaseLLMProvider):
         Returns:
             BaseLanguageModel: LangChain兼容的LLM实例
         """
-        return ChatBedrock(
+        return self._get_cached_llm(model, kwargs, lambda: ChatBedrock(
             model_id=model,
             region_name=self.config.region,
             credentials_profile_name=None,  # 使用显式凭证
             client=self._bedrock_client,
             **kwargs
-        )
+        ))
     
     def get_provider_type(self) -> LLMProviderType:
         """返回提供商类型"""
         return LLMProviderType.AWS_BEDROCK
     
-    def validate_config(self) -> bool:
-        """验证提供商配置是否有效"""
+    def validate_config(self, deep: bool = False) -> bool:
+        """验证提供商配置是否有效
+        
+        默认只检查配置项，不发起网络请求；deep=True 时额外调用
+        sts:GetCallerIdentity 验证AWS凭证，结果在实例上缓存。
+        该调用是同步网络请求，异步调用方应使用 verify_credentials。
+        
+        Args:
+            deep: 是否验证AWS凭证
+        """
+        if not self.validate_config_static(self.config):
+            return False
+        if not deep:
+            return True
+        
+        if self._creds_verified is None:
+            self._creds_verified = self._check_credentials()
+        return self._creds_verified
+    
+    async def verify_credentials(self) -> bool:
+        """在线程池中验证配置和AWS凭证，不阻塞事件循环"""
+        return await asyncio.to_thread(self.validate_config, True)
+    
+    def _check_credentials(self) -> bool:
+        """调用 sts:GetCallerIdentity 验证AWS凭证"""
+        try:
+            sts_client = boto3.client(
+                'sts',
+                region_name=self.config.region,
+                aws_access_key_id=self.config.access_key_id,
+                aws_secret_access_key=self.config.secret_access_key
+            )
+            sts_client.get_caller_identity()
+            return True
+        except (ClientError, NoCredentialsError):
+            return False
+        except Exception:
+            return False
+    
+    @staticmethod
+    def validate_config_static(config: BedrockProviderConfig) -> bool:
+        """检查配置项是否完整，不创建客户端、不验证AWS凭证"""
         try:
             # 检查必需的配置项
             required_fields = ['region', 'access_key_id', 'secret_access_key']
             for field in required_fields:
-                if not getattr(self.config, field, None):
+                if not getattr(config, field, None):
                     return False
             
             # 检查模型列表
-            if not self.config.models:
+            if not config.models:
                 return False
             
             # 检查默认模型是否在列表中
-            if self.config.default_model not in self.config.models:
+            if config.default_model not in config.models:
                 return False
             
-            # 验证AWS凭证
-            try:
-                sts_client = boto3.client(
-                    'sts',
-                    region_name=self.config.region,
-                    aws_access_key_id=self.config.access_key_id,
-                    aws_secret_access_key=self.config.secret_access_key
-                )
-                sts_client.get_caller_identity()
-                return True
-            except (ClientError, NoCredentialsError):
-                return False
+            return True
             
         except Exception:
             return False
     
-    async def get_available_models(self) -> List[LLMModel]:
+    async def _fetch_models_impl(self) -> List[LLMModel]:
         """获取可用模型列表"""
-        models = []
-        for model_id in self.config.models:
-            if model_id in self._model_info:
-                models.append(self._model_info[model_id])
-            else:
-                # 为未知模型创建基本信息
-                models.append(LLMModel(
-                    id=model_id,
-                    name=model_id,
-                    provider=LLMProviderType.AWS_BEDROCK,
-                    supports_structured_output=True,
-                    description=f"AWS Bedrock model: {model_id}"
-                ))
-        
-        return models
+        info = self._MODEL_INFO
+        ptype = LLMProviderType.AWS_BEDROCK
+        # 未知模型创建基本信息
+        return [
+            info[model_id] if model_id in info else LLMModel(
+                id=model_id,
+                name=model_id,
+                provider=ptype,
+                supports_structured_output=True,
+                description=f"AWS Bedrock model: {model_id}"
+            )
+            for model_id in self.config.models
+        ]
     
     def get_rate_limits(self) -> Dict[str, Any]:
         """获取API速率限制信息"""
@@ -283,24 +369,33 @@ class BedrockLLMProvider(BaseLLMProvider):
     async def list_foundation_models(self) -> List[Dict[str, Any]]:
         """列出可用的基础模型
         
+        控制面客户端只创建一次；结果与可用模型列表一样缓存 LLM_MODELS_TTL 秒。
+        
         Returns:
             List[Dict[str, Any]]: 基础模型信息列表
         """
+        now = time.monotonic()
+        if self._foundation_models is not None and now < self._foundation_models_expiry:
+            return self._foundation_models
+        
         try:
-            bedrock_client = boto3.client(
-                'bedrock',
-                region_name=self.config.region,
-                aws_access_key_id=self.config.access_key_id,
-                aws_secret_access_key=self.config.secret_access_key
-            )
+            if self._bedrock_control_client is None:
+                self._bedrock_control_client = boto3.client(
+                    'bedrock',
+                    region_name=self.config.region,
+                    aws_access_key_id=self.config.access_key_id,
+                    aws_secret_access_key=self.config.secret_access_key
+                )
             
-            response = bedrock_client.list_foundation_models()
-            return response.get('modelSummaries', [])
+            # boto3调用是同步的，放到线程池中执行
+            response = await asyncio.to_thread(self._bedrock_control_client.list_foundation_models)
+            self._foundation_models = response.get('modelSummaries', [])
+            self._foundation_models_expiry = now + self._models_ttl
+            return self._foundation_models
             
         except Exception as e:
-            print(f"Failed to list Bedrock foundation models: {e}")
+            logger.warning("Failed to list Bedrock foundation models: %s", e)
             return []
 
-
 # 注册Bedrock提供商
 LLMProviderRegistry.register(LLMProviderType.AWS_BEDROCK, BedrockLLMProvider)
\ No newline at end of file
@@ -3,12 +3,14 @@
 基于现有的Gemini集成，提供标准化的LLM接口。
 """
 
+import logging
 import os
-from typing import Dict, Any, List, Optional, Type
+from typing import Dict, Any, List, Optional, Type, ClassVar
+from google.genai import errors as genai_errors
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.language_models import BaseLanguageModel
-from google.genai import Client
 
+from ..utils import get_genai_client
 from ..llm_providers import BaseLLMProvider, LLMProviderRegistry
 from ..llm_types import (
     LLMRequest,
@@ -21,6 +23,20 @@ from ..llm_types import (
     LLMProviderTimeoutError
 )
 
+logger = logging.getLogger(__name__)
+
+
+def _native_structured_unsupported(error: Exception) -> bool:
+    """原生结构化输出的错误是否表示SDK或API不支持该schema
+
+    只有这类错误回退到LangChain；限流（429）、超时和服务端错误直接抛出，
+    避免一次速率限制额度变成多次上游调用。
+    """
+    if isinstance(error, genai_errors.ClientError):
+        return error.code == 400
+    # SDK在本地转换schema失败时抛出
+    return isinstance(error, (ValueError, TypeError, NotImplementedError))
+
 
 class GeminiLLMProvider(BaseLLMProvider):
     """Google Gemini LLM提供商
@@ -28,6 +44,34 @@ class GeminiLLMProvider(BaseLLMProvider):
     封装Google Gemini API的调用，提供标准化接口。
     """
     
+    # 预定义的模型信息，各实例共享，不随实例重复构建
+    _MODEL_INFO: ClassVar[Dict[str, LLMModel]] = {
+        "gemini-2.0-flash": LLMModel(
+            id="gemini-2.0-flash",
+            name="Gemini 2.0 Flash",
+            provider=LLMProviderType.GEMINI,
+            max_tokens=8192,
+            supports_structured_output=True,
+            description="Fast and efficient model for general tasks"
+        ),
+        "gemini-2.5-flash": LLMModel(
+            id="gemini-2.5-flash",
+            name="Gemini 2.5 Flash",
+            provider=LLMProviderType.GEMINI,
+            max_tokens=8192,
+            supports_structured_output=True,
+            description="Enhanced flash model with improved capabilities"
+        ),
+        "gemini-2.5-pro": LLMModel(
+            id="gemini-2.5-pro",
+            name="Gemini 2.5 Pro",
+            provider=LLMProviderType.GEMINI,
+            max_tokens=32768,
+            supports_structured_output=True,
+            description="Advanced model for complex reasoning tasks"
+        )
+    }
+    
     def __init__(self, config: GeminiProviderConfig):
         """初始化Gemini提供商
         
@@ -36,35 +80,7 @@ class GeminiLLMProvider(BaseLLMProvider):
         """
         super().__init__(config)
         self.config: GeminiProviderConfig = config
-        self._genai_client = Client(api_key=config.api_key)
-        
-        # 预定义的模型信息
-        self._model_info = {
-            "gemini-2.0-flash": LLMModel(
-                id="gemini-2.0-flash",
-                name="Gemini 2.0 Flash",
-                provider=LLMProviderType.GEMINI,
-                max_tokens=8192,
-                supports_structured_output=True,
-                description="Fast and efficient model for general tasks"
-            ),
-            "gemini-2.5-flash": LLMModel(
-                id="gemini-2.5-flash",
-                name="Gemini 2.5 Flash",
-                provider=LLMProviderType.GEMINI,
-                max_tokens=8192,
-                supports_structured_output=True,
-                description="Enhanced flash model with improved capabilities"
-            ),
-            "gemini-2.5-pro": LLMModel(
-                id="gemini-2.5-pro",
-                name="Gemini 2.5 Pro",
-                provider=LLMProviderType.GEMINI,
-                max_tokens=32768,
-                supports_structured_output=True,
-                description="Advanced model for complex reasoning tasks"
-            )
-        }
+        self._genai_client = get_genai_client(config.api_key)
     
     async def generate(self, request: LLMRequest) -> LLMResponse:
         """生成文本内容
@@ -87,7 +103,7 @@ class GeminiLLMProvider(BaseLLMProvider):
             )
             
             # 调用LLM
-            result = llm.invoke(request.prompt)
+            result = await llm.ainvoke(request.to_messages())
             
             # 提取内容
             content = result.content if hasattr(result, 'content') else str(result)
@@ -108,6 +124,10 @@ class GeminiLLMProvider(BaseLLMProvider):
     async def generate_structured(self, request: LLMRequest, output_schema: Type) -> LLMResponse:
         """生成结构化输出
         
+        Pydantic模型优先使用google-genai原生的 response_schema，由SDK直接解析为模型实例，
+        不经过LangChain的工具调用封装；原生调用因SDK或schema不支持而失败时
+        回退到LangChain的 with_structured_output，其他错误直接抛出。
+        
         Args:
             request: 标准化的LLM请求
             output_schema: 输出结构的Pydantic模型类
@@ -119,71 +139,59 @@ class GeminiLLMProvider(BaseLLMProvider):
         request = self._prepare_request(request)
         
         try:
-            print(f"🔧 Gemini structured_output - 开始生成")
-            print(f"🔧 - 模型: {request.model}")
-            print(f"🔧 - schema: {output_schema.__name__}")
-            print(f"🔧 - prompt长度: {len(request.prompt)}")
-            
-            # 创建支持结构化输出的LLM实例
-            llm = self.get_langchain_llm(
-                model=request.model,
-                temperature=request.temperature,
-                max_tokens=request.max_tokens
+            logger.debug(
+                "Gemini structured_output 开始生成: 模型=%s, schema=%s, prompt长度=%d",
+                request.model, output_schema.__name__, len(request.prompt)
             )
             
-            # 使用结构化输出
-            structured_llm = llm.with_structured_output(output_schema)
-            print(f"🔧 Gemini - 调用structured_llm.invoke")
+            native = hasattr(output_schema, 'model_json_schema')
             
             try:
-                result = structured_llm.invoke(request.prompt)
-                print(f"🔧 Gemini - 结构化输出结果: {result}")
-                print(f"🔧 Gemini - 结果类型: {type(result)}")
+                try:
+                    result = await self._invoke_structured(request, output_schema, request.max_tokens, native)
+                except Exception as native_error:
+                    if not native or not _native_structured_unsupported(native_error):
+                        raise
+                    logger.warning("Gemini 原生结构化输出失败，回退到LangChain: %s", native_error)
+                    native = False
+                    result = await self._invoke_structured(request, output_schema, request.max_tokens, native)
+                logger.debug("Gemini 结构化输出结果类型: %s", type(result).__name__)
                 
-                # 如果结果为None，尝试使用普通生成然后解析
+                # 结果为None多半是输出被max_tokens截断，直接用更大的token限制重试结构化输出
                 if result is None:
-                    print(f"⚠️ Gemini - 结构化输出为None，尝试普通生成")
-                    plain_result = llm.invoke(request.prompt)
-                    print(f"🔧 Gemini - 普通生成结果: {plain_result}")
-                    
-                    # 检查是否是MAX_TOKENS问题
-                    if (hasattr(plain_result, 'response_metadata') and 
-                        plain_result.response_metadata.get('finish_reason') == 'MAX_TOKENS'):
-                        print(f"⚠️ Gemini - 检测到MAX_TOKENS问题，使用更大的token限制重试")
-                        
-                        # 增加token限制重试
-                        retry_llm = self.get_langchain_llm(
-                            model=request.model,
-                            temperature=request.temperature,
-                            max_tokens=min(request.max_tokens * 2, 8000)  # 翻倍但不超过8000
+                    retry_max_tokens = self._retry_max_tokens(request)
+                    if retry_max_tokens:
+                        logger.warning(
+                            "Gemini 结构化输出为None，使用更大的token限制重试: %d", retry_max_tokens
                         )
-                        retry_structured_llm = retry_llm.with_structured_output(output_schema)
-                        result = retry_structured_llm.invoke(request.prompt)
-                        print(f"🔧 Gemini - 重试结果: {result}")
-                    
-                    # 如果仍然为None，尝试手动解析
-                    if result is None:
-                        # 尝试解析为结构化数据
-                        try:
-                            import json
-                            content_text = plain_result.content if hasattr(plain_result, 'content') else str(plain_result)
-                            # 简单的JSON解析尝试
-                            if content_text.strip().startswith('{'):
-                                parsed_data = json.loads(content_text.strip())
-                                result = output_schema(**parsed_data)
-                                print(f"🔧 Gemini - 手动解析成功: {result}")
-                        except Exception as parse_error:
-                            print(f"⚠️ Gemini - 手动解析失败: {parse_error}")
-                            # 使用原始文本作为content，但structured_data为None
-                            content = content_text
-                            result = None
+                        result = await self._invoke_structured(request, output_schema, retry_max_tokens, native)
+                        logger.debug("Gemini 重试结果类型: %s", type(result).__name__)
+                
+                # 重试后仍然为None，使用普通生成然后手动解析
+                if result is None:
+                    logger.warning("Gemini 结构化输出仍为None，尝试普通生成")
+                    llm = self.get_langchain_llm(
+                        model=request.model,
+                        temperature=request.temperature,
+                        max_tokens=request.max_tokens
+                    )
+                    plain_result = await llm.ainvoke(request.to_messages())
+                    content_text = plain_result.content if hasattr(plain_result, 'content') else str(plain_result)
+                    logger.debug("Gemini 普通生成结果长度: %d", len(content_text or ''))
+                    try:
+                        # 简单的JSON解析尝试
+                        if content_text.strip().startswith('{'):
+                            result = self._parse_structured_output(content_text, output_schema)
+                            logger.debug("Gemini 手动解析成功: %s", type(result).__name__)
+                    except Exception as parse_error:
+                        logger.warning("Gemini 手动解析失败: %s", parse_error)
+                        result = None
                 
                 # 生成文本表示
                 content = str(result) if result else ""
-                print(f"🔧 Gemini - 生成的content: '{content}'")
                 
             except Exception as invoke_error:
-                print(f"❌ Gemini - invoke调用失败: {invoke_error}")
+                logger.error("Gemini invoke调用失败: %s", invoke_error)
                 raise invoke_error
             
             return self._create_response(
@@ -202,6 +210,64 @@ class GeminiLLMProvider(BaseLLMProvider):
         except Exception as e:
             raise LLMProviderAPIError(f"Gemini structured output error: {str(e)}")
     
+    async def _invoke_structured(
+        self,
+        request: LLMRequest,
+        output_schema: Type,
+        max_tokens: Optional[int],
+        native: bool
+    ) -> Optional[Any]:
+        """调用一次结构化输出，没有得到结果时返回None
+        
+        Args:
+            request: 标准化的LLM请求
+            output_schema: 输出结构的Pydantic模型类
+            max_tokens: 本次调用的最大输出token数
+            native: 是否使用google-genai原生的 response_schema
+        """
+        if not native:
+            llm = self.get_langchain_llm(
+                model=request.model,
+                temperature=request.temperature,
+                max_tokens=max_tokens
+            )
+            return await self._get_structured_llm(llm, output_schema).ainvoke(request.to_messages())
+        
+        config: Dict[str, Any] = {
+            "temperature": request.temperature,
+            "response_mime_type": "application/json",
+            "response_schema": output_schema,
+            # 与LangChain实例使用相同的超时（毫秒）和重试次数
+            "http_options": {
+                "timeout": int(self.config.timeout * 1000),
+                "retry_options": {"attempts": self.config.max_retries + 1},
+            },
+        }
+        if max_tokens:
+            config["max_output_tokens"] = max_tokens
+        if request.system_prefix:
+            config["system_instruction"] = request.system_prefix
+        response = await self._genai_client.aio.models.generate_content(
+            model=request.model,
+            contents=request.prompt,
+            config=config
+        )
+        parsed = response.parsed
+        return parsed if isinstance(parsed, output_schema) else None
+    
+    def _retry_max_tokens(self, request: LLMRequest) -> Optional[int]:
+        """结构化输出被截断时重试使用的token限制
+        
+        翻倍但不超过模型的最大输出（未知模型按8000计）；
+        已经达到上限时返回None，不再重试。
+        """
+        model_info = self._MODEL_INFO.get(request.model)
+        limit = model_info.max_tokens if model_info and model_info.max_tokens else 8000
+        if not request.max_tokens:
+            return limit
+        retry_max_tokens = min(request.max_tokens * 2, limit)
+        return retry_max_tokens if retry_max_tokens > request.max_tokens else None
+    
     def get_langchain_llm(self, model: str, **kwargs) -> BaseLanguageModel:
         """获取LangChain兼容的LLM实例
         
@@ -212,13 +278,13 @@ class GeminiLLMProvider(BaseLLMProvider):
         Returns:
             BaseLanguageModel: LangChain兼容的LLM实例
         """
-        return ChatGoogleGenerativeAI(
+        return self._get_cached_llm(model, kwargs, lambda: ChatGoogleGenerativeAI(
             model=model,
             api_key=self.config.api_key,
             max_retries=self.config.max_retries,
             timeout=self.config.timeout,
             **kwargs
-        )
+        ))
     
     def get_provider_type(self) -> LLMProviderType:
         """返回提供商类型"""
@@ -226,17 +292,22 @@ class GeminiLLMProvider(BaseLLMProvider):
     
     def validate_config(self) -> bool:
         """验证提供商配置是否有效"""
+        return self.validate_config_static(self.config)
+    
+    @staticmethod
+    def validate_config_static(config: GeminiProviderConfig) -> bool:
+        """检查配置项是否完整，不创建客户端"""
         try:
             # 检查API密钥
-            if not self.config.api_key:
+            if not config.api_key:
                 return False
             
             # 检查模型列表
-            if not self.config.models:
+            if not config.models:
                 return False
             
             # 检查默认模型是否在列表中
-            if self.config.default_model not in self.config.models:
+            if config.default_model not in config.models:
                 return False
             
             return True
@@ -244,23 +315,21 @@ class GeminiLLMProvider(BaseLLMProvider):
         except Exception:
             return False
     
-    async def get_available_models(self) -> List[LLMModel]:
+    async def _fetch_models_impl(self) -> List[LLMModel]:
         """获取可用模型列表"""
-        models = []
-        for model_id in self.config.models:
-            if model_id in self._model_info:
-                models.append(self._model_info[model_id])
-            else:
-                # 为未知模型创建基本信息
-                models.append(LLMModel(
-                    id=model_id,
-                    name=model_id,
-                    provider=LLMProviderType.GEMINI,
-                    supports_structured_output=True,
-                    description=f"Gemini model: {model_id}"
-                ))
-        
-        return models
+        info = self._MODEL_INFO
+        ptype = LLMProviderType.GEMINI
+        # 未知模型创建基本信息
+        return [
+            info[model_id] if model_id in info else LLMModel(
+                id=model_id,
+                name=model_id,
+                provider=ptype,
+                supports_structured_output=True,
+                description=f"Gemini model: {model_id}"
+            )
+            for model_id in self.config.models
+        ]
     
     def get_rate_limits(self) -> Dict[str, Any]:
         """获取API速率限制信息"""
@@ -283,7 +352,7 @@ class GeminiLLMProvider(BaseLLMProvider):
         """
         try:
             # 使用Google GenAI客户端进行搜索增强生成
-            response = self._genai_client.models.generate_content(
+            response = await self._genai_client.aio.models.generate_content(
                 model=model,
                 contents=prompt,
                 config={
@@ -296,18 +365,19 @@ class GeminiLLMProvider(BaseLLMProvider):
             content = response.text if response.text else ""
             sources = []
             
-            # 处理grounding metadata（如果存在）
-            if hasattr(response, 'candidates') and response.candidates:
-                candidate = response.candidates[0]
-                if hasattr(candidate, 'grounding_metadata') and candidate.grounding_metadata:
-                    grounding_chunks = candidate.grounding_metadata.grounding_chunks
-                    for i, chunk in enumerate(grounding_chunks):
-                        if hasattr(chunk, 'web') and chunk.web:
-                            sources.append({
-                                "label": f"[{i+1}]",
-                                "url": chunk.web.uri,
-                                "title": chunk.web.title or "Unknown Title"
-                            })
+            # 处理grounding metadata（如果存在），一次遍历提取有URL的来源
+            candidates = getattr(response, 'candidates', None)
+            grounding_metadata = getattr(candidates[0], 'grounding_metadata', None) if candidates else None
+            if grounding_metadata:
+                sources = [
+                    {
+                        "label": f"[{i+1}]",
+                        "url": web.uri,
+                        "title": getattr(web, 'title', None) or "Unknown Title"
+                    }
+                    for i, chunk in enumerate(grounding_metadata.grounding_chunks or ())
+                    if (web := getattr(chunk, 'web', None)) is not None and getattr(web, 'uri', None)
+                ]
             
             return content, sources
             
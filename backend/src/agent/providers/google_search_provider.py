@@ -1,9 +1,10 @@
+import logging
 import os
+import re
 import time
-import asyncio
 from typing import List, Dict, Any, Optional
-from google.genai import Client
 
+from agent.utils import get_genai_client
 from agent.search_providers import (
     BaseSearchProvider,
     SearchRequest,
@@ -14,6 +15,12 @@ from agent.search_providers import (
     SearchProviderRateLimitError
 )
 
+# Gemini API自动生成的假引用链接：[label](https://vertexaisearch.cloud.google.com/...)
+_FAKE_CITATION_LABELED = re.compile(r'\[([^\]]+)\]\(https://vertexaisearch\.cloud\.google\.com/[^)]+\)')
+# 单独的vertexaisearch链接（没有label的情况）
+_FAKE_CITATION_BARE = re.compile(r'https://vertexaisearch\.cloud\.google\.com/[^\s\])]+')
+
+logger = logging.getLogger(__name__)
 
 
 class GoogleSearchProvider(BaseSearchProvider):
@@ -22,6 +29,19 @@ class GoogleSearchProvider(BaseSearchProvider):
     使用Google的GenAI客户端提供的搜索功能来执行网络搜索。
     """
     
+    # 搜索提示的固定部分，只有查询和结果数量需要填入
+    _PROMPT_TEMPLATE = (
+        "请基于以下查询进行网络搜索，并提供详细的信息总结：\n"
+        "\n"
+        "查询: {query}\n"
+        "\n"
+        "要求:\n"
+        "- 搜索相关的最新信息\n"
+        "- 提供详细的内容总结\n"
+        "- 包含可靠的来源链接\n"
+        "- 最多返回 {max_results} 个相关结果"
+    )
+    
     def __init__(self, config: Dict[str, Any]):
         """初始化Google搜索提供商
         
@@ -29,7 +49,7 @@ class GoogleSearchProvider(BaseSearchProvider):
             config: 配置字典，需要包含 'api_key' 字段
         """
         super().__init__(config)
-        self.client = Client(api_key=config["api_key"])
+        self.client = get_genai_client(config["api_key"])
         self.model = config.get("model", "gemini-2.0-flash")
         self._last_metrics: Optional[SearchMetrics] = None
     
@@ -48,9 +68,8 @@ class GoogleSearchProvider(BaseSearchProvider):
             # 构建搜索提示
             search_prompt = self._build_search_prompt(request)
             
-            # 执行搜索 (使用异步包装同步调用)
-            response = await asyncio.to_thread(
-                self.client.models.generate_content,
+            # 执行搜索（使用客户端的异步接口，同一API密钥共享客户端及其连接池，不占用线程池）
+            response = await self.client.aio.models.generate_content(
                 model=self.model,
                 contents=search_prompt,
                 config={
@@ -59,16 +78,17 @@ class GoogleSearchProvider(BaseSearchProvider):
                 }
             )
             
-            # 处理搜索结果 (使用异步包装)
-            search_result = await asyncio.to_thread(self._process_response, response, request)
+            # 处理搜索结果（纯Python的少量计算，直接在事件循环中执行，不交给线程池）
+            search_result = self._process_response(response, request)
             
-            # 记录性能指标
+            # 记录性能指标（GenerateContentResponse 没有 token_count，token用量在 usage_metadata 中）
             end_time = time.time()
+            usage = response.usage_metadata
             self._last_metrics = SearchMetrics(
                 search_time=end_time - start_time,
                 result_count=len(search_result.sources),
                 api_calls_used=1,
-                tokens_consumed=getattr(response, 'token_count', None)
+                tokens_consumed=usage.total_token_count if usage is not None else None
             )
             
             return search_result
@@ -91,25 +111,15 @@ class GoogleSearchProvider(BaseSearchProvider):
         Returns:
             str: 构建的搜索提示
         """
-        prompt = f"""
-请基于以下查询进行网络搜索，并提供详细的信息总结：
-
-查询: {request.query}
-
-要求:
-- 搜索相关的最新信息
-- 提供详细的内容总结
-- 包含可靠的来源链接
-- 最多返回 {request.max_results} 个相关结果
-        """
+        parts = [self._PROMPT_TEMPLATE.format(query=request.query, max_results=request.max_results)]
         
         if request.language:
-            prompt += f"\n- 优先搜索 {request.language} 语言的内容"
+            parts.append(f"- 优先搜索 {request.language} 语言的内容")
             
         if request.date_restrict:
-            prompt += f"\n- 时间范围限制: {request.date_restrict}"
+            parts.append(f"- 时间范围限制: {request.date_restrict}")
             
-        return prompt.strip()
+        return "\n".join(parts)
     
     def _clean_fake_citations(self, text: str) -> str:
         """清理Gemini API自动生成的假引用链接
@@ -120,18 +130,8 @@ class GoogleSearchProvider(BaseSearchProvider):
         Returns:
             str: 清理后的文本
         """
-        import re
-        
-        # 移除所有形如 [label](https://vertexaisearch.cloud.google.com/...) 的假链接
-        # 但保留label文本
-        pattern = r'\[([^\]]+)\]\(https://vertexaisearch\.cloud\.google\.com/[^)]+\)'
-        cleaned_text = re.sub(pattern, r'\1', text)
-        
-        # 移除单独的vertexaisearch链接（没有label的情况）
-        pattern2 = r'https://vertexaisearch\.cloud\.google\.com/[^\s\])]+'
-        cleaned_text = re.sub(pattern2, '', cleaned_text)
-        
-        return cleaned_text.strip()
+        # 移除假链接但保留label文本，再移除没有label的单独链接
+        return _FAKE_CITATION_BARE.sub('', _FAKE_CITATION_LABELED.sub(r'\1', text)).strip()
     
     def _process_response(self, response, request: SearchRequest) -> SearchResult:
         """处理Google搜索响应
@@ -147,30 +147,33 @@ class GoogleSearchProvider(BaseSearchProvider):
             # 直接从grounding chunks获取真实URL，不使用resolve_urls转换
             grounding_chunks = response.candidates[0].grounding_metadata.grounding_chunks
             
-            # 构建来源列表 - 直接使用真实URL
-            sources = []
+            # 构建来源列表 - 直接使用真实URL，达到max_results后不再处理剩余chunk
+            max_results = request.max_results
+            sources: List[Dict[str, Any]] = []
             seen_urls = set()
             
-            for i, chunk in enumerate(grounding_chunks):
-                if hasattr(chunk, 'web') and hasattr(chunk.web, 'uri'):
-                    real_url = chunk.web.uri  # 保留原始的vertexaisearch链接，这些会重定向到真实网站
-                    title = getattr(chunk.web, 'title', f"搜索结果{i+1}")
-                    
-                    print(f"🔍 处理grounding chunk {i+1}: [{title}] -> {real_url[:50]}...")
-                    
-                    # 避免重复URL
-                    if real_url not in seen_urls:
-                        sources.append({
-                            "label": f"来源{i+1}",
-                            "url": real_url,  # 使用原始URL（Google的重定向链接）
-                            "title": title
-                        })
-                        seen_urls.add(real_url)
-                    else:
-                        print(f"⏭️ 跳过重复URL")
-            
-            # 限制结果数量
-            sources = sources[:request.max_results]
+            for i, chunk in enumerate(grounding_chunks or ()):
+                if len(sources) >= max_results:
+                    break
+                # chunk.web 和 web.uri 各只访问一次
+                web = chunk.web
+                real_url = web.uri if web is not None else None  # 保留原始的vertexaisearch链接，这些会重定向到真实网站
+                if not real_url:
+                    continue
+                
+                # 避免重复URL
+                if real_url in seen_urls:
+                    logger.debug("跳过重复URL: %s", real_url)
+                    continue
+                seen_urls.add(real_url)
+                
+                title = web.title or f"搜索结果{i+1}"
+                logger.debug("处理grounding chunk %d: [%s] -> %.50s", i + 1, title, real_url)
+                sources.append({
+                    "label": f"来源{i+1}",
+                    "url": real_url,  # 使用原始URL（Google的重定向链接）
+                    "title": title
+                })
             
             # 清理Gemini API自动生成的假链接
             clean_content = self._clean_fake_citations(response.text)
@@ -3,10 +3,13 @@
 提供通用OpenAI兼容API的标准化LLM接口，支持各种OpenAI兼容的服务。
 """
 
+import logging
 import os
+import time
 from typing import Dict, Any, List, Optional, Type
 from langchain_openai import ChatOpenAI
 from langchain_core.language_models import BaseLanguageModel
+import httpx
 import openai
 
 from ..llm_providers import BaseLLMProvider, LLMProviderRegistry
@@ -18,9 +21,18 @@ from ..llm_types import (
     OpenAICompatibleProviderConfig,
     LLMProviderError,
     LLMProviderAPIError,
-    LLMProviderTimeoutError
+    LLMProviderTimeoutError,
+    get_schema_prompt
 )
 
+logger = logging.getLogger(__name__)
+
+# 表明服务端不支持工具调用或response_format的错误（400/422，或LangChain未实现结构化输出），
+# 出现时才把模型记为不支持结构化输出
+_STRUCTURED_UNSUPPORTED_ERRORS = (openai.BadRequestError, openai.UnprocessableEntityError, NotImplementedError)
+# 限流、超时、连接和服务端错误，回退到提示工程只会再发一次同样失败的请求，直接抛出
+_TRANSIENT_ERRORS = (openai.RateLimitError, openai.APIConnectionError, openai.InternalServerError)
+
 
 class OpenAICompatibleProvider(BaseLLMProvider):
     """OpenAI兼容LLM提供商
@@ -37,14 +49,17 @@ class OpenAICompatibleProvider(BaseLLMProvider):
         super().__init__(config)
         self.config: OpenAICompatibleProviderConfig = config
         
-        # 初始化OpenAI客户端
-        self._client = openai.OpenAI(
-            api_key=config.api_key,
-            base_url=config.base_url
-        )
+        # 异步OpenAI客户端（用于获取模型列表），第一次使用时创建
+        self._aclient: Optional[openai.AsyncOpenAI] = None
+        
+        # 各模型是否支持 with_structured_output，由第一次结构化调用的结果确定
+        self._structured_caps: Dict[str, bool] = {}
         
         # 动态模型信息（将在运行时获取）
         self._model_info_cache: Dict[str, LLMModel] = {}
+        # 从API获取的模型列表及其过期时间
+        self._api_models: Optional[List[Dict[str, Any]]] = None
+        self._api_models_expiry = 0.0
     
     async def generate(self, request: LLMRequest) -> LLMResponse:
         """生成文本内容
@@ -67,7 +82,7 @@ class OpenAICompatibleProvider(BaseLLMProvider):
             )
             
             # 调用LLM
-            result = llm.invoke(request.prompt)
+            result = await llm.ainvoke(request.to_messages())
             
             # 提取内容
             content = result.content if hasattr(result, 'content') else str(result)
@@ -118,31 +133,39 @@ class OpenAICompatibleProvider(BaseLLMProvider):
                 max_tokens=request.max_tokens
             )
             
-            # 尝试使用结构化输出
-            try:
-                structured_llm = llm.with_structured_output(output_schema)
-                result = structured_llm.invoke(request.prompt)
-            except Exception:
+            # 尝试使用结构化输出；已知不支持的模型直接使用提示工程，不再做注定失败的调用
+            supports_structured = self._structured_caps.get(request.model)
+            use_prompt = supports_structured is False
+            if not use_prompt:
+                try:
+                    structured_llm = self._get_structured_llm(llm, output_schema)
+                    result = await structured_llm.ainvoke(request.to_messages())
+                    self._structured_caps[request.model] = True
+                except _TRANSIENT_ERRORS:
+                    raise
+                except _STRUCTURED_UNSUPPORTED_ERRORS as e:
+                    # 从未成功过的模型记为不支持；成功过的模型视为偶发错误，只回退本次请求
+                    if supports_structured is None:
+                        logger.info("Structured output not supported by %s, using prompt instead: %s", request.model, e)
+                        self._structured_caps[request.model] = False
+                    use_prompt = True
+                except Exception:
+                    # 其他错误（如模型输出无法解析）只回退本次请求，不影响之后的请求
+                    use_prompt = True
+            
+            if use_prompt:
                 # 如果结构化输出失败，使用提示工程
-                schema_prompt = f"\n\nPlease respond in the following JSON format:\n{output_schema.model_json_schema()}"
-                enhanced_prompt = request.prompt + schema_prompt
+                enhanced_request = request.model_copy(
+                    update={"prompt": request.prompt + get_schema_prompt(output_schema)}
+                )
                 
-                response = llm.invoke(enhanced_prompt)
+                response = await llm.ainvoke(enhanced_request.to_messages())
                 content = response.content if hasattr(response, 'content') else str(response)
                 
                 # 尝试解析JSON
                 try:
-                    import json
-                    # 提取JSON部分
-                    json_start = content.find('{')
-                    json_end = content.rfind('}') + 1
-                    if json_start != -1 and json_end > json_start:
-                        json_str = content[json_start:json_end]
-                        json_data = json.loads(json_str)
-                        result = output_schema(**json_data)
-                    else:
-                        result = content
-                except (json.JSONDecodeError, ValueError):
+                    result = self._parse_structured_output(content, output_schema)
+                except ValueError:
                     result = content
             
             # 生成文本表示
@@ -175,14 +198,17 @@ class OpenAICompatibleProvider(BaseLLMProvider):
         Returns:
             BaseLanguageModel: LangChain兼容的LLM实例
         """
-        return ChatOpenAI(
+        if self._http_client is not None:
+            kwargs.setdefault("http_async_client", self._http_client)
+        
+        return self._get_cached_llm(model, kwargs, lambda: ChatOpenAI(
             model=model,
             api_key=self.config.api_key,
             base_url=self.config.base_url,
             max_retries=self.config.max_retries,
             timeout=self.config.timeout,
             **kwargs
-        )
+        ))
     
     def get_provider_type(self) -> LLMProviderType:
         """返回提供商类型"""
@@ -190,23 +216,28 @@ class OpenAICompatibleProvider(BaseLLMProvider):
     
     def validate_config(self) -> bool:
         """验证提供商配置是否有效"""
+        return self.validate_config_static(self.config)
+    
+    @staticmethod
+    def validate_config_static(config: OpenAICompatibleProviderConfig) -> bool:
+        """检查配置项是否完整，不创建客户端"""
         try:
             # 检查必需的配置项
             required_fields = ['api_key', 'base_url']
             for field in required_fields:
-                if not getattr(self.config, field, None):
+                if not getattr(config, field, None):
                     return False
             
             # 检查模型列表
-            if not self.config.models:
+            if not config.models:
                 return False
             
             # 检查默认模型是否在列表中
-            if self.config.default_model not in self.config.models:
+            if config.default_model not in config.models:
                 return False
             
             # 验证URL格式
-            if not self.config.base_url.startswith(('http://', 'https://')):
+            if not config.base_url.startswith(('http://', 'https://')):
                 return False
             
             return True
@@ -214,7 +245,7 @@ class OpenAICompatibleProvider(BaseLLMProvider):
         except Exception:
             return False
     
-    async def get_available_models(self) -> List[LLMModel]:
+    async def _fetch_models_impl(self) -> List[LLMModel]:
         """获取可用模型列表 - 直接从配置读取，避免API调用"""
         models = []
         
@@ -235,17 +266,45 @@ class OpenAICompatibleProvider(BaseLLMProvider):
         
         return models
     
-    async def _fetch_models_from_api(self) -> List[Dict[str, Any]]:
-        """从API获取模型列表
+    def _get_async_client(self) -> openai.AsyncOpenAI:
+        """获取异步OpenAI客户端，设置了共享HTTP客户端时复用其连接池"""
+        if self._aclient is None:
+            self._aclient = openai.AsyncOpenAI(
+                api_key=self.config.api_key,
+                base_url=self.config.base_url,
+                http_client=self._http_client
+            )
+        return self._aclient
+    
+    def set_http_client(self, http_client: Optional[httpx.AsyncClient]) -> None:
+        """设置共享的异步HTTP客户端，已创建的OpenAI客户端在下次使用时按新的连接池重建"""
+        if http_client is not self._http_client:
+            self._aclient = None
+        super().set_http_client(http_client)
+    
+    async def _fetch_models_from_api(self, refresh: bool = False) -> List[Dict[str, Any]]:
+        """从API获取服务端实际提供的模型列表
+        
+        get_available_models 只使用配置中的模型，不调用此方法；需要核对服务端模型时显式调用。
+        
+        Args:
+            refresh: 是否忽略缓存重新获取
         
         Returns:
-            List[Dict[str, Any]]: 模型信息列表
+            List[Dict[str, Any]]: 模型信息列表，获取失败时为空列表
         """
+        # 成功的结果与可用模型列表一样缓存 LLM_MODELS_TTL 秒
+        now = time.monotonic()
+        if not refresh and self._api_models is not None and now < self._api_models_expiry:
+            return self._api_models
+        
         try:
-            response = self._client.models.list()
-            return [model.dict() if hasattr(model, 'dict') else model for model in response.data]
+            response = await self._get_async_client().models.list()
+            self._api_models = [model.model_dump() if hasattr(model, 'model_dump') else model for model in response.data]
+            self._api_models_expiry = now + self._models_ttl
+            return self._api_models
         except Exception as e:
-            print(f"Failed to fetch models from OpenAI Compatible API: {e}")
+            logger.warning("Failed to fetch models from OpenAI Compatible API: %s", e)
             return []
     
     def get_rate_limits(self) -> Dict[str, Any]:
@@ -1,9 +1,13 @@
+import copy
 import os
+import re
 import time
 import aiohttp
 import asyncio
-from typing import List, Dict, Any, Optional
+import orjson
+from typing import List, Dict, Any, ClassVar, Iterator, Optional, Union
 
+from agent.llm_cache import ExactCache
 from agent.search_providers import (
     BaseSearchProvider,
     SearchRequest,
@@ -14,6 +18,52 @@ from agent.search_providers import (
     SearchProviderRateLimitError
 )
 
+# 搜索请求载荷中固定的部分，每次请求复制后填入查询相关的字段
+_BASE_PAYLOAD: Dict[str, Any] = {
+    "search_depth": "advanced",  # basic 或 advanced
+    "include_answer": True,
+    "include_raw_content": False,
+    "include_domains": (),
+    "exclude_domains": ()
+}
+
+# 语言代码到Tavily支持格式的映射
+_LANGUAGE_MAP: Dict[str, str] = {
+    "zh-CN": "zh",
+    "zh-TW": "zh",
+    "en-US": "en",
+    "en": "en",
+    "ja": "ja",
+    "ko": "ko",
+    "fr": "fr",
+    "de": "de",
+    "es": "es"
+}
+
+# 所有实例共用的搜索结果缓存，TAVILY_CACHE_TTL 不大于0时不缓存
+_search_cache = ExactCache(
+    maxsize=int(os.getenv("TAVILY_CACHE_SIZE", "256")),
+    ttl=float(os.getenv("TAVILY_CACHE_TTL", "300")),
+)
+_inflight_searches: Dict[str, asyncio.Future] = {}
+
+# 时间限制字符串，如 "7d", "2w", "1m", "1y"，及各单位对应的天数
+_DATE_RESTRICT_RE = re.compile(r"^(\d+)([dwmy])$")
+_DATE_RESTRICT_DAYS = {"d": 1, "w": 7, "m": 30, "y": 365}
+
+
+def _iter_content_parts(answer: str, results: List[Dict[str, Any]], max_results: int) -> Iterator[str]:
+    """逐段生成搜索内容，由调用方直接拼接，不构建中间列表"""
+    if answer:
+        yield f"概要答案：{answer}"
+    if results:
+        yield "\n详细搜索结果："
+        for i, result in enumerate(results[:max_results], 1):
+            content = result.get("content", "")
+            if content:
+                yield f"\n{i}. {result.get('title', '无标题')}"
+                yield f"   {content[:200]}..."
+
 
 class TavilySearchProvider(BaseSearchProvider):
     """Tavily搜索提供商实现
@@ -21,6 +71,11 @@ class TavilySearchProvider(BaseSearchProvider):
     使用Tavily的REST API提供网络搜索功能，专为AI应用优化。
     """
     
+    # 所有实例共享的HTTP会话（连接池），第一次搜索时在当前事件循环中创建。
+    # 提供商按请求创建，会话放在类上才能在请求之间复用连接
+    _session: ClassVar[Optional[aiohttp.ClientSession]] = None
+    _session_loop: ClassVar[Optional[asyncio.AbstractEventLoop]] = None
+    
     def __init__(self, config: Dict[str, Any]):
         """初始化Tavily搜索提供商
         
@@ -36,12 +91,66 @@ class TavilySearchProvider(BaseSearchProvider):
     async def search(self, request: SearchRequest) -> SearchResult:
         """执行Tavily搜索
         
+        相同的请求（查询忽略大小写和首尾空白）在 TAVILY_CACHE_TTL 秒内直接返回缓存结果；
+        相同请求正在执行时等待其结果，不再重复调用API。
+        缓存键包含API密钥和服务地址，配置不同的实例之间不共用结果。
+        
         Args:
             request: 搜索请求对象
             
         Returns:
-            SearchResult: 标准化的搜索结果
+            SearchResult: 标准化的搜索结果（命中时为缓存结果的拷贝）
         """
+        if _search_cache.ttl <= 0:
+            return await self._search_uncached(request)
+        
+        key = ExactCache.make_key(
+            self.base_url,
+            self.api_key,
+            request.query.strip().lower(),
+            str(request.max_results),
+            request.language or "",
+            request.date_restrict or "",
+            str(request.safe_search),
+            orjson.dumps(request.additional_params, default=str, option=orjson.OPT_SORT_KEYS).decode(),
+        )
+        cached = _search_cache.get(key)
+        if cached is not None:
+            self._last_metrics = SearchMetrics(search_time=0.0, result_count=len(cached.sources), api_calls_used=0)
+            return copy.deepcopy(cached)
+        
+        # 事件循环单线程执行，查询和登记之间没有await，不需要额外加锁
+        inflight = _inflight_searches.get(key)
+        if inflight is not None:
+            try:
+                return copy.deepcopy(await asyncio.shield(inflight))
+            except asyncio.CancelledError:
+                # 发起方被取消时由当前调用方自己执行；当前调用方被取消则继续抛出
+                if not inflight.cancelled():
+                    raise
+                return await self._search_uncached(request)
+        
+        future = asyncio.get_running_loop().create_future()
+        _inflight_searches[key] = future
+        try:
+            result = await self._search_uncached(request)
+        except BaseException as e:
+            if isinstance(e, asyncio.CancelledError):
+                future.cancel()
+            else:
+                future.set_exception(e)
+                # 没有其他等待方时避免“异常未被获取”的警告
+                future.exception()
+            raise
+        else:
+            _search_cache.set(key, result)
+            future.set_result(result)
+            return copy.deepcopy(result)
+        finally:
+            _inflight_searches.pop(key, None)
+    
+    async def _search_uncached(self, request: SearchRequest) -> SearchResult:
+        """调用Tavily API执行一次搜索"""
         start_time = time.time()
         
         try:
@@ -49,26 +158,26 @@ class TavilySearchProvider(BaseSearchProvider):
             search_payload = self._build_search_payload(request)
             
             # 执行搜索
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    f"{self.base_url}/search",
-                    json=search_payload,
-                    headers={
-                        "Content-Type": "application/json",
-                        "Authorization": f"Bearer {self.api_key}"
-                    },
-                    timeout=aiohttp.ClientTimeout(total=self.timeout)
-                ) as response:
-                    
-                    if response.status == 429:
-                        raise SearchProviderRateLimitError("Tavily API请求频率限制")
-                    elif response.status == 401:
-                        raise SearchProviderAPIError("Tavily API认证失败，请检查API密钥")
-                    elif response.status != 200:
-                        error_text = await response.text()
-                        raise SearchProviderAPIError(f"Tavily API错误 {response.status}: {error_text}")
-                    
-                    response_data = await response.json()
+            session = await self._get_session()
+            async with session.post(
+                f"{self.base_url}/search",
+                json=search_payload,
+                headers={
+                    "Content-Type": "application/json",
+                    "Authorization": f"Bearer {self.api_key}"
+                },
+                timeout=aiohttp.ClientTimeout(total=self.timeout)
+            ) as response:
+                
+                if response.status == 429:
+                    raise SearchProviderRateLimitError("Tavily API请求频率限制")
+                elif response.status == 401:
+                    raise SearchProviderAPIError("Tavily API认证失败，请检查API密钥")
+                elif response.status != 200:
+                    error_text = await response.text()
+                    raise SearchProviderAPIError(f"Tavily API错误 {response.status}: {error_text}")
+                
+                response_data = orjson.loads(await response.read())
             
             # 处理搜索结果
             search_result = self._process_response(response_data, request)
@@ -93,6 +202,46 @@ class TavilySearchProvider(BaseSearchProvider):
             else:
                 raise SearchProviderAPIError(f"Tavily搜索未知错误: {e}")
     
+    async def search_many(self, requests: List[SearchRequest]) -> List[Union[SearchResult, BaseException]]:
+        """并发执行多个搜索请求，同时进行的请求数不超过 concurrent_requests
+        
+        Args:
+            requests: 搜索请求列表
+            
+        Returns:
+            List[Union[SearchResult, BaseException]]: 与requests顺序一致的结果，失败的请求对应位置为异常
+        """
+        semaphore = asyncio.Semaphore(self.get_rate_limits()["concurrent_requests"])
+        
+        async def _bounded_search(request: SearchRequest) -> SearchResult:
+            async with semaphore:
+                return await self.search(request)
+        
+        return await asyncio.gather(*(_bounded_search(request) for request in requests), return_exceptions=True)
+    
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """获取共享的HTTP会话，不存在、已关闭或属于其他事件循环时重新创建"""
+        cls = type(self)
+        loop = asyncio.get_running_loop()
+        session = cls._session
+        if session is None or session.closed or cls._session_loop is not loop:
+            session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=self.get_rate_limits()["concurrent_requests"],
+                    ttl_dns_cache=300,
+                    keepalive_timeout=60
+                )
+            )
+            cls._session, cls._session_loop = session, loop
+        return session
+    
+    @classmethod
+    async def aclose(cls) -> None:
+        """关闭共享的HTTP会话"""
+        session, cls._session, cls._session_loop = cls._session, None, None
+        if session is not None and not session.closed:
+            await session.close()
+    
     def _build_search_payload(self, request: SearchRequest) -> Dict[str, Any]:
         """构建Tavily搜索请求载荷
         
@@ -102,31 +251,14 @@ class TavilySearchProvider(BaseSearchProvider):
         Returns:
             Dict[str, Any]: API请求载荷
         """
-        payload = {
-            "query": request.query,
-            "search_depth": "advanced",  # basic 或 advanced
-            "include_answer": True,
-            "include_raw_content": False,
-            "max_results": min(request.max_results, 10),  # Tavily限制最多10个结果
-            "include_domains": [],
-            "exclude_domains": []
-        }
+        payload = _BASE_PAYLOAD.copy()
+        payload["query"] = request.query
+        payload["max_results"] = min(request.max_results, 10)  # Tavily限制最多10个结果
         
         # 添加语言和地区配置
         if request.language:
             # 将语言代码转换为Tavily支持的格式
-            language_map = {
-                "zh-CN": "zh",
-                "zh-TW": "zh",
-                "en-US": "en",
-                "en": "en",
-                "ja": "ja",
-                "ko": "ko",
-                "fr": "fr",
-                "de": "de",
-                "es": "es"
-            }
-            tavily_lang = language_map.get(request.language, "en")
+            tavily_lang = _LANGUAGE_MAP.get(request.language, "en")
             payload["include_answer"] = True
         
         # 添加时间限制
@@ -153,22 +285,8 @@ class TavilySearchProvider(BaseSearchProvider):
         Returns:
             Optional[int]: 天数限制
         """
-        if not date_restrict:
-            return None
-            
-        try:
-            if date_restrict.endswith('d'):
-                return int(date_restrict[:-1])
-            elif date_restrict.endswith('w'):
-                return int(date_restrict[:-1]) * 7
-            elif date_restrict.endswith('m'):
-                return int(date_restrict[:-1]) * 30
-            elif date_restrict.endswith('y'):
-                return int(date_restrict[:-1]) * 365
-        except ValueError:
-            pass
-        
-        return None
+        match = _DATE_RESTRICT_RE.match(date_restrict or "")
+        return int(match.group(1)) * _DATE_RESTRICT_DAYS[match.group(2)] if match else None
     
     def _process_response(self, response_data: Dict[str, Any], request: SearchRequest) -> SearchResult:
         """处理Tavily搜索响应
@@ -188,43 +306,33 @@ class TavilySearchProvider(BaseSearchProvider):
             results = response_data.get("results", [])
             
             # 构建内容字符串
-            content_parts = []
-            if answer:
-                content_parts.append(f"概要答案：{answer}")
-            
-            # 添加详细结果
-            if results:
-                content_parts.append("\n详细搜索结果：")
-                for i, result in enumerate(results[:request.max_results], 1):
-                    title = result.get("title", "无标题")
-                    content = result.get("content", "")
-                    if content:
-                        content_parts.append(f"\n{i}. {title}")
-                        content_parts.append(f"   {content[:200]}...")
-            
-            content = "\n".join(content_parts)
+            content = "\n".join(_iter_content_parts(answer, results, request.max_results))
             
             # 构建来源列表
-            sources = []
-            for i, result in enumerate(results[:request.max_results]):
-                source = {
+            sources = [
+                {
                     "label": f"来源{i+1}",
                     "url": result.get("url", ""),
                     "title": result.get("title", f"搜索结果{i+1}")
                 }
-                sources.append(source)
+                for i, result in enumerate(results[:request.max_results])
+            ]
+            
+            metadata = {
+                "provider": "tavily",
+                "query": request.query,
+                "answer": answer,
+                "total_results": len(results),
+                "search_depth": "advanced"
+            }
+            # 完整的响应包含每个结果的正文，只在调试时保留，避免在整个研究流程中占用内存
+            if self.config.get("debug_keep_raw", False):
+                metadata["response_data"] = response_data
             
             return SearchResult(
                 content=content,
                 sources=sources,
-                metadata={
-                    "provider": "tavily",
-                    "query": request.query,
-                    "answer": answer,
-                    "total_results": len(results),
-                    "search_depth": "advanced",
-                    "response_data": response_data
-                }
+                metadata=metadata
             )
             
         except Exception as e:
@@ -298,7 +406,8 @@ class TavilySearchProvider(BaseSearchProvider):
                 query="test",
                 max_results=1
             )
-            await self.search(test_request)
+            # 绕过结果缓存，确保真正访问了API
+            await self._search_uncached(test_request)
             return True
         except Exception:
             return False 
\ No newline at end of file
@@ -1,5 +1,7 @@
+import asyncio
 import os
-from typing import Dict, Any, List, Type, Optional
+import time
+from typing import Dict, Any, List, Tuple, Type, Optional
 from agent.search_providers import BaseSearchProvider, SearchProviderConfigError
 from agent.providers.google_search_provider import GoogleSearchProvider
 from agent.providers.tavily_search_provider import TavilySearchProvider
@@ -17,6 +19,14 @@ class SearchProviderFactory:
         "tavily": TavilySearchProvider,
     }
     
+    # 提供商实例缓存：(名称, 配置) -> 实例，使用环境变量默认配置的实例配置部分为None
+    _instance_cache: Dict[Tuple[str, Any], BaseSearchProvider] = {}
+    # 最近一次健康检查成功的时间（monotonic），及其有效期（秒）
+    _health_cache: Dict[str, float] = {}
+    _HEALTH_TTL = 60.0
+    # 提供商信息缓存：名称 -> 信息，只缓存成功获取的信息
+    _info_cache: Dict[str, Dict[str, Any]] = {}
+    
     @classmethod
     def create_provider(
         cls, 
@@ -42,12 +52,25 @@ class SearchProviderFactory:
                 f"可用的提供商: {available_providers}"
             )
         
+        # 相同名称和配置复用同一个实例，默认配置的情况下命中缓存时不再读取环境变量
+        try:
+            cache_key = (provider_name, None if config is None else tuple(sorted(config.items())))
+            provider = cls._instance_cache.get(cache_key)
+        except TypeError:
+            # 配置中有不可哈希的值时不缓存
+            cache_key, provider = None, None
+        if provider is not None:
+            return provider
+        
         # 如果没有提供配置，从环境变量获取
         if config is None:
             config = cls._get_default_config(provider_name)
         
         provider_class = cls._providers[provider_name]
-        return provider_class(config)
+        provider = provider_class(config)
+        if cache_key is not None:
+            cls._instance_cache[cache_key] = provider
+        return provider
     
     @classmethod
     def get_available_providers(cls) -> List[str]:
@@ -58,6 +81,55 @@ class SearchProviderFactory:
         """
         return list(cls._providers.keys())
     
+    @classmethod
+    async def health_check_all(cls) -> Dict[str, bool]:
+        """并发检查所有已配置的搜索提供商的健康状态
+        
+        健康检查会执行一次真实的搜索，成功的结果缓存 _HEALTH_TTL 秒，期间不再重复检查。
+        
+        Returns:
+            Dict[str, bool]: 提供商名称 -> 是否可用，缺少配置的提供商为False
+        """
+        now = time.monotonic()
+        health_status: Dict[str, bool] = {}
+        pending: Dict[str, BaseSearchProvider] = {}
+        for provider_name in cls._providers:
+            checked_at = cls._health_cache.get(provider_name)
+            if checked_at is not None and now - checked_at < cls._HEALTH_TTL:
+                health_status[provider_name] = True
+                continue
+            try:
+                pending[provider_name] = cls.create_provider(provider_name)
+            except Exception:
+                health_status[provider_name] = False
+        
+        results = await asyncio.gather(
+            *(provider.health_check() for provider in pending.values()),
+            return_exceptions=True
+        )
+        for provider_name, is_healthy in zip(pending, results):
+            is_healthy = is_healthy is True
+            if is_healthy:
+                cls._health_cache[provider_name] = now
+            else:
+                cls._health_cache.pop(provider_name, None)
+            health_status[provider_name] = is_healthy
+        
+        return {provider_name: health_status[provider_name] for provider_name in cls._providers}
+    
+    @classmethod
+    def clear_cache(cls) -> None:
+        """清空提供商实例、健康检查和提供商信息缓存，在重新加载.env后调用"""
+        cls._instance_cache.clear()
+        cls._health_cache.clear()
+        cls._info_cache.clear()
+    
+    @classmethod
+    async def aclose_all(cls) -> None:
+        """释放所有已注册提供商共享的资源，在应用关闭时调用"""
+        for provider_class in cls._providers.values():
+            await provider_class.aclose()
+    
     @classmethod
     def register_provider(
         cls, 
@@ -76,6 +148,7 @@ class SearchProviderFactory:
             )
         
         cls._providers[name] = provider_class
+        cls._info_cache.pop(name, None)
     
     @classmethod
     def _get_default_config(cls, provider_name: str) -> Dict[str, Any]:
@@ -126,14 +199,18 @@ class SearchProviderFactory:
         if provider_name not in cls._providers:
             raise SearchProviderConfigError(f"未知的搜索提供商: {provider_name}")
         
+        # 信息只取决于提供商类和默认配置，获取成功后直接复用
+        info = cls._info_cache.get(provider_name)
+        if info is not None:
+            return dict(info)
+        
         provider_class = cls._providers[provider_name]
         
-        # 创建临时实例以获取信息（使用空配置）
+        # 使用默认配置的（缓存）实例获取信息
         try:
-            temp_config = cls._get_default_config(provider_name)
-            temp_instance = provider_class(temp_config)
+            temp_instance = cls.create_provider(provider_name)
             
-            return {
+            info = {
                 "name": provider_name,
                 "class_name": provider_class.__name__,
                 "required_config_keys": temp_instance.get_required_config_keys(),
@@ -142,12 +219,16 @@ class SearchProviderFactory:
                 "description": provider_class.__doc__ or "无描述",
             }
         except Exception as e:
+            # 失败多因缺少环境变量，不缓存，配置后可以重新获取
             return {
                 "name": provider_name,
                 "class_name": provider_class.__name__,
                 "error": f"无法获取提供商信息: {e}",
                 "description": provider_class.__doc__ or "无描述",
             }
+        
+        cls._info_cache[provider_name] = info
+        return dict(info)
     
     @classmethod
     def validate_provider_config(
@@ -1,14 +1,15 @@
+import asyncio
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any, Optional
-from dataclasses import dataclass
-from pydantic import BaseModel, Field
+from typing import List, Dict, Any, Optional, Union
+from dataclasses import dataclass, field
 
 
-@dataclass
+@dataclass(slots=True)
 class SearchResult:
     """标准化搜索结果格式
     
     用于统一不同搜索提供商返回的数据格式，确保搜索结果的一致性和可互换性。
+    使用 __slots__，每个实例不再带 __dict__。
     """
     content: str
     """搜索得到的文本内容，经过格式化处理"""
@@ -20,24 +21,52 @@ class SearchResult:
     """额外的元数据信息，如搜索用时、置信度等"""
 
 
-class SearchMetrics(BaseModel):
-    """搜索性能指标"""
-    search_time: float = Field(description="搜索耗时（秒）")
-    result_count: int = Field(description="返回结果数量")
-    api_calls_used: int = Field(default=1, description="使用的API调用次数")
-    tokens_consumed: Optional[int] = Field(default=None, description="消耗的token数量")
-
+@dataclass(slots=True)
+class SearchMetrics:
+    """搜索性能指标
+    
+    每次搜索都会创建，只在内部使用、不需要校验，使用带 __slots__ 的dataclass。
+    """
+    search_time: float
+    """搜索耗时（秒）"""
+    
+    result_count: int
+    """返回结果数量"""
+    
+    api_calls_used: int = 1
+    """使用的API调用次数"""
+    
+    tokens_consumed: Optional[int] = None
+    """消耗的token数量"""
 
-class SearchRequest(BaseModel):
-    """标准化搜索请求格式"""
-    query: str = Field(description="搜索查询字符串")
-    max_results: int = Field(default=10, description="最大返回结果数量")
-    language: Optional[str] = Field(default="zh-CN", description="搜索语言偏好")
-    region: Optional[str] = Field(default=None, description="搜索地区偏好")
-    date_restrict: Optional[str] = Field(default=None, description="时间范围限制")
-    safe_search: bool = Field(default=True, description="是否启用安全搜索")
-    additional_params: Dict[str, Any] = Field(default_factory=dict, description="提供商特定的额外参数")
 
+@dataclass(frozen=True, slots=True, kw_only=True)
+class SearchRequest:
+    """标准化搜索请求格式
+    
+    每次搜索都会创建，字段都由调用方代码填写，不需要Pydantic校验，使用带 __slots__ 的dataclass。
+    与原先的Pydantic模型一样只接受关键字参数。创建后不可修改，可以在多次搜索之间复用。
+    """
+    query: str
+    """搜索查询字符串"""
+    
+    max_results: int = 10
+    """最大返回结果数量"""
+    
+    language: Optional[str] = "zh-CN"
+    """搜索语言偏好"""
+    
+    region: Optional[str] = None
+    """搜索地区偏好"""
+    
+    date_restrict: Optional[str] = None
+    """时间范围限制"""
+    
+    safe_search: bool = True
+    """是否启用安全搜索"""
+    
+    additional_params: Dict[str, Any] = field(default_factory=dict)
+    """提供商特定的额外参数"""
 
 class BaseSearchProvider(ABC):
     """搜索提供商基类
@@ -69,6 +98,17 @@ class BaseSearchProvider(ABC):
         """
         pass
     
+    async def search_many(self, requests: List[SearchRequest]) -> List[Union[SearchResult, BaseException]]:
+        """并发执行多个搜索请求
+        
+        Args:
+            requests: 搜索请求列表
+            
+        Returns:
+            List[Union[SearchResult, BaseException]]: 与requests顺序一致的结果，失败的请求对应位置为异常
+        """
+        return await asyncio.gather(*(self.search(request) for request in requests), return_exceptions=True)
+    
     @abstractmethod
     def get_provider_name(self) -> str:
         """返回提供商名称
@@ -143,6 +183,11 @@ class BaseSearchProvider(ABC):
             Optional[SearchMetrics]: 搜索指标，如果没有则返回None
         """
         return getattr(self, '_last_metrics', None)
+    
+    @classmethod
+    async def aclose(cls) -> None:
+        """释放提供商类共享的资源（如HTTP会话），默认没有需要释放的资源"""
+        pass
 
 
 class SearchProviderError(Exception):
@@ -26,6 +26,8 @@ class OverallState(TypedDict):
     knowledge_gap: str
     follow_up_queries: Annotated[list, operator.add]
     number_of_ran_queries: int
+    research_topic: str  # 由ensure_defaults根据messages计算
+    current_date: str  # 由ensure_defaults计算，同一请求的所有提示词使用同一日期
 
 
 class ReflectionState(TypedDict):
@@ -49,6 +51,16 @@ class WebSearchState(TypedDict):
     search_query: str
     id: str
     search_provider: str
+    current_date: str
+
+
+class WebResearchBatchState(TypedDict):
+    """一轮研究中并发执行的一批搜索查询"""
+
+    search_queries: list[str]
+    id: int  # 第一个查询的编号
+    search_provider: str
+    current_date: str
 
 
 @dataclass(kw_only=True)
@@ -3,172 +3,353 @@
 搜索提供商接口测试脚本
 
 此脚本用于测试新的搜索提供商接口和实现。
+
+在 backend/src 目录下运行：python -m agent.test_search_providers
 """
 
+import argparse
 import os
 import asyncio
+import hashlib
+import logging
+import logging.handlers
+import queue
+import pickle
 import sys
+import time
+import traceback
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
 from dotenv import load_dotenv
 
-# 添加当前模块路径
-sys.path.insert(0, os.path.dirname(__file__))
+from agent.search_providers import SearchRequest, SearchResult
+from agent.search_factory import SearchProviderFactory
+from agent.logging_config import JsonFormatter
+from agent.providers.google_search_provider import GoogleSearchProvider
+from agent.providers.tavily_search_provider import TavilySearchProvider
+
+# 加载环境变量 - 从backend/.env文件读取，所需的密钥已在环境中（如CI）时跳过
+ENV_PATH = Path(__file__).resolve().parents[2] / ".env"
+if "GEMINI_API_KEY" not in os.environ or "TAVILY_API_KEY" not in os.environ:
+    load_dotenv(dotenv_path=ENV_PATH)
+
+# 是否配置了各提供商的API密钥，在加载.env后读取一次
+HAS_GEMINI_KEY = bool(os.environ.get("GEMINI_API_KEY"))
+HAS_TAVILY_KEY = bool(os.environ.get("TAVILY_API_KEY"))
+
+
+GOOGLE_TEST_QUERIES = [
+    "Python编程语言最新版本",
+    "量子计算研究进展",
+    "大语言模型推理优化",
+]
+
+TAVILY_TEST_QUERIES = [
+    "人工智能最新发展趋势",
+    "量子计算研究进展",
+    "可再生能源技术突破",
+]
+
+
+# 测试搜索请求除查询外的公共参数
+SEARCH_REQUEST_DEFAULTS: Dict[str, Any] = {"max_results": 3, "language": "zh-CN"}
 
-from search_providers import SearchRequest
-from search_factory import SearchProviderFactory
-from providers.google_search_provider import GoogleSearchProvider
-from providers.tavily_search_provider import TavilySearchProvider
+# 搜索结果的本地缓存，反复运行脚本时不再消耗API配额；设置 SEARCH_CACHE=0 关闭
+SEARCH_CACHE_ENABLED = os.getenv("SEARCH_CACHE", "1") == "1"
+SEARCH_CACHE_DIR = Path.home() / ".cache" / "next_researcher" / "search_cache"
 
-# 加载环境变量 - 从backend/.env文件读取
-# 找到backend目录的路径
-backend_dir = os.path.join(os.path.dirname(__file__), '..', '..')
-env_path = os.path.join(backend_dir, '.env')
-load_dotenv(dotenv_path=env_path)
+
+def _search_cache_path(provider_name: str, request: SearchRequest) -> Path:
+    """搜索请求对应的缓存文件路径"""
+    key = hashlib.sha1(
+        f"{provider_name}|{request.query}|{request.max_results}|{request.language}".encode()
+    ).hexdigest()
+    return SEARCH_CACHE_DIR / f"{key}.pkl"
+
+
+def _load_cached_result(path: Path) -> Optional[SearchResult]:
+    """读取缓存的搜索结果，不存在或无法读取时返回None"""
+    try:
+        with path.open("rb") as f:
+            return pickle.load(f)
+    except (OSError, pickle.PickleError, EOFError):
+        return None
+
+
+def _store_cached_result(path: Path, result: SearchResult) -> None:
+    """写入搜索结果缓存，写入失败时忽略"""
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with path.open("wb") as f:
+            pickle.dump(result, f)
+    except OSError:
+        pass
 
 
-async def test_search_provider_interface():
-    """测试搜索提供商接口"""
-    print("🔍 测试搜索提供商接口...")
+async def _run_search(provider_name: str, queries: List[str]):
+    """创建提供商并并发执行多个搜索
+    
+    多个查询共用同一个提供商实例（及其连接），首个请求的连接建立开销被分摊。
+    启用本地缓存时，命中缓存的查询不再请求API。
+    
+    Returns:
+        (提供商, 搜索结果列表, 总耗时, 缓存命中数)，失败的查询对应位置为异常
+    """
+    provider = SearchProviderFactory.create_provider(provider_name)
+    search_requests = [SearchRequest(query=query, **SEARCH_REQUEST_DEFAULTS) for query in queries]
+    start_time = time.perf_counter()
+    
+    results: List[object] = [None] * len(search_requests)
+    pending = []
+    for i, request in enumerate(search_requests):
+        cache_path = _search_cache_path(provider.get_provider_name(), request)
+        cached = _load_cached_result(cache_path) if SEARCH_CACHE_ENABLED else None
+        if cached is not None:
+            results[i] = cached
+        else:
+            pending.append((i, request, cache_path))
+    
+    if pending:
+        fetched = await provider.search_many([request for _, request, _ in pending])
+        for (i, _, cache_path), result in zip(pending, fetched):
+            results[i] = result
+            if SEARCH_CACHE_ENABLED and not isinstance(result, BaseException):
+                _store_cached_result(cache_path, result)
+    
+    cache_hits = len(search_requests) - len(pending)
+    return provider, results, time.perf_counter() - start_time, cache_hits
+
+
+async def _run_google(queries: List[str]):
+    """执行Google搜索测试，未设置GEMINI_API_KEY时返回None"""
+    if not HAS_GEMINI_KEY:
+        return None
+    return await _run_search("google", queries)
+
+
+async def _run_tavily(queries: List[str]):
+    """执行Tavily搜索测试，未设置TAVILY_API_KEY时返回None"""
+    if not HAS_TAVILY_KEY:
+        return None
+    return await _run_search("tavily", queries)
+
+
+async def _outcome(task: "asyncio.Task"):
+    """等待任务完成，返回其结果或抛出的异常"""
+    try:
+        return await task
+    except Exception as e:
+        return e
+
+
+logger = logging.getLogger("agent.test_search_providers")
+
+# 使用 --json 时为True：各部分的结果作为结构化日志输出（每条一行JSON），不再输出文本
+_json_output = False
+
+
+def _emit(event: str, **fields: Any) -> None:
+    """JSON输出模式下记录一条结构化日志，字段作为JSON中独立的键"""
+    if _json_output:
+        logger.info(event, extra=fields)
+
+
+def _flush(out: List[str]) -> None:
+    """一次性写出缓冲中的输出并清空缓冲，JSON输出模式下只清空"""
+    if _json_output:
+        out.clear()
+    elif out:
+        sys.stdout.write("\n".join(out) + "\n")
+        sys.stdout.flush()
+        out.clear()
+
+
+def _print_search_result(out: List[str], label: str, env_key: str, queries: List[str], outcome) -> None:
+    """把一个提供商的搜索测试汇总结果写入输出缓冲"""
+    provider_name = label.lower()
+    if outcome is None:
+        out.append(f"   ⚠️  跳过{label}搜索测试（未设置{env_key}）")
+        _emit("search", provider=provider_name, status="skipped", reason=f"{env_key} not set")
+        return
+    if isinstance(outcome, BaseException):
+        out.append(f"   ❌ {label}搜索测试失败: {outcome}")
+        _emit("search", provider=provider_name, status="error", error=str(outcome))
+        return
+    
+    provider, results, elapsed, cache_hits = outcome
+    out.append(f"   ✅ 创建{label}提供商成功: {provider.get_provider_name()}")
+    
+    # 逐个查询的简要结果
+    succeeded = [result for result in results if not isinstance(result, BaseException)]
+    for query, result in zip(queries, results):
+        if isinstance(result, BaseException):
+            out.append(f"   ❌ {query}: {result}")
+        else:
+            out.append(f"   📝 {query}: {len(result.content)} 字符, {len(result.sources)} 个来源")
+    
+    # 汇总统计
+    out.append(f"   📊 搜索结果汇总:")
+    out.append(f"   成功查询: {len(succeeded)}/{len(results)}")
+    if cache_hits:
+        out.append(f"   缓存命中: {cache_hits}/{len(results)}（设置 SEARCH_CACHE=0 可关闭缓存）")
+    out.append(f"   内容总长度: {sum(len(result.content) for result in succeeded)} 字符")
+    out.append(f"   来源总数: {sum(len(result.sources) for result in succeeded)}")
+    out.append(f"   ⏱️  总耗时: {elapsed:.2f} 秒，平均每个查询 {elapsed / len(results):.2f} 秒")
+    
+    if succeeded:
+        out.append(f"   ✅ {label}搜索测试成功!")
+    else:
+        out.append(f"   ❌ {label}搜索测试失败: 所有查询均未成功")
+    
+    _emit(
+        "search",
+        provider=provider_name,
+        status="ok" if succeeded else "error",
+        queries=[
+            {"query": query, "error": str(result)} if isinstance(result, BaseException)
+            else {"query": query, "content_length": len(result.content), "source_count": len(result.sources)}
+            for query, result in zip(queries, results)
+        ],
+        succeeded=len(succeeded),
+        cache_hits=cache_hits,
+        elapsed=round(elapsed, 3),
+    )
+
+
+async def test_search_provider_interface(
+    providers: Sequence[str] = ("google", "tavily"),
+    queries: Optional[List[str]] = None
+):
+    """测试搜索提供商接口
+    
+    Args:
+        providers: 要执行搜索测试的提供商，未列出的提供商跳过搜索部分
+        queries: 搜索查询列表，为None时使用各提供商的默认查询
+    """
+    # 输出先写入缓冲，每个部分结束时一次性写出
+    out: List[str] = ["🔍 测试搜索提供商接口..."]
+    get_provider_info = SearchProviderFactory.get_provider_info
+    validate_provider_config = SearchProviderFactory.validate_provider_config
     
     try:
         # 1. 测试工厂方法
-        print("\n1. 测试搜索提供商工厂:")
+        out.append("\n1. 测试搜索提供商工厂:")
         available_providers = SearchProviderFactory.get_available_providers()
-        print(f"   可用提供商: {available_providers}")
+        out.append(f"   可用提供商: {available_providers}")
+        _emit("factory", available_providers=available_providers)
+        _flush(out)
         
         # 2. 测试提供商信息
-        print("\n2. 测试提供商信息:")
+        out.append("\n2. 测试提供商信息:")
         for provider_name in available_providers:
             try:
-                info = SearchProviderFactory.get_provider_info(provider_name)
-                print(f"   {provider_name}: {info['description']}")
-                print(f"   必需配置: {info.get('required_config_keys', [])}")
-                print(f"   速率限制: {info.get('rate_limits', {})}")
+                info = get_provider_info(provider_name)
+                out.append(f"   {provider_name}: {info['description']}")
+                out.append(f"   必需配置: {info.get('required_config_keys', [])}")
+                out.append(f"   速率限制: {info.get('rate_limits', {})}")
                 if 'supported_features' in info:
-                    print(f"   支持功能: {info['supported_features']}")
+                    out.append(f"   支持功能: {info['supported_features']}")
+                _emit("provider_info", provider=provider_name, info=info)
             except Exception as e:
-                print(f"   {provider_name}: 获取信息失败 - {e}")
+                out.append(f"   {provider_name}: 获取信息失败 - {e}")
+                _emit("provider_info", provider=provider_name, error=str(e))
+        _flush(out)
         
-        # 3. 测试Google搜索提供商
-        print("\n3. 测试Google搜索提供商:")
-        if os.getenv("GEMINI_API_KEY"):
-            try:
-                # 创建搜索提供商
-                google_provider = SearchProviderFactory.create_provider("google")
-                print(f"   ✅ 创建Google提供商成功: {google_provider.get_provider_name()}")
-                
-                # 创建搜索请求
-                search_request = SearchRequest(
-                    query="Python编程语言最新版本",
-                    max_results=3,
-                    language="zh-CN"
-                )
-                print(f"   📝 搜索查询: {search_request.query}")
-                
-                # 执行搜索
-                print("   🔄 执行搜索...")
-                result = await google_provider.search(search_request)
-                
-                # 显示结果
-                print(f"   📊 搜索结果:")
-                print(f"   内容长度: {len(result.content)} 字符")
-                print(f"   来源数量: {len(result.sources)}")
-                
-                if result.sources:
-                    print("   前3个来源:")
-                    for i, source in enumerate(result.sources[:3]):
-                        print(f"     {i+1}. {source['title'][:50]}...")
-                        print(f"        URL: {source['url']}")
-                
-                # 显示性能指标
-                metrics = google_provider.get_search_metrics()
-                if metrics:
-                    print(f"   ⏱️  性能指标:")
-                    print(f"   搜索耗时: {metrics.search_time:.2f} 秒")
-                    print(f"   结果数量: {metrics.result_count}")
-                    print(f"   API调用: {metrics.api_calls_used}")
-                
-                print("   ✅ Google搜索测试成功!")
-                
-            except Exception as e:
-                print(f"   ❌ Google搜索测试失败: {e}")
-        else:
-            print("   ⚠️  跳过Google搜索测试（未设置GEMINI_API_KEY）")
+        # 3. 测试Google和Tavily搜索提供商
+        # 两个提供商的请求互不依赖，同时发起；Google的结果先到先输出，此时Tavily的请求仍在进行
+        google_queries = queries or GOOGLE_TEST_QUERIES
+        tavily_queries = queries or TAVILY_TEST_QUERIES
+        google_task = asyncio.create_task(_run_google(google_queries)) if "google" in providers else None
+        tavily_task = asyncio.create_task(_run_tavily(tavily_queries)) if "tavily" in providers else None
         
-        # 测试Tavily搜索提供商
-        print("\n3.2 测试Tavily搜索提供商:")
-        if os.getenv("TAVILY_API_KEY"):
-            try:
-                # 创建搜索提供商
-                tavily_provider = SearchProviderFactory.create_provider("tavily")
-                print(f"   ✅ 创建Tavily提供商成功: {tavily_provider.get_provider_name()}")
-                
-                # 创建搜索请求
-                search_request = SearchRequest(
-                    query="人工智能最新发展趋势",
-                    max_results=3,
-                    language="zh-CN"
-                )
-                print(f"   📝 搜索查询: {search_request.query}")
-                
-                # 执行搜索
-                print("   🔄 执行搜索...")
-                result = await tavily_provider.search(search_request)
-                
-                # 显示结果
-                print(f"   📊 搜索结果:")
-                print(f"   内容长度: {len(result.content)} 字符")
-                print(f"   来源数量: {len(result.sources)}")
-                
-                if result.sources:
-                    print("   前3个来源:")
-                    for i, source in enumerate(result.sources[:3]):
-                        print(f"     {i+1}. {source['title'][:50]}...")
-                        print(f"        URL: {source['url']}")
-                
-                # 显示性能指标
-                metrics = tavily_provider.get_search_metrics()
-                if metrics:
-                    print(f"   ⏱️  性能指标:")
-                    print(f"   搜索耗时: {metrics.search_time:.2f} 秒")
-                    print(f"   结果数量: {metrics.result_count}")
-                    print(f"   API调用: {metrics.api_calls_used}")
-                
-                print("   ✅ Tavily搜索测试成功!")
-                
-            except Exception as e:
-                print(f"   ❌ Tavily搜索测试失败: {e}")
-        else:
-            print("   ⚠️  跳过Tavily搜索测试（未设置TAVILY_API_KEY）")
+        if google_task is not None:
+            out.append("\n3. 测试Google搜索提供商:")
+            _print_search_result(out, "Google", "GEMINI_API_KEY", google_queries, await _outcome(google_task))
+            _flush(out)
+        
+        if tavily_task is not None:
+            out.append("\n3.2 测试Tavily搜索提供商:")
+            _print_search_result(out, "Tavily", "TAVILY_API_KEY", tavily_queries, await _outcome(tavily_task))
+            _flush(out)
         
         # 4. 测试配置验证
-        print("\n4. 测试配置验证:")
+        out.append("\n4. 测试配置验证:")
         
         # 测试Google配置验证
         test_config = {"api_key": "test_key"}
-        is_valid, message = SearchProviderFactory.validate_provider_config("google", test_config)
-        print(f"   Google配置有效性: {is_valid} - {message}")
+        is_valid, message = validate_provider_config("google", test_config)
+        out.append(f"   Google配置有效性: {is_valid} - {message}")
+        _emit("validate_config", provider="google", valid=is_valid, detail=message)
         
         # 测试Tavily配置验证
         tavily_test_config = {"api_key": "tvly-test_api_key_with_sufficient_length"}
-        is_valid, message = SearchProviderFactory.validate_provider_config("tavily", tavily_test_config)
-        print(f"   Tavily配置有效性: {is_valid} - {message}")
+        is_valid, message = validate_provider_config("tavily", tavily_test_config)
+        out.append(f"   Tavily配置有效性: {is_valid} - {message}")
+        _emit("validate_config", provider="tavily", valid=is_valid, detail=message)
         
-        print("\n🎉 所有测试完成!")
+        out.append("\n🎉 所有测试完成!")
+        _emit("done")
+        _flush(out)
         
     except Exception as e:
-        print(f"❌ 测试过程中发生错误: {e}")
-        import traceback
+        out.append(f"❌ 测试过程中发生错误: {e}")
+        _emit("error", error=str(e))
+        _flush(out)
         traceback.print_exc()
 
 
 async def main():
     """主函数"""
-    print("=" * 60)
-    print("搜索提供商接口测试")
-    print("=" * 60)
+    global _json_output
+    
+    parser = argparse.ArgumentParser(description="搜索提供商接口测试")
+    parser.add_argument(
+        "--provider", choices=["google", "tavily", "all"], default="all",
+        help="只测试指定提供商的搜索（默认全部）"
+    )
+    parser.add_argument(
+        "--query", action="append", dest="queries",
+        help="搜索查询，可多次指定；默认使用内置的测试查询"
+    )
+    parser.add_argument(
+        "--json", action="store_true",
+        help="以JSON日志（每行一条，输出到stdout）代替文本输出，便于CI解析"
+    )
+    args = parser.parse_args()
+    
+    listener: Optional[logging.handlers.QueueListener] = None
+    if args.json:
+        # agent包的日志在导入时已按 LOG_FORMAT 配置，这里为测试日志单独配置JSON格式的队列输出，
+        # 由后台线程写出，日志调用不阻塞事件循环
+        handler = logging.StreamHandler(sys.stdout)
+        handler.setFormatter(JsonFormatter())
+        log_queue: queue.SimpleQueue = queue.SimpleQueue()
+        listener = logging.handlers.QueueListener(log_queue, handler)
+        listener.start()
+        logger.addHandler(logging.handlers.QueueHandler(log_queue))
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+        _json_output = True
+    else:
+        print("=" * 60)
+        print("搜索提供商接口测试")
+        print("=" * 60)
     
-    await test_search_provider_interface()
+    providers = ["google", "tavily"] if args.provider == "all" else [args.provider]
+    try:
+        await test_search_provider_interface(providers=providers, queries=args.queries)
+    finally:
+        # 停止时会先写出队列中剩余的日志
+        if listener is not None:
+            listener.stop()
 
 
 if __name__ == "__main__":
+    # 安装了uvloop时使用其事件循环
+    try:
+        import uvloop
+
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    except ImportError:
+        pass
     asyncio.run(main()) 
\ No newline at end of file
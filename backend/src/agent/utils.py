@@ -1,7 +1,19 @@
+from functools import lru_cache
 from typing import Any, Dict, List
+from google.genai import Client
 from langchain_core.messages import AnyMessage, AIMessage, HumanMessage
 
 
+@lru_cache(maxsize=8)
+def get_genai_client(api_key: str) -> Client:
+    """Get a shared google-genai client for the given API key.
+
+    The graph, the Gemini LLM provider and the Google search provider reuse one client
+    (and its connection pool) instead of each opening their own.
+    """
+    return Client(api_key=api_key)
+
+
 def get_research_topic(messages: List[AnyMessage]) -> str:
     """
     Get the research topic from the messages.
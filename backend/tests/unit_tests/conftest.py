@@ -0,0 +1,4 @@
+import os
+
+# 导入agent包时会加载graph模块，graph模块要求设置GEMINI_API_KEY；单元测试不访问真实服务
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
@@ -0,0 +1,85 @@
+import gzip
+
+import pytest
+from starlette.applications import Starlette
+from starlette.routing import Mount
+from starlette.testclient import TestClient
+
+from agent.app import CachedStaticFiles, _accepts_encoding, _parse_accept_encoding
+
+_JS = b"console.log('hello');" * 10
+
+
+@pytest.fixture
+def client(tmp_path):
+    assets = tmp_path / "assets"
+    assets.mkdir()
+    (assets / "index-AbCd1234.js").write_bytes(_JS)
+    (assets / "index-AbCd1234.js.gz").write_bytes(gzip.compress(_JS))
+    (assets / "index-AbCd1234.js.br").write_bytes(b"fake-brotli")
+    (assets / "logo.svg").write_bytes(b"<svg/>")
+    (tmp_path / "index.html").write_bytes(b"<html></html>")
+    (tmp_path / "other-AbCd1234.js").write_bytes(_JS)
+    app = Starlette(routes=[Mount("/app", CachedStaticFiles(directory=tmp_path, html=True))])
+    return TestClient(app)
+
+
+@pytest.mark.parametrize(
+    ("header", "expected"),
+    [
+        ("gzip, br", {"gzip": 1.0, "br": 1.0}),
+        ("gzip;q=0, br;q=0.5", {"gzip": 0.0, "br": 0.5}),
+        ("GZIP; Q=0.8", {"gzip": 0.8}),
+        ("br;q=oops", {"br": 0.0}),
+        ("", {}),
+    ],
+)
+def test_parse_accept_encoding(header, expected):
+    assert _parse_accept_encoding(header) == expected
+
+
+def test_accepts_encoding():
+    assert not _accepts_encoding(_parse_accept_encoding("x-gzip"), "gzip")
+    assert not _accepts_encoding(_parse_accept_encoding("gzip;q=0"), "gzip")
+    assert _accepts_encoding(_parse_accept_encoding("*"), "br")
+    assert not _accepts_encoding(_parse_accept_encoding("*;q=0.5, br;q=0"), "br")
+    assert _accepts_encoding(_parse_accept_encoding("*;q=0.5, br;q=0"), "gzip")
+
+
+def _get(client, path, accept_encoding, **headers):
+    """发送请求，返回 (响应, 未解压的响应体)"""
+    with client.stream("GET", path, headers={"Accept-Encoding": accept_encoding, **headers}) as response:
+        return response, b"".join(response.iter_raw())
+
+
+def test_prefers_brotli_then_gzip(client):
+    response, body = _get(client, "/app/assets/index-AbCd1234.js", "gzip, br")
+    assert response.headers["content-encoding"] == "br"
+    assert body == b"fake-brotli"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.headers["content-type"].startswith(("text/javascript", "application/javascript"))
+
+    response, body = _get(client, "/app/assets/index-AbCd1234.js", "gzip, br;q=0")
+    assert response.headers["content-encoding"] == "gzip"
+    assert gzip.decompress(body) == _JS
+
+
+@pytest.mark.parametrize("accept_encoding", ["identity", "gzip;q=0, br;q=0", "x-gzip"])
+def test_serves_plain_file_when_compression_refused(client, accept_encoding):
+    response, body = _get(client, "/app/assets/index-AbCd1234.js", accept_encoding)
+    assert "content-encoding" not in response.headers
+    assert body == _JS
+
+
+def test_only_hashed_files_under_assets_are_immutable(client):
+    hashed, _ = _get(client, "/app/assets/index-AbCd1234.js", "identity")
+    assert hashed.headers["cache-control"] == "public, max-age=31536000, immutable"
+
+    for path in ("/app/assets/logo.svg", "/app/other-AbCd1234.js", "/app/index.html"):
+        assert _get(client, path, "identity")[0].headers["cache-control"] == "no-cache"
+
+
+def test_conditional_request_returns_304(client):
+    first, _ = _get(client, "/app/assets/index-AbCd1234.js", "br")
+    second, _ = _get(client, "/app/assets/index-AbCd1234.js", "br", **{"If-None-Match": first.headers["etag"]})
+    assert second.status_code == 304
@@ -0,0 +1,37 @@
+from agent.graph import _CITATION_RE, _replace_citation
+
+_SOURCES = [
+    {"title": "Example.com", "value": "https://example.com/a"},
+    {"title": "", "value": "https://example.org/b"},
+    {"title": "No url", "value": ""},
+]
+
+
+def _replace(text, sources=_SOURCES):
+    used = {}
+    result = _CITATION_RE.sub(lambda m: _replace_citation(m, sources, used), text)
+    return result, used
+
+
+def test_single_citation_becomes_link():
+    text, used = _replace("Fact [1].")
+    assert text == "Fact [Example](https://example.com/a)."
+    assert list(used) == ["https://example.com/a"]
+
+
+def test_grouped_citation_and_missing_title():
+    text, used = _replace("Fact [2, 1]")
+    assert text == "Fact [来源2](https://example.org/b) [Example](https://example.com/a)"
+    # 按首次出现的顺序记录用到的来源
+    assert list(used) == ["https://example.org/b", "https://example.com/a"]
+
+
+def test_out_of_range_or_unresolvable_citation_is_kept():
+    text, used = _replace("A [9] B [3] C [0]")
+    assert text == "A [9] B [3] C [0]"
+    assert used == {}
+
+
+def test_repeated_source_recorded_once():
+    _, used = _replace("[1] and again [1]")
+    assert list(used) == ["https://example.com/a"]
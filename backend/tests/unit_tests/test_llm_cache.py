@@ -0,0 +1,65 @@
+from agent import llm_cache
+from agent.llm_cache import ExactCache
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def monotonic(self):
+        return self.now
+
+
+def test_get_returns_stored_value():
+    cache = ExactCache(maxsize=4)
+    cache.set("a", 1)
+    assert cache.get("a") == 1
+    assert cache.get("missing") is None
+
+
+def test_evicts_least_recently_used():
+    cache = ExactCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    # 读取a之后b成为最久未使用的条目
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert len(cache) == 2
+
+
+def test_overwrite_refreshes_entry():
+    cache = ExactCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.set("a", 10)
+    cache.set("c", 3)
+    assert cache.get("a") == 10
+    assert cache.get("b") is None
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(llm_cache, "time", clock)
+    cache = ExactCache(maxsize=4, ttl=10.0)
+    cache.set("a", 1)
+    clock.now = 10.0
+    assert cache.get("a") == 1
+    clock.now = 10.5
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_clear():
+    cache = ExactCache()
+    cache.set("a", 1)
+    cache.clear()
+    assert len(cache) == 0
+    assert cache.get("a") is None
+
+
+def test_make_key_separates_parts():
+    assert ExactCache.make_key("ab", "c") != ExactCache.make_key("a", "bc")
+    assert ExactCache.make_key("a", "b") == ExactCache.make_key("a", "b")
@@ -0,0 +1,142 @@
+import asyncio
+from collections import deque
+
+import pytest
+
+from agent import llm_providers
+from agent.llm_providers import BaseLLMProvider
+from agent.llm_types import (
+    GeminiProviderConfig,
+    LLMProviderType,
+    LLMRequest,
+    LLMTaskType,
+)
+
+
+class _Clock:
+    """假的单调时钟，sleep直接推进时间"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def monotonic(self):
+        return self.now
+
+    async def sleep(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(llm_providers, "time", clock)
+    monkeypatch.setattr(llm_providers.asyncio, "sleep", clock.sleep)
+    return clock
+
+
+class _Limited:
+    """只带速率限制状态的对象，直接调用 BaseLLMProvider._rate_limit_check"""
+
+    def __init__(self, limit, window):
+        self._request_times = deque(maxlen=limit)
+        self._rate_window = window
+
+    async def acquire(self, slots=1):
+        await BaseLLMProvider._rate_limit_check(self, slots)
+
+
+def test_requests_within_limit_are_not_delayed(clock):
+    limited = _Limited(limit=3, window=1.0)
+
+    async def run():
+        for _ in range(3):
+            await limited.acquire()
+
+    asyncio.run(run())
+    assert clock.now == 0.0
+
+
+def test_waits_until_oldest_request_leaves_window(clock):
+    limited = _Limited(limit=2, window=1.0)
+    sent = []
+
+    async def run():
+        for _ in range(5):
+            await limited.acquire()
+            sent.append(clock.now)
+
+    asyncio.run(run())
+    assert sent == [0.0, 0.0, 1.0, 1.0, 2.0]
+
+
+def test_multi_slot_reservation_waits_for_enough_room(clock):
+    limited = _Limited(limit=3, window=1.0)
+
+    async def run():
+        await limited.acquire()
+        clock.now = 0.5
+        await limited.acquire()
+        # 窗口内只剩1个空位，要等0.0的请求移出窗口，之后0.5的请求和新的2个请求正好3个
+        await limited.acquire(2)
+
+    asyncio.run(run())
+    assert clock.now == 1.0
+
+
+class _Result:
+    content = "ok"
+
+
+class _FakeLLM:
+    def __init__(self, clock, sent):
+        self.clock = clock
+        self.sent = sent
+
+    async def abatch(self, messages):
+        self.sent.extend([self.clock.now] * len(messages))
+        return [_Result() for _ in messages]
+
+
+class _Provider(BaseLLMProvider):
+    def __init__(self, config, clock, sent):
+        self._fake_llm = _FakeLLM(clock, sent)
+        super().__init__(config)
+
+    def get_rate_limits(self):
+        return {"requests_per_second": 2}
+
+    def get_provider_type(self):
+        return LLMProviderType.GEMINI
+
+    def validate_config(self):
+        return True
+
+    def _validate_config(self):
+        pass
+
+    def get_langchain_llm(self, model, **kwargs):
+        return self._fake_llm
+
+    async def generate(self, request):
+        raise NotImplementedError
+
+    async def generate_structured(self, request, output_schema):
+        raise NotImplementedError
+
+    async def _fetch_models_impl(self):
+        return []
+
+
+def test_generate_batch_respects_rate_limit(clock):
+    sent = []
+    config = GeminiProviderConfig(api_key="k", models=["m"], default_model="m")
+    provider = _Provider(config, clock, sent)
+    requests = [
+        LLMRequest(prompt=f"p{i}", model="m", task_type=LLMTaskType.QUERY_GENERATION)
+        for i in range(5)
+    ]
+
+    responses = asyncio.run(provider.generate_batch(requests))
+    assert [r.content for r in responses] == ["ok"] * 5
+    # 每秒最多2个请求：批量调用按窗口上限拆分发出
+    assert sent == [0.0, 0.0, 1.0, 1.0, 2.0]
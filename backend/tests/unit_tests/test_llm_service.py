@@ -0,0 +1,227 @@
+import asyncio
+
+import pytest
+from pydantic import BaseModel
+
+from agent.llm_service import LLMService, RequestCoalescer, clear_response_cache
+from agent.llm_types import LLMProviderType, LLMRequest, LLMResponse, LLMTaskType
+
+
+class _FakeProvider:
+    """记录调用次数的提供商，调用时让出事件循环以便并发请求重叠"""
+
+    def __init__(self, error=None):
+        self.calls = 0
+        self.error = error
+
+    def get_provider_type(self):
+        return LLMProviderType.GEMINI
+
+    def get_default_model(self):
+        return "test-model"
+
+    async def generate(self, request):
+        self.calls += 1
+        await asyncio.sleep(0.01)
+        if self.error is not None:
+            raise self.error
+        return LLMResponse(
+            content=f"{request.prompt}#{self.calls}",
+            model=request.model,
+            provider=LLMProviderType.GEMINI,
+        )
+
+
+@pytest.fixture(autouse=True)
+def _empty_response_cache():
+    clear_response_cache()
+    yield
+    clear_response_cache()
+
+
+def _request(prompt):
+    return LLMRequest(prompt=prompt, model="test-model", task_type=LLMTaskType.QUERY_GENERATION)
+
+
+def _service(provider):
+    service = LLMService()
+    service._default_provider = provider
+    return service
+
+
+def test_concurrent_identical_requests_share_one_call():
+    provider = _FakeProvider()
+    service = _service(provider)
+
+    async def run():
+        return await asyncio.gather(*(service.generate("q", temperature=0) for _ in range(3)))
+
+    responses = asyncio.run(run())
+    assert provider.calls == 1
+    assert [r.content for r in responses] == ["q#1"] * 3
+    # 各调用方拿到的是各自的拷贝
+    assert len({id(r) for r in responses}) == 3
+
+
+def test_deterministic_response_is_reused():
+    provider = _FakeProvider()
+    service = _service(provider)
+
+    async def run():
+        first = await service.generate("q", temperature=0)
+        second = await service.generate("q", temperature=0)
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert provider.calls == 1
+    assert first.content == second.content
+
+
+def test_sampled_requests_are_not_cached():
+    provider = _FakeProvider()
+    service = _service(provider)
+
+    async def run():
+        await service.generate("q", temperature=0.7)
+        await service.generate("q", temperature=0.7)
+
+    asyncio.run(run())
+    assert provider.calls == 2
+
+
+def test_cache_opt_in_for_sampled_requests():
+    provider = _FakeProvider()
+    service = _service(provider)
+
+    async def run():
+        await service.generate("q", temperature=0.7, cache=True)
+        await service.generate("q", temperature=0.7, cache=True)
+
+    asyncio.run(run())
+    assert provider.calls == 1
+
+
+def test_failure_reaches_all_waiters_and_is_not_cached():
+    provider = _FakeProvider(error=RuntimeError("boom"))
+    service = _service(provider)
+
+    async def run():
+        return await asyncio.gather(
+            service.generate("q", temperature=0),
+            service.generate("q", temperature=0),
+            return_exceptions=True,
+        )
+
+    results = asyncio.run(run())
+    assert provider.calls == 1
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+    provider.error = None
+    response = asyncio.run(service.generate("q", temperature=0))
+    assert provider.calls == 2
+    assert response.content == "q#2"
+
+
+class _BatchProvider(_FakeProvider):
+    """记录批量调用的提供商"""
+
+    def __init__(self):
+        super().__init__()
+        self.batches = []
+
+    async def generate_batch(self, requests):
+        self.batches.append(len(requests))
+        return [
+            LLMResponse(content=r.prompt, model=r.model, provider=LLMProviderType.GEMINI)
+            for r in requests
+        ]
+
+    async def generate_structured_batch(self, requests, output_schema):
+        self.batches.append((output_schema.__name__, len(requests)))
+        return [
+            LLMResponse(
+                content="",
+                model=r.model,
+                provider=LLMProviderType.GEMINI,
+                structured_data=output_schema(value=r.prompt),
+            )
+            for r in requests
+        ]
+
+
+class _Answer(BaseModel):
+    value: str
+
+
+def test_coalescer_batches_requests_within_window():
+    provider = _BatchProvider()
+    coalescer = RequestCoalescer(provider, window=0.01, max_batch=8)
+
+    async def run():
+        return await asyncio.gather(*(coalescer.submit(_request(p)) for p in "abc"))
+
+    responses = asyncio.run(run())
+    assert [r.content for r in responses] == ["a", "b", "c"]
+    assert provider.batches == [3]
+    assert not coalescer._tasks
+
+
+def test_coalescer_flushes_when_batch_is_full():
+    provider = _BatchProvider()
+    coalescer = RequestCoalescer(provider, window=10.0, max_batch=2)
+
+    async def run():
+        return await asyncio.gather(*(coalescer.submit(_request(p)) for p in "ab"))
+
+    # 窗口很长，达到上限时立即提交，不等待窗口结束
+    responses = asyncio.run(asyncio.wait_for(run(), timeout=1.0))
+    assert [r.content for r in responses] == ["a", "b"]
+    assert provider.batches == [2]
+
+
+def test_coalescer_single_request_uses_generate():
+    provider = _BatchProvider()
+    coalescer = RequestCoalescer(provider, window=0.01)
+    response = asyncio.run(coalescer.submit(_request("a")))
+    assert response.content == "a#1"
+    assert provider.calls == 1
+    assert provider.batches == []
+
+
+def test_coalescer_propagates_errors_to_every_caller():
+    provider = _BatchProvider()
+
+    async def failing_batch(requests):
+        raise RuntimeError("batch failed")
+
+    provider.generate_batch = failing_batch
+    coalescer = RequestCoalescer(provider, window=0.01)
+
+    async def run():
+        return await asyncio.gather(
+            coalescer.submit(_request("a")),
+            coalescer.submit(_request("b")),
+            return_exceptions=True,
+        )
+
+    results = asyncio.run(run())
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+
+def test_structured_requests_are_batched_per_schema(monkeypatch):
+    provider = _BatchProvider()
+    service = _service(provider)
+    monkeypatch.setattr(service, "_batch_window", 0.01)
+
+    async def run():
+        return await asyncio.gather(
+            service.generate_structured("a", _Answer),
+            service.generate_structured("b", _Answer),
+            service.generate("c"),
+            service.generate("d"),
+        )
+
+    responses = asyncio.run(run())
+    assert [r.structured_data.value for r in responses[:2]] == ["a", "b"]
+    assert [r.content for r in responses[2:]] == ["c", "d"]
+    assert sorted(provider.batches, key=str) == [("_Answer", 2), 2]
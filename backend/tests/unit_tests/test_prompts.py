@@ -0,0 +1,43 @@
+import pytest
+
+from agent import prompts
+from agent.prompts import compile_template
+
+
+def test_matches_str_format():
+    template = "Date: {current_date}\nTopic: {research_topic}\n{research_topic}!"
+    render = compile_template(template)
+    kwargs = {"current_date": "2025-01-01", "research_topic": "AI"}
+    assert render(**kwargs) == template.format(**kwargs)
+
+
+def test_escaped_braces_and_extra_arguments():
+    render = compile_template('{{"query": "{q}"}}')
+    assert render(q="x", unused=1) == '{"query": "x"}'
+
+
+def test_values_are_converted_to_str():
+    assert compile_template("n={n}")(n=3) == "n=3"
+
+
+def test_missing_argument_raises():
+    with pytest.raises(KeyError):
+        compile_template("{a}{b}")(a=1)
+
+
+def test_format_spec_is_rejected():
+    with pytest.raises(ValueError):
+        compile_template("{value:>10}")
+
+
+@pytest.mark.parametrize(
+    ("template", "render"),
+    [
+        (prompts.query_writer_input, prompts.render_query_writer_input),
+        (prompts.reflection_input, prompts.render_reflection_input),
+        (prompts.answer_input, prompts.render_answer_input),
+    ],
+)
+def test_module_renderers_match_templates(template, render):
+    kwargs = {"current_date": "2025-01-01", "research_topic": "t", "summaries": "s", "number_queries": 3}
+    assert render(**kwargs) == template.format(**kwargs)
@@ -0,0 +1,106 @@
+import asyncio
+
+import pytest
+
+from agent.providers import tavily_search_provider
+from agent.providers.tavily_search_provider import TavilySearchProvider
+from agent.search_providers import SearchRequest, SearchResult
+
+_KEY_A = "tvly-aaaaaaaaaaaaaaaaaaaa"
+_KEY_B = "tvly-bbbbbbbbbbbbbbbbbbbb"
+
+
+@pytest.fixture(autouse=True)
+def _empty_search_cache():
+    tavily_search_provider._search_cache.clear()
+    yield
+    tavily_search_provider._search_cache.clear()
+
+
+class _Calls:
+    def __init__(self):
+        self.count = 0
+
+
+def _provider(calls, api_key=_KEY_A, base_url="https://api.tavily.com"):
+    """创建不访问网络的提供商，记录实际发出的搜索次数"""
+    provider = TavilySearchProvider({"api_key": api_key, "base_url": base_url})
+
+    async def fake_search(request):
+        calls.count += 1
+        await asyncio.sleep(0.01)
+        return SearchResult(
+            content=f"{request.query}#{calls.count}",
+            sources=[{"label": "a", "url": "https://a.example/", "title": "a"}],
+        )
+
+    provider._search_uncached = fake_search
+    return provider
+
+
+def test_repeated_query_hits_cache():
+    calls = _Calls()
+    provider = _provider(calls)
+
+    async def run():
+        first = await provider.search(SearchRequest(query="Paris"))
+        second = await provider.search(SearchRequest(query="  paris "))
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert calls.count == 1
+    assert first.content == second.content
+    # 返回的是缓存结果的拷贝
+    assert first is not second
+    second.sources.append({})
+    assert len(asyncio.run(provider.search(SearchRequest(query="paris"))).sources) == 1
+
+
+def test_concurrent_identical_queries_share_one_call():
+    calls = _Calls()
+    provider = _provider(calls)
+
+    async def run():
+        return await asyncio.gather(*(provider.search(SearchRequest(query="q")) for _ in range(3)))
+
+    results = asyncio.run(run())
+    assert calls.count == 1
+    assert {r.content for r in results} == {"q#1"}
+
+
+def test_request_parameters_are_part_of_the_key():
+    calls = _Calls()
+    provider = _provider(calls)
+
+    async def run():
+        await provider.search(SearchRequest(query="q", max_results=5))
+        await provider.search(SearchRequest(query="q", max_results=10))
+
+    asyncio.run(run())
+    assert calls.count == 2
+
+
+def test_differently_configured_clients_do_not_share_entries():
+    calls = _Calls()
+
+    async def run():
+        await _provider(calls, api_key=_KEY_A).search(SearchRequest(query="q"))
+        await _provider(calls, api_key=_KEY_B).search(SearchRequest(query="q"))
+        await _provider(calls, base_url="https://proxy.example").search(SearchRequest(query="q"))
+        await _provider(calls, api_key=_KEY_A).search(SearchRequest(query="q"))
+
+    asyncio.run(run())
+    assert calls.count == 3
+
+
+def test_disabled_when_ttl_is_zero(monkeypatch):
+    monkeypatch.setattr(tavily_search_provider._search_cache, "ttl", 0)
+    calls = _Calls()
+    provider = _provider(calls)
+
+    async def run():
+        await provider.search(SearchRequest(query="q"))
+        await provider.search(SearchRequest(query="q"))
+
+    asyncio.run(run())
+    assert calls.count == 2